@@ -37,3 +37,12 @@ pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def isolated_media(mock_media):
+    """Картинки и миниатюры тестов пишутся во временный MEDIA_ROOT."""
+    yield mock_media
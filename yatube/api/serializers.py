@@ -0,0 +1,71 @@
+from django.core.files.storage import default_storage
+
+# поле ответа -> колонки values(), которые для него нужны
+POST_FIELDS = {
+    'text': ('text',),
+    'pub_date': ('pub_date',),
+    'image': ('image',),
+    'author': ('author__username', 'author__first_name',
+               'author__last_name'),
+    'group': ('group__slug', 'group__title'),
+}
+COMMENT_FIELDS = {
+    'text': ('text',),
+    'created': ('created',),
+    'post': ('post_id',),
+    'author': ('author__username', 'author__first_name',
+               'author__last_name'),
+}
+
+
+def parse_fields(value, available):
+    """Разбирает ?fields=a,b; неизвестные поля отбрасываются."""
+    if not value:
+        return tuple(available)
+    requested = [name.strip() for name in value.split(',')]
+    return tuple(name for name in requested if name in available)
+
+
+def columns_for(fields, available, key_columns):
+    columns = ['id', *key_columns]
+    for name in fields:
+        columns.extend(c for c in available[name] if c not in columns)
+    return columns
+
+
+def _author(row):
+    return {
+        'username': row['author__username'],
+        'full_name': f"{row['author__first_name']} "
+                     f"{row['author__last_name']}".strip(),
+    }
+
+
+def serialize_post(row, fields):
+    data = {'id': row['id']}
+    for name in fields:
+        if name == 'author':
+            data['author'] = _author(row)
+        elif name == 'group':
+            data['group'] = None if row['group__slug'] is None else {
+                'slug': row['group__slug'],
+                'title': row['group__title'],
+            }
+        elif name == 'image':
+            data['image'] = (default_storage.url(row['image'])
+                             if row['image'] else None)
+        else:
+            data[name] = row[name]
+    return data
+
+
+def serialize_comment(row, fields):
+    data = {'id': row['id']}
+    for name in fields:
+        if name == 'author':
+            data['author'] = _author(row)
+        elif name == 'post':
+            data['post'] = row['post_id']
+        else:
+            data[name] = row[name]
+    return data
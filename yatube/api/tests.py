@@ -0,0 +1,94 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post
+from posts.utils import encode_cursor
+
+User = get_user_model()
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='api_user',
+                                            first_name='Иван',
+                                            last_name='Петров')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.posts = [
+            Post.objects.create(author=cls.user, text=f'Пост {i}',
+                                group=cls.group if i % 2 else None)
+            for i in range(7)
+        ]
+        for i in range(3):
+            Comment.objects.create(post=cls.posts[0], author=cls.user,
+                                   text=f'Комментарий {i}')
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def test_feed_cursor_pagination(self):
+        """Лента отдаётся страницами по курсору без пропусков."""
+        url = reverse('api:post_list')
+        seen = []
+        params = {'limit': 3}
+        while True:
+            data = self.guest_client.get(url, params).json()
+            seen += [post['id'] for post in data['results']]
+            if not data['next']:
+                break
+            params['cursor'] = data['next']
+        self.assertEqual(seen, [post.pk for post in reversed(self.posts)])
+
+    def test_embedded_objects_in_one_query(self):
+        """Автор и группа встраиваются одним запросом."""
+        with self.assertNumQueries(1):
+            data = self.guest_client.get(reverse('api:post_list')).json()
+        post = data['results'][1]
+        self.assertEqual(post['author'], {'username': 'api_user',
+                                          'full_name': 'Иван Петров'})
+        self.assertEqual(post['group'], {'slug': 'test-slug',
+                                         'title': 'Тестовая группа'})
+
+    def test_sparse_fieldsets(self):
+        """?fields= ограничивает набор полей."""
+        data = self.guest_client.get(
+            reverse('api:post_detail', kwargs={'post_id': self.posts[0].pk}),
+            {'fields': 'text,unknown'}).json()
+        self.assertEqual(data, {'id': self.posts[0].pk, 'text': 'Пост 0'})
+
+    def test_group_profile_and_comments(self):
+        """Ленты группы, профиля и комментарии фильтруются верно."""
+        group = self.guest_client.get(reverse(
+            'api:group_posts', kwargs={'slug': self.group.slug})).json()
+        self.assertEqual(len(group['results']), 3)
+        profile = self.guest_client.get(reverse(
+            'api:profile_posts', kwargs={'username': 'api_user'}),
+            {'limit': 100}).json()
+        self.assertEqual(len(profile['results']), 7)
+        comments = self.guest_client.get(reverse(
+            'api:comment_list', kwargs={'post_id': self.posts[0].pk}),
+            {'fields': 'text'}).json()
+        self.assertEqual([c['text'] for c in comments['results']],
+                         ['Комментарий 0', 'Комментарий 1', 'Комментарий 2'])
+
+    def test_etag_and_errors(self):
+        """Повтор с If-None-Match даёт 304, битый курсор — 400."""
+        url = reverse('api:post_list')
+        response = self.guest_client.get(url)
+        etag = response['ETag']
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response = self.guest_client.get(url, {'cursor': 'мусор'})
+        self.assertEqual(response.status_code, 400)
+        response = self.guest_client.get(
+            url, {'cursor': encode_cursor('2020-13-45T00:00:00', 1)})
+        self.assertEqual(response.status_code, 400)
+        response = self.guest_client.get(
+            reverse('api:post_detail', kwargs={'post_id': 999}))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,137 @@
+import hashlib
+
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, quote_etag
+from django.views.decorators.http import require_GET
+
+from posts.changes import (CHANGE_FEED_LIMIT, decode_change_cursor,
+                           encode_change_cursor, fetch_changes)
+from posts.models import Comment, Group, Post, User
+from posts.sharding import (for_author, locate_post, on_shard,
+                            scatter_keyset)
+from posts.utils import decode_cursor, encode_cursor, parse_moment
+from yatube.settings import PAGINATOR_PAGE_LIST
+
+from .serializers import (COMMENT_FIELDS, POST_FIELDS, columns_for,
+                          parse_fields, serialize_comment, serialize_post)
+
+MAX_LIMIT = 100
+POST_ORDERING = ('-pub_date', '-id')
+COMMENT_ORDERING = ('created', 'id')
+
+
+def json_response(request, data, status=200):
+    """JSON-ответ с ETag; на совпавший If-None-Match отдаёт 304."""
+    response = JsonResponse(data, status=status,
+                            json_dumps_params={'ensure_ascii': False})
+    if status != 200:
+        return response
+    response['ETag'] = quote_etag(
+        hashlib.md5(response.content).hexdigest())
+    return get_conditional_response(request, etag=response['ETag'],
+                                    response=response)
+
+
+def error(request, message, status):
+    return json_response(request, {'detail': message}, status=status)
+
+
+def parse_limit(request):
+    try:
+        limit = int(request.GET.get('limit', PAGINATOR_PAGE_LIST))
+    except ValueError:
+        return PAGINATOR_PAGE_LIST
+    return min(max(limit, 1), MAX_LIMIT)
+
+
+def parse_after(request):
+    """Ключ (дата, id) из ?cursor=; False для битого курсора."""
+    raw = request.GET.get('cursor')
+    if not raw:
+        return None
+    key = decode_cursor(raw, str, int)
+    date = parse_moment(key[0]) if key else None
+    if date is None:
+        return False
+    return date, key[1]
+
+
+def paginated(request, queryset, available, ordering, serialize):
+    after = parse_after(request)
+    if after is False:
+        return error(request, 'Неверный курсор', 400)
+    fields = parse_fields(request.GET.get('fields'), available)
+    date_column = ordering[0].lstrip('-')
+    # одна выборка values() с JOIN автора и группы, без объектов моделей
+    rows = queryset.values(*columns_for(fields, available, (date_column,)))
+    page, next_key = scatter_keyset(rows, ordering, after,
+                                    parse_limit(request))
+    return json_response(request, {
+        'results': [serialize(row, fields) for row in page],
+        'next': (encode_cursor(next_key[0].isoformat(), next_key[1])
+                 if next_key else None),
+    })
+
+
+def posts_response(request, queryset):
+    return paginated(request, queryset, POST_FIELDS, POST_ORDERING,
+                     serialize_post)
+
+
+@require_GET
+def post_list(request):
+    return posts_response(request, Post.objects.all())
+
+
+@require_GET
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return posts_response(request, Post.objects.filter(group=group))
+
+
+@require_GET
+def profile_posts(request, username):
+    author = get_object_or_404(User, username=username)
+    return posts_response(
+        request, for_author(author.pk, Post.objects.filter(author=author)))
+
+
+@require_GET
+def post_detail(request, post_id):
+    fields = parse_fields(request.GET.get('fields'), POST_FIELDS)
+    row, _ = locate_post(
+        post_id, Post.objects.values(*columns_for(fields, POST_FIELDS, ())))
+    if row is None:
+        return error(request, 'Не найдено', 404)
+    return json_response(request, serialize_post(row, fields))
+
+
+@require_GET
+def comment_list(request, post_id):
+    _, shard = locate_post(post_id, Post.objects.only('pk'))
+    if shard is None:
+        return error(request, 'Не найдено', 404)
+    return paginated(request,
+                     on_shard(Comment.objects.filter(post_id=post_id), shard),
+                     COMMENT_FIELDS, COMMENT_ORDERING, serialize_comment)
+
+
+@require_GET
+def change_list(request):
+    if not request.user.is_staff:
+        return error(request, 'Недостаточно прав', 403)
+    after = decode_change_cursor(request.GET.get('cursor'))
+    if after is False:
+        return error(request, 'Неверный курсор', 400)
+    try:
+        limit = int(request.GET.get('limit', CHANGE_FEED_LIMIT))
+    except ValueError:
+        limit = CHANGE_FEED_LIMIT
+    changes, cursor, has_more = fetch_changes(
+        after, min(max(limit, 1), CHANGE_FEED_LIMIT))
+    return json_response(request, {
+        'changes': changes,
+        'cursor': encode_change_cursor(cursor),
+        'has_more': has_more,
+    })
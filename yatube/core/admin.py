@@ -0,0 +1,56 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from . import jobs
+from .models import Job, OutboxEmail
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'task', 'status', 'priority', 'run_at', 'attempts',
+                    'progress', 'locked_by', 'finished')
+    list_filter = ('status', 'task')
+    search_fields = ('key',)
+    readonly_fields = ('task', 'kwargs', 'key', 'attempts', 'max_attempts',
+                       'progress_done', 'progress_total', 'last_error',
+                       'locked_by', 'locked_at', 'created', 'finished')
+    ordering = ('-pk',)
+    actions = ('retry',)
+    empty_value_display = '-пусто-'
+
+    def progress(self, job):
+        if job.progress_total is None:
+            return job.progress_done or None
+        return f'{job.progress_done}/{job.progress_total}'
+    progress.short_description = 'Прогресс'
+
+    def has_add_permission(self, request):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = dict(extra_context or {}, queue=jobs.queue_stats())
+        return super().changelist_view(request, extra_context)
+
+    def retry(self, request, queryset):
+        count = queryset.exclude(status=Job.RUNNING).update(
+            status=Job.QUEUED, run_at=timezone.now(), attempts=0,
+            finished=None, last_error='')
+        self.message_user(request, f'Возвращено в очередь: {count}')
+    retry.short_description = 'Запустить заново'
+
+
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'recipient', 'subject', 'status', 'attempts',
+                    'send_after', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('recipient',)
+    exclude = ('mime',)
+    readonly_fields = ('from_email', 'recipient', 'subject', 'attempts',
+                       'sent_at', 'last_error', 'created')
+    empty_value_display = '-пусто-'
+
+    def has_add_permission(self, request):
+        return False
+
+
+admin.site.register(Job, JobAdmin)
+admin.site.register(OutboxEmail, OutboxEmailAdmin)
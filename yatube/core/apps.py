@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from . import backfill, mail  # noqa: F401
+        from .sqlite import maintenance  # noqa: F401
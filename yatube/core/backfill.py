@@ -0,0 +1,178 @@
+import time
+from collections import namedtuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from .jobs import enqueue, task
+from .models import BackfillCheckpoint
+
+BACKFILL_TASK = 'core.backfill'
+BACKFILL_CHUNK_SIZE = 500
+BACKFILL_MIN_CHUNK = 10
+BACKFILL_MAX_CHUNK = 10000
+# сколько может длиться транзакция одной порции, секунд
+BACKFILL_TARGET_LATENCY = 0.2
+BACKFILL_PAUSE = 0.05
+
+Backfill = namedtuple('Backfill', ('name', 'model', 'apply', 'pending',
+                                   'aliases', 'chunk_size'))
+_backfills = {}
+
+
+class _Rollback(Exception):
+    pass
+
+
+def backfill(name, model, pending=None, aliases=None,
+             chunk_size=BACKFILL_CHUNK_SIZE):
+    """Регистрирует заполнение колонки для существующих строк.
+
+    Функция получает выборку одной порции и обновляет её сама, обычно
+    через update(). pending(queryset) сужает выборку до строк, которые
+    ещё не заполнены: по ней работают verify и повторные запуски.
+    aliases() — базы, где лежит модель; по умолчанию только default.
+    В шарде точка сохраняется после коммита порции, так что после сбоя
+    порция может выполниться ещё раз: функция должна быть идемпотентной.
+    """
+    def decorator(func):
+        _backfills[name] = Backfill(name, model, func, pending,
+                                    aliases or (lambda: ['default']),
+                                    chunk_size)
+        return func
+    return decorator
+
+
+def get_backfill(name):
+    return _backfills.get(name)
+
+
+def registered():
+    return sorted(_backfills)
+
+
+def _queryset(registered, alias):
+    queryset = registered.model._base_manager.using(alias)
+    if registered.pending:
+        queryset = registered.pending(queryset)
+    return queryset.order_by('pk')
+
+
+def _next_chunk_size(chunk_size, elapsed, target):
+    """Подстраивает порцию так, чтобы транзакция шла около target."""
+    if elapsed <= 0:
+        return min(chunk_size * 2, BACKFILL_MAX_CHUNK)
+    wanted = chunk_size * target / elapsed
+    # не больше чем вдвое за раз, чтобы один выброс не раскачал размер
+    wanted = min(max(wanted, chunk_size / 2), chunk_size * 2)
+    return int(min(max(wanted, BACKFILL_MIN_CHUNK), BACKFILL_MAX_CHUNK))
+
+
+def run_backfill(name, alias='default', chunk_size=None,
+                 target_latency=BACKFILL_TARGET_LATENCY,
+                 pause=BACKFILL_PAUSE, max_chunks=None, progress=None):
+    """Заполняет колонку порциями по pk, начиная с сохранённой точки.
+
+    Каждая порция — своя транзакция, после неё точка сохраняется, так
+    что прерванное заполнение продолжается с места остановки. Размер
+    порции подстраивается под target_latency, а после медленной порции
+    пауза растёт на её длительность. Возвращает число строк.
+    """
+    registered = _backfills[name]
+    checkpoint, _ = BackfillCheckpoint.objects.get_or_create(
+        name=name, alias=alias)
+    chunk_size = (chunk_size or checkpoint.chunk_size
+                  or registered.chunk_size)
+    base = _queryset(registered, alias)
+    remaining = base
+    if checkpoint.last_pk is not None:
+        remaining = base.filter(pk__gt=checkpoint.last_pk)
+    total = checkpoint.done + remaining.count()
+    if progress:
+        progress(checkpoint.done, total)
+    processed = 0
+    chunks = 0
+    while max_chunks is None or chunks < max_chunks:
+        ids = list(remaining.values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            checkpoint.finished = timezone.now()
+            checkpoint.save(update_fields=['finished', 'updated'])
+            break
+        started = time.monotonic()
+        with transaction.atomic(using=alias):
+            registered.apply(
+                registered.model._base_manager.using(alias).filter(
+                    pk__in=ids))
+            # в default точка коммитится вместе с порцией
+            checkpoint.last_pk = ids[-1]
+            checkpoint.done += len(ids)
+            checkpoint.chunk_size = chunk_size
+            checkpoint.finished = None
+            checkpoint.save()
+        elapsed = time.monotonic() - started
+        processed += len(ids)
+        chunks += 1
+        remaining = base.filter(pk__gt=checkpoint.last_pk)
+        if progress:
+            progress(checkpoint.done, total)
+        chunk_size = _next_chunk_size(chunk_size, elapsed, target_latency)
+        time.sleep(pause + max(elapsed - target_latency, 0))
+    return processed
+
+
+def dry_run(name, alias='default', chunk_size=None):
+    """Оценка без изменений: сколько строк осталось и сколько займёт.
+
+    Первая порция применяется в транзакции, которая откатывается,
+    чтобы измерить её длительность на настоящих данных.
+    """
+    registered = _backfills[name]
+    chunk_size = chunk_size or registered.chunk_size
+    checkpoint = BackfillCheckpoint.objects.filter(
+        name=name, alias=alias).first()
+    remaining = _queryset(registered, alias)
+    if checkpoint and checkpoint.last_pk is not None:
+        remaining = remaining.filter(pk__gt=checkpoint.last_pk)
+    rows = remaining.count()
+    ids = list(remaining.values_list('pk', flat=True)[:chunk_size])
+    elapsed = 0.0
+    if ids:
+        started = time.monotonic()
+        try:
+            with transaction.atomic(using=alias):
+                registered.apply(
+                    registered.model._base_manager.using(alias).filter(
+                        pk__in=ids))
+                raise _Rollback
+        except _Rollback:
+            pass
+        elapsed = time.monotonic() - started
+    return {
+        'rows': rows,
+        'chunk_size': chunk_size,
+        'chunk_seconds': elapsed,
+        'estimated_seconds': elapsed * rows / len(ids) if ids else 0.0,
+    }
+
+
+def verify(name, alias='default'):
+    """Число строк, которые всё ещё не заполнены; None без pending."""
+    registered = _backfills[name]
+    if registered.pending is None:
+        return None
+    return _queryset(registered, alias).count()
+
+
+def reset(name, alias='default'):
+    BackfillCheckpoint.objects.filter(name=name, alias=alias).delete()
+
+
+def schedule(name, **kwargs):
+    return enqueue(BACKFILL_TASK, name=name, key=f'{BACKFILL_TASK}:{name}',
+                   **kwargs)
+
+
+@task(BACKFILL_TASK, progress=True)
+def run_backfill_task(name, progress, **kwargs):
+    for alias in _backfills[name].aliases():
+        run_backfill(name, alias, progress=progress, **kwargs)
@@ -0,0 +1,62 @@
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db.models import F
+from django.views.decorators.cache import cache_page
+
+from .models import CacheVersion
+
+# имя кеша -> (поколение, когда прочитано)
+_known = {}
+
+
+def _ttl():
+    return getattr(settings, 'CACHE_VERSION_TTL', 1)
+
+
+def get_version(name):
+    """Текущее поколение кеша name.
+
+    Читается с основной базы не чаще раза в CACHE_VERSION_TTL секунд на
+    процесс: столько после сброса в другом процессе ещё может отдаваться
+    старая страница.
+    """
+    now = time.monotonic()
+    known = _known.get(name)
+    if known is not None and now - known[1] < _ttl():
+        return known[0]
+    version = CacheVersion.objects.using('default').filter(
+        name=name).values_list('version', flat=True).first() or 0
+    _known[name] = (version, now)
+    return version
+
+
+def bump_version(name):
+    """Делает устаревшими ключи кеша name во всех процессах."""
+    updated = CacheVersion.objects.using('default').filter(
+        name=name).update(version=F('version') + 1)
+    if not updated:
+        CacheVersion.objects.using('default').get_or_create(
+            name=name, defaults={'version': 1})
+    _known.pop(name, None)
+
+
+def versioned_cache_page(timeout, name):
+    """cache_page, ключи которого сбрасывает bump_version(name)."""
+    def decorator(view):
+        # представление, обёрнутое cache_page для текущего поколения
+        current = {}
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            version = get_version(name)
+            cached = current.get(version)
+            if cached is None:
+                cached = cache_page(timeout,
+                                    key_prefix=f'{name}.{version}')(view)
+                current.clear()
+                current[version] = cached
+            return cached(request, *args, **kwargs)
+        return wrapper
+    return decorator
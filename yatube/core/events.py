@@ -0,0 +1,154 @@
+import json
+import logging
+import time
+from collections import namedtuple
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F, Min, Q
+from django.utils import timezone
+
+from .models import DeadLetter, HandlerOffset, OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+EVENT_BATCH_SIZE = 100
+# после стольких неудач подряд событие уходит в DeadLetter
+EVENT_MAX_ATTEMPTS = 5
+
+Handler = namedtuple('Handler', ('name', 'topics', 'func', 'max_attempts'),
+                     defaults=(EVENT_MAX_ATTEMPTS,))
+_handlers = {}
+
+
+def handler(name, topics, max_attempts=EVENT_MAX_ATTEMPTS):
+    """Регистрирует обработчик событий outbox.
+
+    Доставка «хотя бы один раз»: при сбое событие придёт повторно,
+    поэтому обработчик должен быть идемпотентным — для этого у события
+    есть idempotency_key. Записи обработчика в основную базу фиксируются
+    в одной транзакции со сдвигом его позиции и не повторяются.
+    """
+    def decorator(func):
+        _handlers[name] = Handler(name, tuple(topics), func, max_attempts)
+        return func
+    return decorator
+
+
+def registered_handlers():
+    return list(_handlers.values())
+
+
+def emit(topic, payload, key):
+    """Кладёт событие в outbox.
+
+    Вызывается внутри транзакции изменения: событие фиксируется вместе
+    с ним или не фиксируется вовсе. Повтор с тем же ключом ничего не делает.
+    """
+    event, _ = OutboxEvent.objects.get_or_create(
+        idempotency_key=key,
+        defaults={
+            'topic': topic,
+            'payload': json.dumps(payload, cls=DjangoJSONEncoder),
+        },
+    )
+    return event
+
+
+def dispatch_handler(item, batch_size=EVENT_BATCH_SIZE):
+    """Передаёт обработчику пачку событий после его позиции.
+
+    Каждое событие обрабатывается в своей транзакции вместе со сдвигом
+    позиции. На ошибке пачка прерывается, и событие будет повторено
+    в следующий раз; после item.max_attempts неудач подряд оно
+    копируется в DeadLetter, и позиция идёт дальше, чтобы одно битое
+    событие не держало обработчик. Порядок id совпадает с порядком
+    коммитов, пока запись в базу идёт по одной транзакции за раз,
+    как в SQLite. Возвращает число событий, пройденных позицией.
+    """
+    offset, _ = HandlerOffset.objects.get_or_create(handler=item.name)
+    events = list(OutboxEvent.objects.filter(
+        id__gt=offset.last_event_id, topic__in=item.topics,
+    ).order_by('id')[:batch_size])
+    done = 0
+    for event in events:
+        try:
+            with transaction.atomic():
+                item.func(event)
+                HandlerOffset.objects.filter(pk=offset.pk).update(
+                    last_event_id=event.pk, processed=F('processed') + 1,
+                    retries=0, last_error='')
+            offset.retries = 0
+        except Exception as error:
+            logger.exception('Обработчик %s упал на событии %s',
+                             item.name, event.pk)
+            if not _record_failure(item, offset, event, error):
+                break
+        done += 1
+    return done
+
+
+def _record_failure(item, offset, event, error):
+    """Учитывает ошибку; True, если событие ушло в DeadLetter."""
+    retries = offset.retries + 1
+    fields = {'failures': F('failures') + 1,
+              'last_error': f'#{event.pk}: {error}', 'retries': retries}
+    dead = retries >= item.max_attempts
+    with transaction.atomic():
+        if dead:
+            DeadLetter.objects.create(
+                handler=item.name, event_id=event.pk, topic=event.topic,
+                payload=event.payload, attempts=retries, error=repr(error))
+            fields.update(last_event_id=event.pk, retries=0)
+        HandlerOffset.objects.filter(pk=offset.pk).update(**fields)
+    offset.retries = fields['retries']
+    return dead
+
+
+def dispatch(batch_size=EVENT_BATCH_SIZE):
+    """Один проход по всем обработчикам; возвращает число событий."""
+    return sum(dispatch_handler(item, batch_size)
+               for item in registered_handlers())
+
+
+def handler_lag():
+    """Отставание обработчиков: число и возраст ждущих событий."""
+    now = timezone.now()
+    stats = []
+    offsets = dict(HandlerOffset.objects.values_list(
+        'handler', 'last_event_id'))
+    for item in registered_handlers():
+        pending = OutboxEvent.objects.filter(
+            id__gt=offsets.get(item.name, 0), topic__in=item.topics)
+        oldest = pending.aggregate(oldest=Min('created'))['oldest']
+        stats.append({
+            'handler': item.name,
+            'offset': offsets.get(item.name, 0),
+            'pending': pending.count(),
+            'dead': DeadLetter.objects.filter(handler=item.name).count(),
+            'lag_seconds': (now - oldest).total_seconds() if oldest else 0.0,
+        })
+    return stats
+
+
+def prune(older_than):
+    """Удаляет старые события, которые уже не нужны ни одному обработчику."""
+    offsets = dict(HandlerOffset.objects.values_list(
+        'handler', 'last_event_id'))
+    condition = Q(created__lt=older_than)
+    for item in registered_handlers():
+        condition &= (Q(id__lte=offsets.get(item.name, 0))
+                      | ~Q(topic__in=item.topics))
+    with transaction.atomic():
+        deleted, _ = OutboxEvent.objects.filter(condition).delete()
+    return deleted
+
+
+def run_dispatcher(batch_size=EVENT_BATCH_SIZE, interval=1.0,
+                   iterations=None):
+    """Крутит dispatch в цикле; ждёт interval, когда событий нет."""
+    count = 0
+    while iterations is None or count < iterations:
+        count += 1
+        if not dispatch(batch_size):
+            time.sleep(interval)
@@ -0,0 +1,227 @@
+import json
+import logging
+import os
+import socket
+import threading
+import uuid
+from collections import namedtuple
+from datetime import timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, connections, transaction
+from django.db.models import Count, Subquery
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+BACKOFF_BASE = 5
+BACKOFF_MAX = 3600
+# задача, взятая исполнителем дольше этого, считается брошенной
+LOCK_TIMEOUT = timedelta(minutes=30)
+
+Task = namedtuple('Task', ('name', 'func', 'max_attempts', 'progress'))
+_tasks = {}
+
+
+def task(name=None, max_attempts=5, progress=False):
+    """Регистрирует функцию как фоновую задачу.
+
+    Аргументы задачи передаются именованными и должны сериализоваться
+    в JSON. С progress=True функция получает ещё и progress(done, total).
+    """
+    def decorator(func):
+        task_name = name or f'{func.__module__}.{func.__name__}'
+        _tasks[task_name] = Task(task_name, func, max_attempts, progress)
+        func.task_name = task_name
+        return func
+    return decorator
+
+
+def get_task(name):
+    return _tasks.get(name)
+
+
+def enqueue(task_name, priority=0, run_at=None, key='', **kwargs):
+    """Ставит задачу в очередь.
+
+    С непустым key в очереди не бывает двух ждущих задач с одним ключом,
+    а выполняется из них не больше одной за раз. Пока задача с ключом
+    выполняется, можно поставить ещё одну: она подхватит то, что
+    появилось после начала первой.
+    """
+    registered = _tasks[task_name]
+    if key:
+        existing = Job.objects.filter(key=key, status=Job.QUEUED).first()
+        if existing:
+            return existing
+    return Job.objects.create(
+        task=task_name,
+        kwargs=json.dumps(kwargs, cls=DjangoJSONEncoder),
+        key=key,
+        priority=priority,
+        run_at=run_at or timezone.now(),
+        max_attempts=registered.max_attempts,
+    )
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+
+def claim(worker):
+    """Забирает следующую задачу, готовую к запуску, или None.
+
+    На базах с SKIP LOCKED используется SELECT ... FOR UPDATE SKIP LOCKED.
+    В SQLite запись и так идёт по одной транзакции, поэтому задача
+    захватывается одним UPDATE ... WHERE id = (SELECT ...), и двум
+    исполнителям одна задача не достанется.
+    """
+    now = timezone.now()
+    running_keys = Job.objects.filter(status=Job.RUNNING).exclude(
+        key='').values('key')
+    ready = Job.objects.filter(status=Job.QUEUED, run_at__lte=now).exclude(
+        key__gt='', key__in=running_keys).order_by('-priority', 'run_at', 'id')
+    token = f'{worker}:{uuid.uuid4().hex[:8]}'
+    with transaction.atomic():
+        if connection.features.has_select_for_update_skip_locked:
+            job = ready.select_for_update(skip_locked=True).first()
+            if job is None:
+                return None
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.RUNNING, locked_by=token, locked_at=now)
+        else:
+            claimed = Job.objects.filter(
+                pk=Subquery(ready.values('pk')[:1]), status=Job.QUEUED,
+            ).update(status=Job.RUNNING, locked_by=token, locked_at=now)
+            if not claimed:
+                return None
+        return Job.objects.filter(locked_by=token).first()
+
+
+def _backoff(attempts):
+    return timedelta(seconds=min(BACKOFF_BASE * 2 ** (attempts - 1),
+                                 BACKOFF_MAX))
+
+
+def run_job(job):
+    """Выполняет захваченную задачу и записывает результат.
+
+    При ошибке задача возвращается в очередь с экспоненциальной паузой,
+    пока не кончатся попытки.
+    """
+    registered = _tasks.get(job.task)
+    attempts = job.attempts + 1
+    if registered is None:
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.FAILED, attempts=attempts, finished=timezone.now(),
+            last_error=f'Неизвестная задача {job.task}')
+        return False
+    kwargs = job.data
+    if registered.progress:
+        def progress(done, total=None):
+            fields = {'progress_done': done}
+            if total is not None:
+                fields['progress_total'] = total
+            Job.objects.filter(pk=job.pk).update(**fields)
+        kwargs['progress'] = progress
+    try:
+        registered.func(**kwargs)
+    except Exception as error:
+        logger.exception('Задача %s #%s упала', job.task, job.pk)
+        if attempts >= job.max_attempts:
+            fields = {'status': Job.FAILED, 'finished': timezone.now()}
+        else:
+            fields = {'status': Job.QUEUED,
+                      'run_at': timezone.now() + _backoff(attempts)}
+        Job.objects.filter(pk=job.pk).update(
+            attempts=attempts, last_error=repr(error), locked_by='',
+            locked_at=None, **fields)
+        return False
+    Job.objects.filter(pk=job.pk).update(
+        status=Job.DONE, attempts=attempts, finished=timezone.now(),
+        last_error='')
+    return True
+
+
+def requeue_stale(timeout=LOCK_TIMEOUT):
+    """Возвращает в очередь задачи упавших исполнителей."""
+    return Job.objects.filter(
+        status=Job.RUNNING, locked_at__lt=timezone.now() - timeout,
+    ).update(status=Job.QUEUED, locked_by='', locked_at=None)
+
+
+def work_off(worker=None, limit=None):
+    """Выполняет готовые задачи, пока они есть; возвращает их число."""
+    worker = worker or worker_name()
+    count = 0
+    while limit is None or count < limit:
+        job = claim(worker)
+        if job is None:
+            break
+        run_job(job)
+        count += 1
+    return count
+
+
+def work_loop(stop, poll_interval=1.0):
+    """Цикл исполнителя: берёт задачи, пока не выставлен stop."""
+    worker = worker_name()
+    try:
+        while not stop.is_set():
+            if not work_off(worker, limit=1):
+                stop.wait(poll_interval)
+    finally:
+        # у каждого потока своё соединение с базой
+        connections.close_all()
+
+
+def queue_stats():
+    """Глубина очереди для мониторинга."""
+    now = timezone.now()
+    counts = dict.fromkeys(dict(Job.STATUS_CHOICES), 0)
+    counts.update(Job.objects.order_by().values_list('status').annotate(
+        total=Count('id')))
+    due = Job.objects.filter(status=Job.QUEUED, run_at__lte=now)
+    oldest = due.order_by('run_at').values_list('run_at', flat=True).first()
+    return {
+        'counts': counts,
+        'due': due.count(),
+        'oldest_due_seconds': (now - oldest).total_seconds() if oldest else 0,
+    }
+
+
+def _burst(worker):
+    try:
+        work_off(worker)
+    finally:
+        connections.close_all()
+
+
+def run_workers(concurrency=2, poll_interval=1.0, burst=False):
+    """Запускает потоки-исполнители и ждёт их завершения.
+
+    В режиме burst потоки выходят, когда готовых задач не осталось;
+    иначе работают до Ctrl+C.
+    """
+    requeue_stale()
+    stop = threading.Event()
+    threads = []
+    for number in range(concurrency):
+        if burst:
+            thread = threading.Thread(target=_burst,
+                                      args=(f'{worker_name()}-{number}',))
+        else:
+            thread = threading.Thread(target=work_loop,
+                                      args=(stop, poll_interval))
+        thread.start()
+        threads.append(thread)
+    try:
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(timeout=0.5)
+    except KeyboardInterrupt:
+        stop.set()
+        for thread in threads:
+            thread.join()
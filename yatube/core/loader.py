@@ -0,0 +1,114 @@
+import contextvars
+from collections import defaultdict
+
+from django.db import models, router
+from django.db.models.fields.related_descriptors import (
+    ForwardManyToOneDescriptor)
+from django.db.models.query import ModelIterable
+
+# Подписки загрузчик не грузит: состояние подписки читается только
+# в профиле, одним EXISTS на страницу. Если ленты начнут показывать его
+# на каждой карточке, его стоит брать одним запросом
+# Follow.objects.filter(user=..., author_id__in=...) и запоминать в этой
+# же области запроса рядом с load().
+
+# состояние текущего запроса; вне запроса загрузчик выключен
+_scope = contextvars.ContextVar('loader_scope', default=None)
+
+
+class _Scope:
+    __slots__ = ('objects', 'batches')
+
+    def __init__(self):
+        # (модель, база) -> {pk: объект}
+        self.objects = {}
+        # id(объект) -> выборка, в которой он пришёл
+        self.batches = {}
+
+
+def begin_scope():
+    """Включает пакетную загрузку связей до end_scope."""
+    return _scope.set(_Scope())
+
+
+def end_scope(token):
+    _scope.reset(token)
+
+
+def load(model, keys, using='default'):
+    """Объекты model по pk одним запросом IN: {pk: объект}.
+
+    В области запроса уже загруженные объекты берутся из памяти,
+    так что один автор на странице и в комментариях читается один раз.
+    """
+    scope = _scope.get()
+    if scope is None:
+        cache = {}
+    else:
+        cache = scope.objects.setdefault((model, using), {})
+    keys = set(keys) - {None}
+    missing = keys - cache.keys()
+    if missing:
+        cache.update(model._base_manager.using(using).in_bulk(missing))
+    return {key: cache[key] for key in keys if key in cache}
+
+
+def register_batch(objects):
+    """Объекты, связи которых грузятся вместе при первом обращении."""
+    scope = _scope.get()
+    if scope is None or len(objects) < 2:
+        return
+    for obj in objects:
+        scope.batches[id(obj)] = objects
+
+
+class BatchedForwardDescriptor(ForwardManyToOneDescriptor):
+    """post.author, который в запросе грузит авторов всей выборки.
+
+    Первое обращение к связи у одного объекта выборки собирает ключи
+    всех её объектов без загруженной связи и читает их одним IN по
+    каждой базе. Вне запроса работает как обычный внешний ключ.
+    """
+
+    def __get__(self, instance, cls=None):
+        if (instance is not None and _scope.get() is not None
+                and not self.field.is_cached(instance)):
+            self._load_batch(instance)
+        return super().__get__(instance, cls)
+
+    def _load_batch(self, instance):
+        field = self.field
+        model = field.related_model
+        siblings = _scope.get().batches.get(id(instance), [instance])
+        by_alias = defaultdict(list)
+        for obj in siblings:
+            if (getattr(obj, field.attname) is not None
+                    and not field.is_cached(obj)):
+                by_alias[router.db_for_read(model, instance=obj)].append(obj)
+        for alias, objects in by_alias.items():
+            related = load(model, (getattr(obj, field.attname)
+                                   for obj in objects), alias)
+            for obj in objects:
+                value = related.get(getattr(obj, field.attname))
+                if value is not None:
+                    field.set_cached_value(obj, value)
+
+
+def batch_relations(model, *names):
+    """Ставит пакетную загрузку на внешние ключи модели."""
+    for name in names:
+        setattr(model, name,
+                BatchedForwardDescriptor(model._meta.get_field(name)))
+
+
+class BatchedQuerySet(models.QuerySet):
+    """Выборка, объекты которой загрузчик считает одной пачкой."""
+
+    def _fetch_all(self):
+        fresh = self._result_cache is None
+        super()._fetch_all()
+        if fresh and self._iterable_class is ModelIterable:
+            register_batch(self._result_cache)
+
+
+BatchedManager = models.Manager.from_queryset(BatchedQuerySet)
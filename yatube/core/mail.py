@@ -0,0 +1,164 @@
+import logging
+from datetime import timedelta
+from email import message_from_bytes
+from email.message import Message
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db.models import Count
+from django.utils import timezone
+
+from .jobs import enqueue, task
+from .models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+MAIL_BATCH_SIZE = 100
+MAIL_MAX_ATTEMPTS = 5
+MAIL_BACKOFF_BASE = 30
+SEND_TASK = 'core.send_outbox_mail'
+
+
+def delivery_backend():
+    """Бэкенд, которым пакетный отправитель реально доставляет письма."""
+    return getattr(settings, 'MAIL_DELIVERY_BACKEND',
+                   'django.core.mail.backends.filebased.EmailBackend')
+
+
+def recipient_limit():
+    """(писем, окно в секундах) на одного получателя."""
+    return getattr(settings, 'MAIL_RECIPIENT_LIMIT', (5, 3600))
+
+
+class StoredMIME(Message):
+    """Сохранённый MIME письма с as_bytes(linesep=...), как у SafeMIME."""
+
+    def as_bytes(self, unixfrom=False, linesep='\n'):
+        return super().as_bytes(unixfrom,
+                                policy=self.policy.clone(linesep=linesep))
+
+
+def _plain_text(mime):
+    for part in mime.walk():
+        if (part.get_content_type() == 'text/plain'
+                and not part.get_filename()):
+            charset = part.get_content_charset() or 'utf-8'
+            return part.get_payload(decode=True).decode(charset, 'replace')
+    return ''
+
+
+class StoredEmailMessage(EmailMessage):
+    """Письмо из OutboxEmail: готовый MIME и один адрес в конверте.
+
+    Заголовки и вложения берутся из MIME как есть; body заполняется
+    текстовой частью только для бэкендов вроде locmem.
+    """
+
+    def __init__(self, email):
+        self.mime = message_from_bytes(bytes(email.mime), _class=StoredMIME)
+        super().__init__(subject=email.subject, body=_plain_text(self.mime),
+                         from_email=email.from_email, to=[email.recipient])
+
+    def message(self):
+        return self.mime
+
+
+class OutboxEmailBackend(BaseEmailBackend):
+    """Сохраняет письма в базу и сразу возвращает управление.
+
+    Письмо хранится готовым MIME, по строке на каждого получателя из
+    To, Cc и Bcc: так ограничение частоты считается для каждого адреса.
+    Доставкой занимается send_outbox_mail: задача ставится в очередь
+    вместе с письмами, одна на все ждущие письма.
+    """
+
+    def send_messages(self, email_messages):
+        rows = []
+        count = 0
+        for message in email_messages:
+            if not message.recipients():
+                continue
+            count += 1
+            mime = message.message().as_bytes()
+            rows += [
+                OutboxEmail(from_email=message.from_email,
+                            recipient=recipient.lower(),
+                            subject=message.subject[:255], mime=mime)
+                for recipient in message.recipients()
+            ]
+        if not rows:
+            return 0
+        OutboxEmail.objects.bulk_create(rows)
+        enqueue(SEND_TASK, key=SEND_TASK)
+        return count
+
+
+def _backoff(attempts):
+    return timedelta(seconds=MAIL_BACKOFF_BASE * 2 ** (attempts - 1))
+
+
+def send_batch(batch_size=MAIL_BATCH_SIZE, connection=None):
+    """Отправляет пачку ждущих писем через одно соединение.
+
+    Получателю, которому за окно уже ушло сколько положено, письмо
+    откладывается до освобождения места. Упавшие письма повторяются
+    с растущей паузой. Рассчитан на одного отправителя за раз — его
+    гарантирует ключ задачи в очереди. Возвращает число обработанных писем.
+    """
+    now = timezone.now()
+    emails = list(OutboxEmail.objects.filter(
+        status=OutboxEmail.QUEUED, send_after__lte=now,
+    ).order_by('id')[:batch_size])
+    if not emails:
+        return 0
+    limit, window = recipient_limit()
+    since = now - timedelta(seconds=window)
+    sent_recently = dict(OutboxEmail.objects.filter(
+        recipient__in={email.recipient for email in emails},
+        status=OutboxEmail.SENT, sent_at__gt=since,
+    ).order_by().values_list('recipient').annotate(total=Count('id')))
+    connection = connection or get_connection(delivery_backend())
+    connection.open()
+    try:
+        for email in emails:
+            if sent_recently.get(email.recipient, 0) >= limit:
+                email.send_after = now + timedelta(seconds=window)
+                email.save(update_fields=['send_after'])
+                continue
+            email.attempts += 1
+            try:
+                connection.send_messages([StoredEmailMessage(email)])
+            except Exception as error:
+                logger.exception('Письмо #%s не отправлено', email.pk)
+                email.last_error = repr(error)
+                if email.attempts >= MAIL_MAX_ATTEMPTS:
+                    email.status = OutboxEmail.FAILED
+                else:
+                    email.send_after = now + _backoff(email.attempts)
+                # соединение могло порваться — открываем заново
+                connection.close()
+                connection.open()
+            else:
+                email.status = OutboxEmail.SENT
+                email.sent_at = timezone.now()
+                email.last_error = ''
+                sent_recently[email.recipient] = sent_recently.get(
+                    email.recipient, 0) + 1
+            email.save(update_fields=['status', 'attempts', 'send_after',
+                                      'sent_at', 'last_error'])
+    finally:
+        connection.close()
+    return len(emails)
+
+
+@task(SEND_TASK)
+def send_outbox_mail(batch_size=MAIL_BATCH_SIZE):
+    while send_batch(batch_size):
+        pass
+    # отложенным письмам нужен ещё один проход, когда подойдёт время
+    next_due = OutboxEmail.objects.filter(
+        status=OutboxEmail.QUEUED).order_by('send_after').values_list(
+        'send_after', flat=True).first()
+    if next_due is not None:
+        enqueue(SEND_TASK, run_at=next_due, key=SEND_TASK)
@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import backfill
+
+
+class Command(BaseCommand):
+    help = 'Заполняет новую колонку у существующих строк порциями.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', nargs='?',
+                            help='зарегистрированное заполнение')
+        parser.add_argument('--list', action='store_true',
+                            help='показать зарегистрированные')
+        parser.add_argument('--database', action='append',
+                            help='база; по умолчанию все базы модели')
+        parser.add_argument('--chunk-size', type=int, default=None)
+        parser.add_argument('--target-latency', type=float,
+                            default=backfill.BACKFILL_TARGET_LATENCY,
+                            help='желаемая длительность порции, секунд')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='только оценить объём и время')
+        parser.add_argument('--verify', action='store_true',
+                            help='посчитать ещё не заполненные строки')
+        parser.add_argument('--reset', action='store_true',
+                            help='начать с начала, забыв точку')
+        parser.add_argument('--background', action='store_true',
+                            help='поставить задачу в очередь')
+
+    def handle(self, *args, **options):
+        if options['list'] or not options['name']:
+            for name in backfill.registered():
+                self.stdout.write(name)
+            return
+        name = options['name']
+        registered = backfill.get_backfill(name)
+        if registered is None:
+            raise CommandError(f'Заполнение {name} не зарегистрировано')
+        if options['background']:
+            job = backfill.schedule(
+                name, chunk_size=options['chunk_size'],
+                target_latency=options['target_latency'])
+            self.stdout.write(f'Задача #{job.pk} в очереди')
+            return
+        for alias in options['database'] or registered.aliases():
+            if options['reset']:
+                backfill.reset(name, alias)
+            if options['dry_run']:
+                estimate = backfill.dry_run(name, alias,
+                                            options['chunk_size'])
+                self.stdout.write(
+                    '{alias}: осталось строк {rows}, порция {chunk_size} '
+                    'за {chunk_seconds:.3f} с, всего ~{estimated_seconds:.0f}'
+                    ' с'.format(alias=alias, **estimate))
+            elif options['verify']:
+                left = backfill.verify(name, alias)
+                if left is None:
+                    raise CommandError(f'У {name} нет условия pending')
+                style = self.style.SUCCESS if not left else self.style.ERROR
+                self.stdout.write(style(f'{alias}: не заполнено {left}'))
+            else:
+                done = backfill.run_backfill(
+                    name, alias, options['chunk_size'],
+                    options['target_latency'],
+                    progress=lambda done, total: self.stdout.write(
+                        f'{alias}: {done}/{total}'))
+                self.stdout.write(self.style.SUCCESS(
+                    f'{alias}: заполнено строк {done}'))
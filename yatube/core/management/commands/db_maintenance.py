@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+
+from core.jobs import enqueue
+from core.sqlite import maintenance
+
+
+class Command(BaseCommand):
+    help = ('Обновляет статистику планировщика, возвращает свободные '
+            'страницы и показывает состояние индексов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', action='append',
+                            help='база; по умолчанию все SQLite, '
+                                 'кроме реплик')
+        parser.add_argument('--time-limit', type=float,
+                            default=maintenance.MAINTENANCE_TIME_LIMIT,
+                            help='не дольше N секунд на базу')
+        parser.add_argument('--vacuum-step', type=int,
+                            default=maintenance.VACUUM_STEP_PAGES,
+                            help='страниц за шаг incremental vacuum')
+        parser.add_argument('--full-analyze', action='store_true',
+                            help='ANALYZE вместо PRAGMA optimize')
+        parser.add_argument('--report', action='store_true',
+                            help='показать размер и фрагментацию индексов')
+        parser.add_argument('--enable-incremental', action='store_true',
+                            help='включить auto_vacuum=INCREMENTAL полным '
+                                 'VACUUM (блокирует базу)')
+        parser.add_argument('--schedule', type=int, default=None,
+                            metavar='HOURS',
+                            help='не выполнять сейчас, а поставить задачу '
+                                 'в очередь с повтором раз в N часов')
+
+    def handle(self, *args, **options):
+        if options['schedule']:
+            job = enqueue(maintenance.MAINTENANCE_TASK,
+                          time_limit=options['time_limit'],
+                          repeat_hours=options['schedule'],
+                          key=maintenance.MAINTENANCE_TASK)
+            self.stdout.write(f'Задача #{job.pk} в очереди')
+            return
+        for alias in options['database'] or maintenance.maintained_aliases():
+            if options['enable_incremental']:
+                maintenance.enable_incremental_vacuum(alias)
+                self.stdout.write(f'{alias}: auto_vacuum=INCREMENTAL')
+            result = maintenance.maintain(
+                alias, options['time_limit'], options['full_analyze'],
+                options['vacuum_step'], options['report'])
+            vacuum = result['vacuum']
+            self.stdout.write(
+                f'{alias}: ANALYZE {result["analyze_seconds"]:.2f} с, '
+                f'освобождено страниц {vacuum["freed_pages"]} '
+                f'за {vacuum["steps"]} шагов, '
+                f'свободных осталось {vacuum["free_pages"]}')
+            if vacuum['auto_vacuum'] != maintenance.AUTO_VACUUM_INCREMENTAL:
+                self.stdout.write(self.style.WARNING(
+                    f'{alias}: incremental vacuum выключен, '
+                    f'см. --enable-incremental'))
+            for row in result.get('indexes', []):
+                self.stdout.write(
+                    '  {index:<40} {size:>10} байт  заполнение {fill:.0%}  '
+                    'фрагментация {fragmentation:.0%}'.format(**row))
@@ -0,0 +1,46 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core import events
+
+
+class Command(BaseCommand):
+    help = 'Разбирает outbox доменных событий и передаёт их обработчикам.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=events.EVENT_BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true',
+                            help='работать постоянно')
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='пауза, когда событий нет, в секундах')
+        parser.add_argument('--stats', action='store_true',
+                            help='только показать отставание обработчиков')
+        parser.add_argument('--prune-days', type=int, default=None,
+                            help='удалить обработанные события старше N '
+                                 'дней')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            for row in events.handler_lag():
+                self.stdout.write(
+                    '{handler}: позиция {offset}, ждут {pending}, '
+                    'отставание {lag_seconds:.1f} с, '
+                    'не обработано {dead}'.format(**row))
+            return
+        if options['loop']:
+            events.run_dispatcher(options['batch_size'], options['interval'])
+            return
+        total = 0
+        while True:
+            done = events.dispatch(options['batch_size'])
+            total += done
+            if not done:
+                break
+        self.stdout.write(f'Доставлено событий: {total}')
+        if options['prune_days'] is not None:
+            deleted = events.prune(
+                timezone.now() - timedelta(days=options['prune_days']))
+            self.stdout.write(f'Удалено событий: {deleted}')
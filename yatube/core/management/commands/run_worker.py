@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from core import jobs
+
+
+class Command(BaseCommand):
+    help = 'Выполняет задачи из очереди в базе данных.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=2,
+                            help='число потоков-исполнителей')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='пауза, когда задач нет, в секундах')
+        parser.add_argument('--burst', action='store_true',
+                            help='выйти, когда готовых задач не останется')
+        parser.add_argument('--stats', action='store_true',
+                            help='только показать глубину очереди')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            stats = jobs.queue_stats()
+            for status, total in stats['counts'].items():
+                self.stdout.write(f'{status}: {total}')
+            self.stdout.write(
+                'готовы к запуску: {due}, старейшая ждёт '
+                '{oldest_due_seconds:.1f} с'.format(**stats))
+            return
+        jobs.run_workers(options['concurrency'], options['poll_interval'],
+                         options['burst'])
@@ -0,0 +1,53 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.sqlite.snapshot import (SNAPSHOT_PAGES, SNAPSHOT_SLEEP,
+                                  SnapshotError, snapshot)
+
+STATS_FILE = 'snapshots.jsonl'
+
+
+class Command(BaseCommand):
+    help = 'Снимает копию базы SQLite на ходу, не останавливая запись.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?',
+                            help='файл снимка; по умолчанию в SNAPSHOT_DIR')
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--pages', type=int, default=SNAPSHOT_PAGES,
+                            help='страниц за шаг копирования')
+        parser.add_argument('--sleep', type=float, default=SNAPSHOT_SLEEP,
+                            help='пауза между шагами, секунд')
+        parser.add_argument('--gzip', action='store_true',
+                            help='сжать снимок')
+        parser.add_argument('--quick', action='store_true',
+                            help='quick_check вместо integrity_check')
+
+    def handle(self, *args, **options):
+        alias = options['database']
+        path = options['path']
+        if not path:
+            stamp = timezone.now().strftime('%Y%m%d-%H%M%S')
+            extension = '.sqlite3.gz' if options['gzip'] else '.sqlite3'
+            os.makedirs(settings.SNAPSHOT_DIR, exist_ok=True)
+            path = os.path.join(settings.SNAPSHOT_DIR,
+                                f'{alias}-{stamp}{extension}')
+        try:
+            stats = snapshot(alias, path, options['pages'], options['sleep'],
+                             options['gzip'], options['quick'])
+        except SnapshotError as error:
+            raise CommandError(str(error))
+        stats['created'] = timezone.now().isoformat()
+        # история снимков рядом с ними: сколько длились и сколько весят
+        stats_path = os.path.join(os.path.dirname(os.path.abspath(path)),
+                                  STATS_FILE)
+        with open(stats_path, 'a') as log:
+            log.write(json.dumps(stats) + '\n')
+        size = stats.get('compressed_size', stats['size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Снимок {path}: {size} байт, {stats["steps"]} шагов, '
+            f'{stats["total_seconds"]:.2f} с'))
@@ -0,0 +1,39 @@
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand
+
+from core.sqlite import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает конфигурации SQLite под параллельной нагрузкой '
+            'из нескольких процессов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--config', action='append',
+                            choices=sorted(benchmark.CONFIGS),
+                            help='конфигурация; по умолчанию все')
+        parser.add_argument('--readers', type=int, default=4,
+                            help='процессов-читателей')
+        parser.add_argument('--writers', type=int, default=4,
+                            help='процессов-писателей')
+        parser.add_argument('--duration', type=float, default=5.0,
+                            help='длительность замера, секунд')
+        parser.add_argument('--rows', type=int, default=10000,
+                            help='постов в тестовой базе')
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'{"конфигурация":<12} {"чтений/с":>10} {"записей/с":>10} '
+            f'{"ошибок":>7} {"p50 мс":>8} {"p95 мс":>8} {"p99 мс":>8}')
+        with tempfile.TemporaryDirectory() as directory:
+            for name in options['config'] or list(benchmark.CONFIGS):
+                result = benchmark.run(
+                    os.path.join(directory, f'{name}.sqlite3'), name,
+                    options['readers'], options['writers'],
+                    options['duration'], options['rows'])
+                self.stdout.write(
+                    '{config:<12} {reads_per_sec:>10.0f} '
+                    '{writes_per_sec:>10.0f} {errors:>7} {wait_p50:>8.2f} '
+                    '{wait_p95:>8.2f} {wait_p99:>8.2f}'.format(**result))
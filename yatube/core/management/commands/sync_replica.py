@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+def sync_replica(alias, source='default'):
+    """Копирует основную базу SQLite в файл реплики целиком.
+
+    Стенд для разработки и тестов: между вызовами реплика отстаёт
+    от основной базы, как настоящая асинхронная реплика.
+    """
+    for name in (source, alias):
+        if connections[name].vendor != 'sqlite':
+            raise CommandError(f'{name}: поддерживается только SQLite')
+        connections[name].ensure_connection()
+    connections[source].connection.backup(connections[alias].connection)
+
+
+class Command(BaseCommand):
+    help = 'Обновляет SQLite-реплику копией основной базы.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('alias', nargs='?', default='replica')
+
+    def handle(self, *args, **options):
+        sync_replica(options['alias'])
+        if options['verbosity']:
+            self.stdout.write(f'Реплика {options["alias"]} обновлена')
@@ -0,0 +1,57 @@
+import time
+
+from django.conf import settings
+
+from . import loader
+from .routers import begin_scope, end_scope
+
+PIN_COOKIE = 'pin_primary'
+
+
+class ReplicaStickinessMiddleware:
+    """Читать свои записи: после записи запросы идут в основную базу.
+
+    Пользователь, который что-то записал, получает куку со сроком
+    REPLICA_PIN_SECONDS; пока она действует, его чтения не попадают
+    на отстающую реплику.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        window = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+        pinned = request.method not in ('GET', 'HEAD', 'OPTIONS')
+        try:
+            pinned = pinned or float(
+                request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+        except ValueError:
+            pass
+        token = begin_scope(pinned)
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = end_scope(token)
+        if wrote:
+            response.set_cookie(PIN_COOKIE, str(int(time.time() + window)),
+                                max_age=window, httponly=True)
+        return response
+
+
+class BatchLoaderMiddleware:
+    """Область пакетного загрузчика связей на время запроса.
+
+    Объекты одной выборки получают автора, группу и прочие внешние
+    ключи одним запросом IN на модель, а уже загруженное за запрос
+    берётся из памяти; см. core/loader.py.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = loader.begin_scope()
+        try:
+            return self.get_response(request)
+        finally:
+            loader.end_scope(token)
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:39
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_outbox_email'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackfillCheckpoint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Заполнение')),
+                ('alias', models.CharField(default='default', max_length=100, verbose_name='База')),
+                ('last_pk', models.BigIntegerField(blank=True, null=True, verbose_name='Последний pk')),
+                ('done', models.BigIntegerField(default=0, verbose_name='Обработано строк')),
+                ('chunk_size', models.PositiveIntegerField(default=0, verbose_name='Размер порции')),
+                ('started', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Начато')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+                ('finished', models.DateTimeField(blank=True, null=True, verbose_name='Завершено')),
+            ],
+            options={
+                'verbose_name': 'заполнение колонки',
+                'verbose_name_plural': 'заполнения колонок',
+                'unique_together': {('name', 'alias')},
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 2.2.16 on 2026-10-19 10:11
+
+import base64
+import pickle
+
+from django.db import migrations, models
+
+
+def pickled_to_mime(apps, schema_editor):
+    # разовый перевод ещё не отправленных писем, которые до этой миграции
+    # записал сам OutboxEmailBackend; дальше pickle нигде не читается
+    OutboxEmail = apps.get_model('core', 'OutboxEmail')
+    emails = OutboxEmail.objects.using(schema_editor.connection.alias)
+    for email in emails.filter(status='queued').exclude(message=''):
+        message = pickle.loads(base64.b64decode(email.message))
+        recipients = [address.lower() for address in message.recipients()]
+        email.from_email = message.from_email
+        email.mime = message.message().as_bytes()
+        email.recipient = recipients[0]
+        email.save(using=schema_editor.connection.alias)
+        for recipient in recipients[1:]:
+            email.pk = None
+            email.recipient = recipient
+            email.save(using=schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_dead_letter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxemail',
+            name='from_email',
+            field=models.CharField(blank=True, max_length=254, verbose_name='Отправитель'),
+        ),
+        migrations.AddField(
+            model_name='outboxemail',
+            name='mime',
+            field=models.BinaryField(default=b'', verbose_name='Письмо'),
+        ),
+        migrations.RunPython(pickled_to_mime, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='outboxemail',
+            name='message',
+        ),
+    ]
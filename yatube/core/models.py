@@ -0,0 +1,184 @@
+import json
+
+from django.db import models
+from django.utils import timezone
+
+
+class OutboxEvent(models.Model):
+    """Доменное событие, записанное в той же транзакции, что и изменение."""
+    topic = models.CharField(max_length=100, db_index=True)
+    payload = models.TextField(default='{}')
+    idempotency_key = models.CharField(max_length=200, unique=True)
+    created = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ('id',)
+
+    def __str__(self):
+        return f'#{self.pk} {self.topic}'
+
+    @property
+    def data(self):
+        return json.loads(self.payload)
+
+
+class HandlerOffset(models.Model):
+    """Позиция обработчика в outbox и его метрики."""
+    handler = models.CharField(max_length=100, unique=True)
+    last_event_id = models.BigIntegerField(default=0)
+    processed = models.BigIntegerField(default=0)
+    failures = models.BigIntegerField(default=0)
+    # неудачные попытки подряд на событии после last_event_id
+    retries = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.handler} @ {self.last_event_id}'
+
+
+class DeadLetter(models.Model):
+    """Событие, которое обработчик так и не смог обработать.
+
+    Копия события хранится здесь, чтобы его можно было разобрать или
+    повторить вручную после того, как prune удалит его из outbox.
+    """
+    handler = models.CharField(max_length=100, db_index=True)
+    event_id = models.BigIntegerField()
+    topic = models.CharField(max_length=100)
+    payload = models.TextField(default='{}')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ('id',)
+
+    def __str__(self):
+        return f'{self.handler}: #{self.event_id} {self.topic}'
+
+
+class Job(models.Model):
+    """Фоновая задача в очереди на базе данных."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'в очереди'),
+        (RUNNING, 'выполняется'),
+        (DONE, 'готово'),
+        (FAILED, 'ошибка'),
+    )
+
+    task = models.CharField('Задача', max_length=100)
+    kwargs = models.TextField('Аргументы', default='{}')
+    key = models.CharField('Ключ', max_length=200, blank=True,
+                           db_index=True)
+    priority = models.SmallIntegerField('Приоритет', default=0)
+    run_at = models.DateTimeField('Запустить после', default=timezone.now)
+    status = models.CharField('Статус', max_length=10,
+                              choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField('Попытки', default=0)
+    max_attempts = models.PositiveSmallIntegerField('Максимум попыток',
+                                                    default=5)
+    progress_done = models.BigIntegerField('Сделано', default=0)
+    progress_total = models.BigIntegerField('Всего', null=True, blank=True)
+    last_error = models.TextField('Ошибка', blank=True)
+    locked_by = models.CharField('Исполнитель', max_length=100, blank=True)
+    locked_at = models.DateTimeField('Взята', null=True, blank=True)
+    created = models.DateTimeField('Создана', default=timezone.now)
+    finished = models.DateTimeField('Завершена', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'задача'
+        verbose_name_plural = 'задачи'
+        indexes = [
+            models.Index(fields=['status', '-priority', 'run_at'],
+                         name='core_job_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f'#{self.pk} {self.task} ({self.status})'
+
+    @property
+    def data(self):
+        return json.loads(self.kwargs)
+
+
+class OutboxEmail(models.Model):
+    """Письмо, ждущее отправки пакетным отправителем."""
+    QUEUED = 'queued'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'ждёт отправки'),
+        (SENT, 'отправлено'),
+        (FAILED, 'ошибка'),
+    )
+
+    from_email = models.CharField('Отправитель', max_length=254,
+                                  blank=True)
+    recipient = models.CharField('Получатель', max_length=254)
+    subject = models.CharField('Тема', max_length=255, blank=True)
+    # письмо целиком, как его отдаёт EmailMessage.message().as_bytes()
+    mime = models.BinaryField('Письмо', default=b'')
+    status = models.CharField('Статус', max_length=10,
+                              choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField('Попытки', default=0)
+    send_after = models.DateTimeField('Отправить после',
+                                      default=timezone.now)
+    sent_at = models.DateTimeField('Отправлено', null=True, blank=True)
+    last_error = models.TextField('Ошибка', blank=True)
+    created = models.DateTimeField('Создано', default=timezone.now)
+
+    class Meta:
+        verbose_name = 'письмо'
+        verbose_name_plural = 'письма'
+        indexes = [
+            models.Index(fields=['status', 'send_after'],
+                         name='core_mail_queue_idx'),
+            models.Index(fields=['recipient', 'sent_at'],
+                         name='core_mail_recipient_idx'),
+        ]
+
+    def __str__(self):
+        return f'#{self.pk} {self.recipient}: {self.subject}'
+
+
+class BackfillCheckpoint(models.Model):
+    """Докуда дошло заполнение колонки в одной базе."""
+    name = models.CharField('Заполнение', max_length=100)
+    alias = models.CharField('База', max_length=100, default='default')
+    last_pk = models.BigIntegerField('Последний pk', null=True, blank=True)
+    done = models.BigIntegerField('Обработано строк', default=0)
+    chunk_size = models.PositiveIntegerField('Размер порции', default=0)
+    started = models.DateTimeField('Начато', default=timezone.now)
+    updated = models.DateTimeField('Обновлено', auto_now=True)
+    finished = models.DateTimeField('Завершено', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'заполнение колонки'
+        verbose_name_plural = 'заполнения колонок'
+        unique_together = ('name', 'alias')
+
+    def __str__(self):
+        return f'{self.name}@{self.alias} до {self.last_pk}'
+
+
+class CacheVersion(models.Model):
+    """Поколение закешированных данных, общее для всех процессов.
+
+    Кеш каждого процесса свой, поэтому сбросить его из исполнителя
+    задач нельзя; вместо этого поколение увеличивается, и процессы
+    перестают читать ключи старого поколения.
+    """
+    name = models.CharField('Кеш', max_length=100, unique=True)
+    version = models.BigIntegerField('Поколение', default=0)
+
+    class Meta:
+        verbose_name = 'поколение кеша'
+        verbose_name_plural = 'поколения кеша'
+
+    def __str__(self):
+        return f'{self.name} v{self.version}'
@@ -0,0 +1,63 @@
+import contextvars
+import random
+
+from django.conf import settings
+
+PRIMARY_ONLY_APPS = ('sessions',)
+
+# состояние текущего запроса: (читать только с основной базы, была запись)
+_scope = contextvars.ContextVar('replica_scope', default=None)
+
+
+class _Scope:
+    __slots__ = ('pinned', 'wrote')
+
+    def __init__(self, pinned):
+        self.pinned = pinned
+        self.wrote = False
+
+
+def begin_scope(pinned=False):
+    """Включает чтение с реплик до end_scope."""
+    return _scope.set(_Scope(pinned))
+
+
+def end_scope(token):
+    """Закрывает область; возвращает True, если в ней была запись."""
+    scope = _scope.get()
+    _scope.reset(token)
+    return bool(scope and scope.wrote)
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+class ReplicaRouter:
+    """Чтение — с реплик, запись — в основную базу.
+
+    Реплики используются только внутри области запроса, которую открывает
+    ReplicaStickinessMiddleware. Команды, задачи очереди и всё остальное
+    читают с основной базы. После записи в запросе чтение до его конца
+    тоже идёт с основной базы.
+    """
+
+    def db_for_read(self, model, **hints):
+        scope = _scope.get()
+        aliases = replicas()
+        if scope is None or scope.pinned or scope.wrote or not aliases:
+            return 'default'
+        # отставшая сессия разлогинила бы только что вошедшего
+        if model._meta.app_label in PRIMARY_ONLY_APPS:
+            return 'default'
+        return random.choice(aliases)
+
+    def db_for_write(self, model, **hints):
+        scope = _scope.get()
+        if scope is not None:
+            scope.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # все псевдонимы — копии одной базы
+        return True
@@ -0,0 +1,59 @@
+from django.db.backends.sqlite3 import base
+
+# проверенный набор для продакшена, см. manage.py sqlite_benchmark
+PRODUCTION_PRAGMAS = {
+    # свободные страницы возвращает db_maintenance; на существующей
+    # базе включается один раз через db_maintenance --enable-incremental.
+    # Идёт первой: режим WAL создаёт файл базы, и после этого auto_vacuum
+    # без полного VACUUM уже не меняется
+    'auto_vacuum': 'INCREMENTAL',
+    # читатели не блокируют писателя и друг друга
+    'journal_mode': 'WAL',
+    # в WAL fsync только на чекпоинте; сбой питания теряет последние
+    # транзакции, но не портит базу
+    'synchronous': 'NORMAL',
+    # ждать освобождения блокировки, а не сразу падать с database is locked
+    'busy_timeout': 5000,
+    # 64 МиБ страничного кеша на соединение
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+def apply_pragmas(connection, pragmas):
+    """Выполняет PRAGMA на соединении sqlite3 (не Django)."""
+    for name, value in pragmas.items():
+        connection.execute(f'PRAGMA {name} = {value}')
+
+
+def begin_statement(mode):
+    if mode not in TRANSACTION_MODES:
+        raise ValueError(f'Неизвестный режим транзакций SQLite: {mode}')
+    return f'BEGIN {mode}'
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """sqlite3 с прагмами из OPTIONS и BEGIN IMMEDIATE в atomic().
+
+    OPTIONS принимает 'pragmas' (поверх PRODUCTION_PRAGMAS) и
+    'transaction_mode'. В IMMEDIATE транзакция сразу берёт блокировку
+    записи и ждёт её busy_timeout; в DEFERRED блокировка берётся
+    на первой записи, и если кто-то пишет, SQLite отвечает database is
+    locked без ожидания, чтобы не было взаимоблокировки.
+    """
+
+    def get_connection_params(self):
+        # settings_dict общий для потоков, поэтому ключи убираются
+        # из собранных параметров, а не из OPTIONS
+        kwargs = super().get_connection_params()
+        self.pragmas = {**PRODUCTION_PRAGMAS, **kwargs.pop('pragmas', {})}
+        self.transaction_mode = kwargs.pop('transaction_mode', 'IMMEDIATE')
+        return kwargs
+
+    def init_connection_state(self):
+        apply_pragmas(self.connection, self.pragmas)
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(begin_statement(self.transaction_mode))
@@ -0,0 +1,134 @@
+import multiprocessing
+import os
+import random
+import sqlite3
+import time
+
+from .base import PRODUCTION_PRAGMAS, apply_pragmas, begin_statement
+
+# конфигурации, которые сравнивает sqlite_benchmark
+CONFIGS = {
+    # как работает штатный бэкенд Django
+    'django': {'pragmas': {}, 'transaction_mode': 'DEFERRED'},
+    'wal': {'pragmas': {'journal_mode': 'WAL', 'synchronous': 'NORMAL'},
+            'transaction_mode': 'DEFERRED'},
+    'production': {'pragmas': PRODUCTION_PRAGMAS,
+                   'transaction_mode': 'IMMEDIATE'},
+}
+# штатный таймаут sqlite3.connect, если busy_timeout не задан
+CONNECT_TIMEOUT = 5.0
+
+
+def connect(path, config):
+    connection = sqlite3.connect(path, timeout=CONNECT_TIMEOUT,
+                                 isolation_level=None)
+    apply_pragmas(connection, config['pragmas'])
+    return connection
+
+
+def prepare(path, config, rows):
+    """Создаёт базу с постами и комментариями для замера."""
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    connection = connect(path, config)
+    connection.executescript('''
+        CREATE TABLE post (id INTEGER PRIMARY KEY, author_id INTEGER,
+                           text TEXT, pub_date REAL);
+        CREATE INDEX post_pub_date ON post (pub_date);
+        CREATE TABLE comment (id INTEGER PRIMARY KEY, post_id INTEGER,
+                              text TEXT, created REAL);
+        CREATE INDEX comment_post ON comment (post_id);
+    ''')
+    connection.execute('BEGIN')
+    connection.executemany(
+        'INSERT INTO post (author_id, text, pub_date) VALUES (?, ?, ?)',
+        ((i % 100, 'x' * 200, i) for i in range(rows)))
+    connection.execute('COMMIT')
+    connection.close()
+
+
+def _read(connection, rows):
+    offset = random.randrange(max(rows - 10, 1))
+    connection.execute(
+        'SELECT id, author_id, text FROM post ORDER BY pub_date DESC '
+        'LIMIT 10 OFFSET ?', (offset,)).fetchall()
+
+
+def _write(connection, config, rows):
+    """Транзакция как у add_comment: чтение поста, затем запись.
+
+    Возвращает ожидание блокировки: время BEGIN и первой записи,
+    где SQLite и берёт блокировку в зависимости от режима.
+    """
+    started = time.perf_counter()
+    connection.execute(begin_statement(config['transaction_mode']))
+    waited = time.perf_counter() - started
+    try:
+        post_id = random.randrange(1, rows + 1)
+        connection.execute('SELECT id FROM post WHERE id = ?',
+                           (post_id,)).fetchone()
+        started = time.perf_counter()
+        connection.execute(
+            'INSERT INTO comment (post_id, text, created) VALUES (?, ?, ?)',
+            (post_id, 'y' * 100, time.time()))
+        waited += time.perf_counter() - started
+        connection.execute('COMMIT')
+    except sqlite3.OperationalError:
+        connection.execute('ROLLBACK')
+        raise
+    return waited
+
+
+def worker(args):
+    """Процесс нагрузки: читает или пишет до дедлайна."""
+    path, config, role, rows, start_at, deadline = args
+    connection = connect(path, config)
+    result = {'reads': 0, 'writes': 0, 'errors': 0, 'waits': []}
+    time.sleep(max(start_at - time.time(), 0))
+    while time.time() < deadline:
+        try:
+            if role == 'reader':
+                _read(connection, rows)
+                result['reads'] += 1
+            else:
+                result['waits'].append(_write(connection, config, rows))
+                result['writes'] += 1
+        except sqlite3.OperationalError:
+            result['errors'] += 1
+    connection.close()
+    return result
+
+
+def percentile(values, share):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * share), len(values) - 1)]
+
+
+def run(path, name, readers=4, writers=4, duration=5.0, rows=10000):
+    """Гоняет одну конфигурацию в отдельных процессах.
+
+    Возвращает операции в секунду, число ошибок database is locked
+    и перцентили ожидания блокировки записи в миллисекундах.
+    """
+    config = CONFIGS[name]
+    prepare(path, config, rows)
+    # spawn: процессы не наследуют соединения Django родителя
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(readers + writers) as pool:
+        start_at = time.time() + 1.0
+        tasks = [(path, config, role, rows, start_at, start_at + duration)
+                 for role in ['reader'] * readers + ['writer'] * writers]
+        results = pool.map(worker, tasks)
+    waits = [wait * 1000 for result in results for wait in result['waits']]
+    return {
+        'config': name,
+        'reads_per_sec': sum(r['reads'] for r in results) / duration,
+        'writes_per_sec': sum(r['writes'] for r in results) / duration,
+        'errors': sum(r['errors'] for r in results),
+        'wait_p50': percentile(waits, 0.5),
+        'wait_p95': percentile(waits, 0.95),
+        'wait_p99': percentile(waits, 0.99),
+    }
@@ -0,0 +1,152 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from core.jobs import enqueue, task
+
+MAINTENANCE_TASK = 'core.db_maintenance'
+MAINTENANCE_TIME_LIMIT = 60.0
+# строк на индекс, которые читает ANALYZE; 0 — все
+ANALYSIS_LIMIT = 1000
+VACUUM_STEP_PAGES = 256
+VACUUM_PAUSE = 0.05
+# 2 — incremental, см. PRAGMA auto_vacuum
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+def maintained_aliases():
+    """SQLite-базы, кроме реплик: те перезаписываются sync_replica."""
+    return [alias for alias in settings.DATABASES
+            if connections[alias].vendor == 'sqlite'
+            and alias not in settings.DATABASE_REPLICAS]
+
+
+def _pragma(cursor, name):
+    cursor.execute(f'PRAGMA {name}')
+    return cursor.fetchone()[0]
+
+
+def analyze(alias='default', full=False, limit=ANALYSIS_LIMIT):
+    """Обновляет статистику планировщика.
+
+    По умолчанию PRAGMA optimize: SQLite сам перестраивает статистику
+    только тех таблиц, что заметно выросли или уменьшились с прошлого
+    ANALYZE. analysis_limit ограничивает число строк на индекс, так что
+    даже полный ANALYZE на большой базе идёт секунды.
+    """
+    started = time.monotonic()
+    with connections[alias].cursor() as cursor:
+        cursor.execute(f'PRAGMA analysis_limit = {int(limit)}')
+        cursor.execute('ANALYZE' if full else 'PRAGMA optimize(0x10002)')
+    return time.monotonic() - started
+
+
+def enable_incremental_vacuum(alias='default'):
+    """Переводит базу в auto_vacuum=INCREMENTAL.
+
+    Режим вступает в силу только после полного VACUUM, который
+    блокирует базу на всё время; делать это один раз в окно
+    обслуживания.
+    """
+    with connections[alias].cursor() as cursor:
+        cursor.execute(f'PRAGMA auto_vacuum = {AUTO_VACUUM_INCREMENTAL}')
+        cursor.execute('VACUUM')
+
+
+def incremental_vacuum(alias='default', time_limit=MAINTENANCE_TIME_LIMIT,
+                       step_pages=VACUUM_STEP_PAGES, pause=VACUUM_PAUSE):
+    """Возвращает свободные страницы файлу шагами по step_pages.
+
+    Каждый шаг — короткая транзакция записи; между шагами пауза,
+    чтобы запись сайта не ждала. Останавливается, когда свободных
+    страниц не осталось или вышло время.
+    """
+    deadline = time.monotonic() + time_limit
+    result = {'freed_pages': 0, 'steps': 0}
+    with connections[alias].cursor() as cursor:
+        result['auto_vacuum'] = _pragma(cursor, 'auto_vacuum')
+        if result['auto_vacuum'] != AUTO_VACUUM_INCREMENTAL:
+            result['free_pages'] = _pragma(cursor, 'freelist_count')
+            return result
+        while time.monotonic() < deadline:
+            free = _pragma(cursor, 'freelist_count')
+            if not free:
+                break
+            cursor.execute(
+                f'PRAGMA incremental_vacuum({min(free, step_pages)})')
+            # страницы освобождаются по мере чтения результата
+            cursor.fetchall()
+            result['freed_pages'] += free - _pragma(cursor, 'freelist_count')
+            result['steps'] += 1
+            time.sleep(pause)
+        result['free_pages'] = _pragma(cursor, 'freelist_count')
+    return result
+
+
+def index_report(alias='default', time_limit=MAINTENANCE_TIME_LIMIT):
+    """Размер и фрагментация индексов по виртуальной таблице dbstat.
+
+    fill — доля занятого места в страницах индекса; fragmentation —
+    доля листовых страниц, которые лежат в файле не следом за
+    предыдущей. Индексы, до которых не дошло время, пропускаются.
+    """
+    deadline = time.monotonic() + time_limit
+    report = []
+    with connections[alias].cursor() as cursor:
+        cursor.execute(
+            "SELECT name, tbl_name FROM sqlite_master WHERE type = 'index' "
+            'ORDER BY tbl_name, name')
+        indexes = cursor.fetchall()
+        for name, table in indexes:
+            if time.monotonic() >= deadline:
+                break
+            cursor.execute(
+                'SELECT pageno, pagetype, pgsize, unused FROM dbstat '
+                'WHERE name = %s ORDER BY path', [name])
+            pages = cursor.fetchall()
+            size = sum(page[2] for page in pages)
+            leaves = [page[0] for page in pages if page[1] == 'leaf']
+            jumps = sum(1 for previous, current in zip(leaves, leaves[1:])
+                        if current != previous + 1)
+            report.append({
+                'index': name,
+                'table': table,
+                'pages': len(pages),
+                'size': size,
+                'fill': 1 - sum(page[3] for page in pages) / size
+                if size else 0.0,
+                'fragmentation': jumps / (len(leaves) - 1)
+                if len(leaves) > 1 else 0.0,
+            })
+    return sorted(report, key=lambda row: row['size'], reverse=True)
+
+
+def maintain(alias='default', time_limit=MAINTENANCE_TIME_LIMIT,
+             full_analyze=False, step_pages=VACUUM_STEP_PAGES, report=False):
+    """ANALYZE, затем incremental vacuum и отчёт по индексам.
+
+    Всё укладывается в time_limit: vacuum и отчёт получают только
+    остаток времени.
+    """
+    deadline = time.monotonic() + time_limit
+    result = {'alias': alias,
+              'analyze_seconds': analyze(alias, full_analyze)}
+    result['vacuum'] = incremental_vacuum(
+        alias, max(deadline - time.monotonic(), 0), step_pages)
+    if report:
+        result['indexes'] = index_report(
+            alias, max(deadline - time.monotonic(), 0))
+    return result
+
+
+@task(MAINTENANCE_TASK)
+def run_maintenance(time_limit=MAINTENANCE_TIME_LIMIT, repeat_hours=None):
+    for alias in maintained_aliases():
+        maintain(alias, time_limit)
+    if repeat_hours:
+        enqueue(MAINTENANCE_TASK, time_limit=time_limit,
+                repeat_hours=repeat_hours, key=MAINTENANCE_TASK,
+                run_at=timezone.now() + timedelta(hours=repeat_hours))
@@ -0,0 +1,96 @@
+import gzip
+import os
+import shutil
+import sqlite3
+import time
+
+from django.db import connections
+
+SNAPSHOT_PAGES = 256
+SNAPSHOT_SLEEP = 0.05
+COPY_CHUNK = 1024 * 1024
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def check_integrity(path, quick=False):
+    """Возвращает список проблем файла базы; пустой — файл цел."""
+    connection = sqlite3.connect(path)
+    try:
+        pragma = 'quick_check' if quick else 'integrity_check'
+        rows = [row[0] for row in connection.execute(f'PRAGMA {pragma}')]
+    finally:
+        connection.close()
+    return [] if rows == ['ok'] else rows
+
+
+def _gzip(source, target):
+    with open(source, 'rb') as raw, gzip.open(target, 'wb') as packed:
+        shutil.copyfileobj(raw, packed, COPY_CHUNK)
+
+
+def snapshot(alias, target, pages=SNAPSHOT_PAGES, sleep=SNAPSHOT_SLEEP,
+             compress=False, quick=False):
+    """Снимает копию работающей базы SQLite через backup API.
+
+    Страницы копируются порциями по pages с паузой sleep между ними:
+    писатели ждут не дольше одной порции. Если базу меняют другие
+    соединения, SQLite начинает копирование заново, поэтому на базе
+    с постоянной записью порцию стоит увеличить. Копия пишется во
+    временный файл, проверяется integrity_check и только после этого
+    получает своё имя (с compress — ещё и сжимается gzip потоком).
+    Возвращает статистику снимка.
+    """
+    source = connections[alias]
+    if source.vendor != 'sqlite':
+        raise SnapshotError(f'{alias}: поддерживается только SQLite')
+    if source.in_atomic_block:
+        # копия из соединения с открытой записью ждала бы её вечно
+        raise SnapshotError('Снимок нельзя снимать внутри транзакции')
+    source.ensure_connection()
+    partial = f'{target}.partial'
+    if os.path.exists(partial):
+        os.remove(partial)
+    stats = {'alias': alias, 'path': target, 'steps': 0}
+    started = time.monotonic()
+
+    def progress(status, remaining, total):
+        stats['steps'] += 1
+        stats['pages'] = total
+        # backup() сам спит только после BUSY/LOCKED; пауза между
+        # порциями, которая пропускает писателей, — здесь
+        if remaining and sleep:
+            time.sleep(sleep)
+
+    destination = sqlite3.connect(partial)
+    try:
+        source.connection.backup(destination, pages=pages,
+                                 progress=progress, sleep=sleep)
+        # копия наследует режим WAL; снимку он не нужен
+        destination.execute('PRAGMA journal_mode = DELETE')
+        stats['page_size'] = destination.execute(
+            'PRAGMA page_size').fetchone()[0]
+    finally:
+        destination.close()
+    stats['backup_seconds'] = time.monotonic() - started
+    stats['size'] = os.path.getsize(partial)
+
+    checked = time.monotonic()
+    problems = check_integrity(partial, quick)
+    stats['check_seconds'] = time.monotonic() - checked
+    if problems:
+        os.remove(partial)
+        raise SnapshotError('Снимок повреждён: ' + '; '.join(problems[:5]))
+
+    if compress:
+        packed = time.monotonic()
+        _gzip(partial, target)
+        os.remove(partial)
+        stats['compress_seconds'] = time.monotonic() - packed
+        stats['compressed_size'] = os.path.getsize(target)
+    else:
+        os.replace(partial, target)
+    stats['total_seconds'] = time.monotonic() - started
+    return stats
@@ -0,0 +1,34 @@
+from django.contrib.admin.widgets import AutocompleteSelect
+
+
+class MemoizedAutocompleteSelect(AutocompleteSelect):
+    """AutocompleteSelect для list_editable.
+
+    Копии виджета в строках changelist делят общий словарь подписей,
+    поэтому выбранный объект запрашивается один раз на страницу,
+    а не в каждой строке.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.labels = {}
+
+    def optgroups(self, name, value, attr=None):
+        default = (None, [], 0)
+        selected_choices = {
+            str(v) for v in value
+            if str(v) not in self.choices.field.empty_values
+        }
+        if not self.is_required:
+            default[1].append(self.create_option(name, '', '', False, 0))
+        missing = selected_choices - self.labels.keys()
+        if missing:
+            for obj in self.choices.queryset.using(self.db).filter(
+                    pk__in=missing):
+                self.labels[str(obj.pk)] = (
+                    self.choices.field.label_from_instance(obj))
+        for choice in sorted(selected_choices & self.labels.keys()):
+            default[1].append(self.create_option(
+                name, choice, self.labels[choice], selected_choices,
+                len(default[1])))
+        return [default]
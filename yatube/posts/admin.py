@@ -1,17 +1,209 @@
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.helpers import ActionForm
+from django.core.exceptions import ValidationError
+from django.urls import reverse
+from django.utils.html import format_html
+
+from core.jobs import enqueue
+from core.paginator import EstimatedCountPaginator
+from core.widgets import MemoizedAutocompleteSelect
 
 from .models import Comment, Follow, Group, Post
+from .purge import soft_delete
+from .search import build_match_expression, match_ids_sql
+from .sharding import each_shard, on_shard, shards
+
+
+class BulkActionsMixin:
+    """Массовые действия, которые выполняются порциями в фоне."""
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        # штатное удаление грузит все объекты и шлёт сигналы по одному
+        actions.pop('delete_selected', None)
+        return actions
+
+    def get_queryset(self, request):
+        # модераторы видят и скрытые записи, пока их не стёр purger
+        manager = getattr(self.model, 'all_objects',
+                          self.model._default_manager)
+        queryset = manager.get_queryset()
+        ordering = self.get_ordering(request)
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+        return queryset
+
+    def report_job(self, request, name, job):
+        url = reverse('admin:core_job_change', args=[job.pk])
+        self.message_user(request, format_html(
+            'Задача «{}» поставлена в очередь: <a href="{}">прогресс</a>',
+            name, url))
+        return job
+
+    def start_bulk_task(self, request, name, action, queryset, **kwargs):
+        # задаче передаются id выбранных строк в JSON, а не сам запрос
+        ids = list(queryset.order_by('pk').values_list('pk', flat=True))
+        job = enqueue('posts.bulk', action=action, ids=ids, **kwargs)
+        return self.report_job(request, name, job)
+
+    def start_soft_delete(self, request, name, queryset):
+        # записи пропадают с сайта сразу, строки стираются в фоне
+        return self.report_job(request, name, soft_delete(queryset))
+
+
+class ShardFilter(admin.SimpleListFilter):
+    """Строки одного шарда: сквозного списка у админки нет."""
+    title = 'шард'
+    parameter_name = 'shard'
+
+    def lookups(self, request, model_admin):
+        if len(shards()) == 1:
+            return []
+        return [(alias, alias) for alias in shards()]
+
+    def choices(self, changelist):
+        # «Все» не бывает, без выбора показывается первый шард
+        current = self.value() or shards()[0]
+        for alias, title in self.lookup_choices:
+            yield {
+                'selected': alias == current,
+                'query_string': changelist.get_query_string(
+                    {self.parameter_name: alias}),
+                'display': title,
+            }
+
+    def queryset(self, request, queryset):
+        alias = self.value()
+        if alias not in shards():
+            alias = shards()[0]
+        return on_shard(queryset, alias)
+
+
+class ShardedAdminMixin:
+    """Список по шардам; строка открывается из любого шарда."""
+
+    def get_list_filter(self, request):
+        return (ShardFilter, *super().get_list_filter(request))
+
+    def get_object(self, request, object_id, from_field=None):
+        # ссылка из списка шард не передаёт, а id уникальны во всех
+        queryset = self.get_queryset(request)
+        opts = queryset.model._meta
+        field = (opts.pk if from_field is None
+                 else opts.get_field(from_field))
+        try:
+            object_id = field.to_python(object_id)
+        except (ValidationError, ValueError):
+            return None
+        for rows in each_shard(queryset):
+            obj = rows.filter(**{field.name: object_id}).first()
+            if obj is not None:
+                return obj
+        return None
 
 
-class PostAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'text', 'pub_date', 'author', 'group')
+class PostActionForm(ActionForm):
+    group_slug = forms.SlugField(required=False, label='Слаг группы')
+
+
+class PostAdmin(ShardedAdminMixin, BulkActionsMixin, admin.ModelAdmin):
+    list_display = ('pk', 'text', 'pub_date', 'author', 'group', 'is_deleted')
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
     list_editable = ('group',)
+    autocomplete_fields = ('author', 'group')
+    date_hierarchy = 'pub_date'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    action_form = PostActionForm
+    actions = ('move_to_group', 'delete_in_background')
     empty_value_display = '-пусто-'
 
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name in self.list_editable:
+            kwargs['widget'] = MemoizedAutocompleteSelect(
+                db_field.remote_field, self.admin_site,
+                using=kwargs.get('using'))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_search_results(self, request, queryset, search_term):
+        # поиск по тексту идёт через индекс FTS5, а не LIKE '%...%'
+        expression = build_match_expression(search_term)
+        if not expression:
+            return queryset, False
+        return queryset.filter(pk__in=match_ids_sql(expression)), False
+
+    def move_to_group(self, request, queryset):
+        slug = request.POST.get('group_slug')
+        group_id = None
+        if slug:
+            group_id = Group.objects.filter(slug=slug).values_list(
+                'pk', flat=True).first()
+            if group_id is None:
+                self.message_user(request, f'Группа «{slug}» не найдена',
+                                  level='error')
+                return
+        self.start_bulk_task(request, 'Перенос постов',
+                             'move_posts_to_group', queryset,
+                             group_id=group_id)
+    move_to_group.short_description = 'Перенести в группу (в фоне)'
+
+    def delete_in_background(self, request, queryset):
+        self.start_soft_delete(request, 'Удаление постов', queryset)
+    delete_in_background.short_description = 'Удалить выбранные (в фоне)'
+
+
+class GroupAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'title', 'slug')
+    search_fields = ('title', 'slug')
+    prepopulated_fields = {'slug': ('title',)}
+
+
+class CommentAdmin(ShardedAdminMixin, BulkActionsMixin,
+                   admin.ModelAdmin):
+    list_display = ('pk', 'text', 'created', 'author', 'post', 'is_deleted')
+    list_select_related = ('author', 'post')
+    search_fields = ('text',)
+    autocomplete_fields = ('author', 'post')
+    date_hierarchy = 'created'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ('delete_in_background', 'delete_by_same_authors')
+    empty_value_display = '-пусто-'
+
+    def delete_in_background(self, request, queryset):
+        self.start_soft_delete(request, 'Удаление комментариев', queryset)
+    delete_in_background.short_description = 'Удалить выбранные (в фоне)'
+
+    def delete_by_same_authors(self, request, queryset):
+        # авторов берём сразу: выбранные комментарии удалятся по ходу
+        authors = list(
+            queryset.values_list('author_id', flat=True).distinct())
+        self.start_soft_delete(
+            request, 'Удаление комментариев авторов',
+            Comment.all_objects.filter(author_id__in=authors))
+    delete_by_same_authors.short_description = (
+        'Удалить все комментарии этих авторов (в фоне)')
+
+
+class FollowAdmin(BulkActionsMixin, admin.ModelAdmin):
+    list_display = ('pk', 'user', 'author')
+    list_select_related = ('user', 'author')
+    search_fields = ('user__username', 'author__username')
+    autocomplete_fields = ('user', 'author')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ('delete_in_background',)
+
+    def delete_in_background(self, request, queryset):
+        self.start_bulk_task(request, 'Удаление подписок',
+                             'delete_follows', queryset)
+    delete_in_background.short_description = 'Удалить выбранные (в фоне)'
+
 
 admin.site.register(Post, PostAdmin)
-admin.site.register(Group)
-admin.site.register(Comment)
-admin.site.register(Follow)
+admin.site.register(Group, GroupAdmin)
+admin.site.register(Comment, CommentAdmin)
+admin.site.register(Follow, FollowAdmin)
@@ -1,5 +1,20 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def restore_triggers(sender, using, **kwargs):
+    from .changes import ensure_change_triggers
+    from .search import ensure_search_triggers
+    ensure_search_triggers(using)
+    ensure_change_triggers(using)
 
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        from . import backfills, events, sharding, signals, tasks  # noqa: F401
+
+        # SQLite пересоздаёт таблицу при ALTER, и триггеры FTS и журнала
+        # изменений теряются
+        post_migrate.connect(restore_triggers, sender=self)
@@ -0,0 +1,87 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .bulk import invalidate_feed_caches, iter_pk_chunks, raw_delete
+from .models import ArchivedComment, ArchivedPost, Comment, Post, PostTag
+from .projection import drop_cards
+
+ARCHIVE_BATCH_SIZE = 500
+
+
+def archive_cutoff(days=None, max_hot=None, using='default'):
+    """Дата, старше которой посты уходят в архив.
+
+    Посты старше days дней архивируются всегда; если горячих постов
+    всё равно больше max_hot, граница сдвигается к дате max_hot-го
+    по свежести поста, так что размер горячей таблицы ограничен.
+    """
+    if days is None:
+        days = settings.ARCHIVE_AFTER_DAYS
+    if max_hot is None:
+        max_hot = settings.HOT_POSTS_LIMIT
+    cutoff = timezone.now() - timedelta(days=days)
+    # дата max_hot-го поста берётся по индексу pub_date, без подсчёта
+    oldest_kept = (Post.all_objects.using(using).order_by('-pub_date')
+                   .values_list('pub_date', flat=True)[max_hot:max_hot + 1]
+                   .first()) if max_hot else None
+    if oldest_kept is not None and oldest_kept >= cutoff:
+        return oldest_kept + timedelta(microseconds=1)
+    return cutoff
+
+
+def _columns(model):
+    return [field.column for field in model._meta.concrete_fields]
+
+
+def _move(connection, source, target, key, ids, extra=()):
+    """INSERT ... SELECT строк источника в архив одним запросом."""
+    columns = ', '.join(_columns(source))
+    extra_columns = ''.join(f', {column}' for column, _ in extra)
+    extra_values = ''.join(', %s' for _ in extra)
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {target._meta.db_table} ({columns}{extra_columns}) '
+            f'SELECT {columns}{extra_values} FROM {source._meta.db_table} '
+            f'WHERE {key} IN ({placeholders})',
+            [value for _, value in extra] + list(ids),
+        )
+
+
+def _archive_chunk(using, ids):
+    connection = connections[using]
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    _move(connection, Post, ArchivedPost, 'id', ids,
+          extra=(('archived_at', now),))
+    _move(connection, Comment, ArchivedComment, 'post_id', ids)
+    # теги ссылаются на горячие строки; ленты тегов показывают только их
+    raw_delete(PostTag.objects.using(using).filter(post_id__in=ids))
+    raw_delete(Comment.all_objects.using(using).filter(post_id__in=ids))
+    raw_delete(Post.all_objects.using(using).filter(pk__in=ids))
+    drop_cards(ids)
+
+
+def archive_posts(cutoff, batch_size=ARCHIVE_BATCH_SIZE, using='default',
+                  progress=None):
+    """Переносит посты старше cutoff вместе с комментариями в архив.
+
+    Порции идут по pk, каждая — в своей транзакции, строки переносятся
+    SQL-запросами без загрузки объектов. Возвращает число постов.
+    """
+    queryset = Post.all_objects.using(using).filter(pub_date__lt=cutoff)
+    total = queryset.count()
+    done = 0
+    if progress:
+        progress(done, total)
+    for ids in iter_pk_chunks(queryset, batch_size):
+        with transaction.atomic(using=using):
+            _archive_chunk(using, ids)
+        done += len(ids)
+        if progress:
+            progress(done, total)
+    if done:
+        invalidate_feed_caches()
+    return done
@@ -0,0 +1,25 @@
+from django.db.models.functions import Length, Substr
+
+from core.backfill import backfill
+
+from .models import EXCERPT_LENGTH, ArchivedPost, Post
+from .sharding import shards
+
+
+def _missing_excerpt(queryset):
+    return queryset.filter(excerpt='').exclude(text='')
+
+
+def _fill_excerpt(queryset):
+    # всё считается в базе, текст в Python не читается
+    queryset.update(excerpt=Substr('text', 1, EXCERPT_LENGTH))
+    long_texts = queryset.annotate(length=Length('text')).filter(
+        length__gt=EXCERPT_LENGTH).values('pk')
+    queryset.model._base_manager.using(queryset.db).filter(
+        pk__in=long_texts).update(truncated=True)
+
+
+backfill('posts.post_excerpt', Post, pending=_missing_excerpt,
+         aliases=shards)(_fill_excerpt)
+backfill('posts.archived_post_excerpt', ArchivedPost,
+         pending=_missing_excerpt, aliases=shards)(_fill_excerpt)
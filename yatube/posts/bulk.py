@@ -0,0 +1,122 @@
+from django.db import transaction
+from django.utils import timezone
+
+from core.cache_versions import bump_version
+
+from .changes import record_tombstones
+from .models import Comment, Follow, Group, Post, PostCard, PostTag
+
+BULK_CHUNK_SIZE = 500
+# поколение закешированных страниц лент, см. core.cache_versions
+FEED_CACHE = 'feeds'
+
+
+def iter_pk_chunks(queryset, chunk_size=BULK_CHUNK_SIZE):
+    ids_queryset = queryset.order_by('pk').values_list('pk', flat=True)
+    last_pk = None
+    while True:
+        chunk = ids_queryset
+        if last_pk is not None:
+            chunk = chunk.filter(pk__gt=last_pk)
+        ids = list(chunk[:chunk_size])
+        if not ids:
+            return
+        yield ids
+        last_pk = ids[-1]
+
+
+def raw_delete(queryset):
+    return queryset._raw_delete(queryset.db)
+
+
+def invalidate_feed_caches():
+    # закешированные страницы лент могли показать изменённые записи;
+    # cache.clear() сбросил бы только кеш своего процесса
+    bump_version(FEED_CACHE)
+
+
+def _run_chunks(queryset, apply, chunk_size, progress):
+    """Применяет apply(ids, using) к id выборки порциями, по транзакции
+    на порцию в базе выборки.
+
+    Объекты моделей не загружаются и сигналы не шлются, поэтому
+    связанные строки apply удаляет сам.
+    """
+    total = queryset.count()
+    done = 0
+    if progress:
+        progress(done, total)
+    for ids in iter_pk_chunks(queryset, chunk_size):
+        with transaction.atomic(using=queryset.db):
+            apply(ids, queryset.db)
+        done += len(ids)
+        if progress:
+            progress(done, total)
+    invalidate_feed_caches()
+    return done
+
+
+def _move_posts(ids, group, using='default'):
+    group_id = group.pk if group else None
+    Post.all_objects.using(using).filter(pk__in=ids).update(
+        group_id=group_id, updated_at=timezone.now())
+    # у карточек меняется только группа, пересобирать их незачем
+    PostCard.objects.filter(pk__in=ids).update(
+        group_id=group_id,
+        group_slug=group.slug if group else '',
+        group_title=group.title if group else '')
+
+
+def move_posts_to_group(queryset, group_id, chunk_size=BULK_CHUNK_SIZE,
+                        progress=None):
+    group = Group.objects.filter(pk=group_id).first() if group_id else None
+    return _run_chunks(
+        queryset,
+        lambda ids, using: _move_posts(ids, group, using),
+        chunk_size, progress,
+    )
+
+
+def _delete_posts(ids, using='default'):
+    # projection импортирует этот модуль
+    from .projection import drop_cards
+    comments = Comment.all_objects.using(using).filter(post_id__in=ids)
+    posts = Post.all_objects.using(using).filter(pk__in=ids)
+    record_tombstones(comments)
+    record_tombstones(posts)
+    raw_delete(PostTag.objects.using(using).filter(post_id__in=ids))
+    raw_delete(comments)
+    raw_delete(posts)
+    drop_cards(ids)
+
+
+def delete_posts(queryset, chunk_size=BULK_CHUNK_SIZE, progress=None):
+    return _run_chunks(queryset, _delete_posts, chunk_size, progress)
+
+
+def _delete_comments(ids, using='default'):
+    from .projection import refresh_comment_counts
+    comments = Comment.all_objects.using(using).filter(pk__in=ids)
+    post_ids = set(comments.values_list('post_id', flat=True))
+    record_tombstones(comments)
+    raw_delete(PostTag.objects.using(using).filter(comment_id__in=ids))
+    raw_delete(comments)
+    refresh_comment_counts(post_ids)
+
+
+def delete_comments(queryset, chunk_size=BULK_CHUNK_SIZE, progress=None):
+    return _run_chunks(queryset, _delete_comments, chunk_size, progress)
+
+
+def _delete_follows(ids):
+    follows = Follow.objects.filter(pk__in=ids)
+    record_tombstones(follows)
+    raw_delete(follows)
+
+
+def delete_follows(queryset, chunk_size=BULK_CHUNK_SIZE, progress=None):
+    return _run_chunks(
+        queryset,
+        lambda ids, using: _delete_follows(ids),
+        chunk_size, progress,
+    )
@@ -0,0 +1,195 @@
+from django.db.models import BooleanField, Case, F, Q, TextField, Value, When
+from django.db.models.functions import Substr
+
+from .models import EXCERPT_LENGTH
+
+# столько символов текста показывает карточка в ленте
+CARD_TEXT_LENGTH = EXCERPT_LENGTH
+
+POST_COLUMNS = ('id', 'feed_excerpt', 'feed_truncated', 'pub_date', 'image')
+AUTHOR_COLUMNS = ('author_id', 'author__username', 'author__first_name',
+                  'author__last_name')
+GROUP_COLUMNS = ('group_id', 'group__slug', 'group__title')
+PROJECTION_COLUMNS = ('id', 'excerpt', 'truncated', 'pub_date', 'image',
+                      'thumbnail_url', 'comments_count', 'author_id',
+                      'author_username', 'author_full_name', 'group_id',
+                      'group_slug', 'group_title')
+
+
+def excerpt_fallback(prefix=''):
+    """Аннотации feed_excerpt и feed_truncated для лент.
+
+    Старые строки получают excerpt фоновым заполнением posts.post_excerpt
+    (и posts.archived_post_excerpt); пока оно не дошло до строки, начало
+    текста режется в запросе. prefix — путь до поста, например 'post__'.
+    """
+    missing = Q(**{f'{prefix}excerpt': ''})
+    return {
+        'feed_excerpt': Case(
+            When(missing, then=Substr(f'{prefix}text', 1, EXCERPT_LENGTH)),
+            default=F(f'{prefix}excerpt'), output_field=TextField()),
+        # первый символ за границей excerpt: есть — текст обрезан
+        'feed_text_tail': Substr(f'{prefix}text', EXCERPT_LENGTH + 1, 1),
+        'feed_truncated': Case(
+            When(missing & ~Q(feed_text_tail=''), then=Value(True)),
+            When(missing, then=Value(False)),
+            default=F(f'{prefix}truncated'), output_field=BooleanField()),
+    }
+
+
+class AuthorRef:
+    """Автор карточки: только то, что выводят шаблоны лент."""
+    __slots__ = ('pk', 'username', 'first_name', 'last_name', 'full_name')
+
+    def __init__(self, pk, username, first_name='', last_name='',
+                 full_name=None):
+        self.pk = pk
+        self.username = username
+        self.first_name = first_name
+        self.last_name = last_name
+        # проекция хранит только готовое полное имя
+        self.full_name = full_name
+
+    def get_full_name(self):
+        if self.full_name is not None:
+            return self.full_name
+        return f'{self.first_name} {self.last_name}'.strip()
+
+    def __str__(self):
+        return self.username
+
+
+class GroupRef:
+    __slots__ = ('pk', 'slug', 'title')
+
+    def __init__(self, pk, slug, title):
+        self.pk = pk
+        self.slug = slug
+        self.title = title
+
+    def __str__(self):
+        return self.title
+
+
+class Card:
+    """Пост в ленте без модели: строка values_list и ссылки на автора
+    и группу. truncated — текст обрезан до CARD_TEXT_LENGTH.
+
+    thumbnail_url и comments_count заполнены только у карточек
+    из проекции PostCard.
+    """
+    __slots__ = ('pk', 'text', 'truncated', 'pub_date', 'image', 'author',
+                 'group', 'thumbnail_url', 'comments_count')
+
+    def __init__(self, pk, text, truncated, pub_date, image, author, group,
+                 thumbnail_url='', comments_count=None):
+        self.pk = pk
+        self.text = text
+        self.truncated = truncated
+        self.pub_date = pub_date
+        self.image = image
+        self.author = author
+        self.group = group
+        self.thumbnail_url = thumbnail_url
+        self.comments_count = comments_count
+
+    @property
+    def id(self):
+        return self.pk
+
+    def __str__(self):
+        return self.text[:15]
+
+
+def card_rows(queryset, author=None, group=None):
+    """Выборка только колонок карточки: именованные кортежи.
+
+    Колонки автора и группы не запрашиваются, если их объект уже
+    известен странице (профиль, лента группы).
+    """
+    columns = POST_COLUMNS
+    if author is None:
+        columns += AUTHOR_COLUMNS
+    if group is None:
+        columns += GROUP_COLUMNS
+    return queryset.annotate(**excerpt_fallback()).values_list(
+        *columns, named=True)
+
+
+class CardFeed:
+    """Лента карточек для Paginator поверх выборки card_rows.
+
+    rows — выборка card_rows или обёртка над ней (ShardedFeed,
+    ChainedFeed); срез превращается в карточки, одинаковые авторы
+    и группы на странице делят один объект.
+    """
+    ordered = True
+
+    def __init__(self, rows, author=None, group=None):
+        self.rows = rows
+        self.author = author
+        self.group = group
+
+    def count(self):
+        return self.rows.count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if isinstance(index, int):
+            return self[index:index + 1][0]
+        authors = {}
+        groups = {}
+        return [self._card(row, authors, groups) for row in self.rows[index]]
+
+    def _card(self, row, authors, groups):
+        author = self.author
+        if author is None:
+            author = authors.get(row.author_id)
+            if author is None:
+                author = authors[row.author_id] = AuthorRef(
+                    row.author_id, row.author__username,
+                    row.author__first_name, row.author__last_name)
+        group = self.group
+        if group is None and row.group_id is not None:
+            group = groups.get(row.group_id)
+            if group is None:
+                group = groups[row.group_id] = GroupRef(
+                    row.group_id, row.group__slug, row.group__title)
+        return Card(row.id, row.feed_excerpt, row.feed_truncated,
+                    row.pub_date, row.image, author, group)
+
+
+def projection_rows(queryset):
+    """Строки проекции PostCard: всё для карточки без соединений."""
+    return queryset.values_list(*PROJECTION_COLUMNS, named=True)
+
+
+class ProjectionFeed(CardFeed):
+    """Лента карточек из таблицы PostCard.
+
+    queryset — отфильтрованная и упорядоченная выборка PostCard;
+    страница читается одним запросом по индексу ленты.
+    """
+
+    def __init__(self, queryset, author=None, group=None):
+        super().__init__(projection_rows(queryset), author, group)
+
+    def _card(self, row, authors, groups):
+        author = self.author
+        if author is None:
+            author = authors.get(row.author_id)
+            if author is None:
+                author = authors[row.author_id] = AuthorRef(
+                    row.author_id, row.author_username,
+                    full_name=row.author_full_name)
+        group = self.group
+        if group is None and row.group_id is not None:
+            group = groups.get(row.group_id)
+            if group is None:
+                group = groups[row.group_id] = GroupRef(
+                    row.group_id, row.group_slug, row.group_title)
+        return Card(row.id, row.excerpt, row.truncated, row.pub_date,
+                    row.image, author, group, row.thumbnail_url,
+                    row.comments_count)
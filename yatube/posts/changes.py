@@ -0,0 +1,150 @@
+import heapq
+
+from django.db import connections
+from django.utils import timezone
+
+from .models import (ArchivedComment, ArchivedPost, ChangeLog, Comment, Follow,
+                     Post, Tombstone)
+from .sharding import on_shard, shards
+from .utils import decode_cursor, encode_cursor
+
+CHANGE_FEED_LIMIT = 500
+
+# вид -> (модель, колонки данных)
+STREAMS = {
+    'post': (Post, ('id', 'text', 'pub_date', 'updated_at', 'author_id',
+                    'group_id', 'image')),
+    'comment': (Comment, ('id', 'post_id', 'author_id', 'text', 'created',
+                          'updated_at')),
+    'follow': (Follow, ('id', 'user_id', 'author_id', 'created')),
+}
+# архивные строки для ленты — те же посты и комментарии
+MODEL_NAMES = {Post: 'post', Comment: 'comment', Follow: 'follow',
+               ArchivedPost: 'post', ArchivedComment: 'comment'}
+
+
+def _log_trigger(table, model, operation, op=None, row='new.id'):
+    name = f'{table}_changelog_{operation[0]}'
+    return (
+        f"CREATE TRIGGER IF NOT EXISTS {name} "
+        f"AFTER {operation.upper()} ON {table} BEGIN "
+        f"INSERT INTO {ChangeLog._meta.db_table} (model, object_id, op) "
+        f"VALUES ({model}, {row}, '{op or operation}'); END"
+    )
+
+
+# удаления попадают в журнал через отметки Tombstone: их пишут и
+# сигналы, и record_tombstones, а перенос в архив или в другой шард —
+# не удаление
+CHANGE_TRIGGERS = (
+    _log_trigger(Post._meta.db_table, "'post'", 'insert'),
+    _log_trigger(Post._meta.db_table, "'post'", 'update'),
+    _log_trigger(Comment._meta.db_table, "'comment'", 'insert'),
+    _log_trigger(Comment._meta.db_table, "'comment'", 'update'),
+    _log_trigger(Follow._meta.db_table, "'follow'", 'insert'),
+    _log_trigger(Tombstone._meta.db_table, 'new.model', 'insert', 'delete',
+                 'new.object_id'),
+)
+
+
+def ensure_change_triggers(using='default'):
+    """Восстанавливает триггеры журнала после миграций, пересоздающих
+    таблицы."""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        # до миграции журнала триггерам некуда писать
+        if (ChangeLog._meta.db_table
+                not in connection.introspection.table_names(cursor)):
+            return
+        for statement in CHANGE_TRIGGERS:
+            cursor.execute(statement)
+
+
+def record_tombstones(queryset):
+    """Пишет отметки об удалении для выборки одним INSERT ... SELECT.
+
+    Нужна там, где записи удаляются сырым DELETE в обход сигналов.
+    """
+    ids_sql, params = queryset.values('pk').query.sql_with_params()
+    connection = connections[queryset.db]
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {Tombstone._meta.db_table} '
+            f'(model, object_id, deleted_at) '
+            f'SELECT %s, ids.id, %s FROM ({ids_sql}) AS ids',
+            (MODEL_NAMES[queryset.model], now, *params),
+        )
+
+
+def _log(index, alias, after, limit):
+    rows = ChangeLog.objects.using(alias).filter(id__gt=after).order_by(
+        'id').values_list('id', 'model', 'object_id', 'op')[:limit]
+    # позиция в ключе слияния чередует шарды, не давая одному занять
+    # всю пачку
+    for position, row in enumerate(rows):
+        yield position, index, row
+
+
+def _load_rows(entries):
+    """Текущие данные записей из журнала: {(шард, вид, id): строка}."""
+    wanted = {}
+    for alias, (_, kind, object_id, op) in entries:
+        if op != 'delete':
+            wanted.setdefault((alias, kind), set()).add(object_id)
+    rows = {}
+    for (alias, kind), ids in wanted.items():
+        model, columns = STREAMS[kind]
+        for row in on_shard(model.objects, alias).filter(
+                pk__in=ids).values(*columns):
+            rows[alias, kind, row['id']] = row
+    return rows
+
+
+def fetch_changes(after=None, limit=CHANGE_FEED_LIMIT):
+    """Изменения постов, комментариев и подписок после курсора.
+
+    Курсор — последний отданный id журнала ChangeLog в каждом шарде.
+    Журнал пишется в транзакции изменения, поэтому запись, закоммиченная
+    позже, всегда получает id больше курсора и не теряется. Данные
+    берутся из таблиц на момент чтения; записи, которых уже нет, —
+    пропускаются, их удаление придёт отметкой. Возвращает изменения,
+    новый курсор и признак, что есть ещё.
+    """
+    aliases = shards()
+    cursor = list(after or (0,) * len(aliases))
+    logs = [_log(index, alias, cursor[index], limit + 1)
+            for index, alias in enumerate(aliases)]
+    entries = []
+    has_more = False
+    for _, index, row in heapq.merge(*logs):
+        if len(entries) == limit:
+            has_more = True
+            break
+        entries.append((aliases[index], row))
+        cursor[index] = row[0]
+    rows = _load_rows(entries)
+    changes = []
+    for alias, (_, kind, object_id, op) in entries:
+        if op == 'delete':
+            changes.append({'model': kind, 'op': op, 'id': object_id})
+        elif (alias, kind, object_id) in rows:
+            changes.append({'model': kind, 'op': op, 'id': object_id,
+                            'data': rows[alias, kind, object_id]})
+    return changes, tuple(cursor), has_more
+
+
+def encode_change_cursor(key):
+    return encode_cursor(*key) if key else None
+
+
+def decode_change_cursor(raw):
+    """Курсор ленты: id журнала по каждому шарду; для битого — False."""
+    if not raw:
+        return None
+    key = decode_cursor(raw, *[int] * len(shards()))
+    if key is None:
+        return False
+    return key
@@ -0,0 +1,30 @@
+from .utils import decode_cursor, encode_cursor, keyset_page, parse_moment
+
+# порядок ветки; его держит индекс (post, created, id)
+COMMENT_ORDERING = ('created', 'id')
+COMMENTS_PAGE_SIZE = 20
+
+
+def encode_comment_cursor(key):
+    return encode_cursor(key[0].isoformat(), key[1]) if key else None
+
+
+def decode_comment_cursor(raw):
+    """Курсор ветки: (время, id); для битого — False."""
+    if not raw:
+        return None
+    key = decode_cursor(raw, str, int)
+    created = parse_moment(key[0]) if key else None
+    if created is None:
+        return False
+    return created, key[1]
+
+
+def comment_page(queryset, after=None, limit=COMMENTS_PAGE_SIZE):
+    """Страница комментариев после ключа after с авторами в том же JOIN.
+
+    Возвращает комментарии и курсор следующей страницы либо None.
+    """
+    rows, next_key = keyset_page(queryset.select_related('author'),
+                                 COMMENT_ORDERING, after, limit)
+    return rows, encode_comment_cursor(next_key)
@@ -0,0 +1,140 @@
+import heapq
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.mail import EmailMessage, get_connection
+from django.db.models.functions import Substr
+from django.template.loader import render_to_string
+
+from .models import Follow, Post
+from .sharding import on_shard, shards
+from .utils import keyset_page
+
+User = get_user_model()
+
+DIGEST_READ_SIZE = 1000
+DIGEST_MAIL_BATCH = 200
+DIGEST_POSTS_PER_AUTHOR = 3
+DIGEST_TEXT_LENGTH = 200
+
+
+def _stream(queryset, ordering, read_size):
+    """Читает выборку страницами по ключу, отдавая строки по одной."""
+    after = None
+    while True:
+        rows, after = keyset_page(queryset, ordering, after, read_size)
+        yield from rows
+        if after is None:
+            return
+
+
+def iter_author_posts(since, read_size=DIGEST_READ_SIZE):
+    """Новые посты всех шардов, сгруппированные по автору по author_id.
+
+    На автора хранится не больше DIGEST_POSTS_PER_AUTHOR постов и их
+    общее число, так что память не зависит от того, сколько он написал.
+    """
+    streams = [
+        _stream(on_shard(Post.objects, alias).filter(
+            pub_date__gte=since).annotate(
+            short_text=Substr('text', 1, DIGEST_TEXT_LENGTH)).values(
+            'author_id', 'id', 'short_text', 'author__username'),
+            ('author_id', 'id'), read_size)
+        for alias in shards()
+    ]
+    merged = heapq.merge(
+        *streams, key=lambda row: (row['author_id'], row['id']))
+    # у переносимого автора посты есть в двух шардах: копии идут подряд
+    rows = (next(copies) for _, copies in itertools.groupby(
+        merged, key=lambda row: row['id']))
+    for author_id, posts in itertools.groupby(
+            rows, key=lambda row: row['author_id']):
+        first = next(posts)
+        shown = [first, *itertools.islice(posts, DIGEST_POSTS_PER_AUTHOR - 1)]
+        yield author_id, {
+            'username': first['author__username'],
+            'posts': [{'id': row['id'], 'text': row['short_text']}
+                      for row in shown],
+            'total': len(shown) + sum(1 for _ in posts),
+        }
+
+
+def iter_follows(read_size=DIGEST_READ_SIZE):
+    """Подписки активных пользователей с почтой в порядке
+    (user_id, author_id)."""
+    return _stream(
+        Follow.objects.filter(user__is_active=True).exclude(
+            user__email='').values('user_id', 'author_id',
+                                   'user__username', 'user__email'),
+        ('user_id', 'author_id'), read_size)
+
+
+def render_digest(digest):
+    """Собирает тему и текст письма; выполняется в процессах пула."""
+    body = render_to_string('posts/email/digest.txt', digest)
+    return digest['email'], f'Новые посты: {digest["total"]}', body
+
+
+def collect_digests(since, read_size=DIGEST_READ_SIZE):
+    """Дайджесты всех подписчиков за один проход по подпискам.
+
+    В памяти держатся только блоки авторов с новыми постами (не больше
+    DIGEST_POSTS_PER_AUTHOR постов на автора); подписки идут по
+    пользователю, и письмо отдаётся, как только его подписки кончились.
+    """
+    blocks = dict(iter_author_posts(since, read_size))
+    if not blocks:
+        return
+    for user_id, follows in itertools.groupby(
+            iter_follows(read_size), key=lambda row: row['user_id']):
+        first = next(follows)
+        authors = [blocks[row['author_id']]
+                   for row in itertools.chain([first], follows)
+                   if row['author_id'] in blocks]
+        if not authors:
+            continue
+        yield {
+            'email': first['user__email'],
+            'username': first['user__username'],
+            'authors': authors,
+            'total': sum(author['total'] for author in authors),
+            'site_url': settings.SITE_URL,
+        }
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def send_digests(since, workers=0, mail_batch=DIGEST_MAIL_BATCH,
+                 read_size=DIGEST_READ_SIZE):
+    """Рассылает дайджест новых постов с момента since.
+
+    Блоки авторов собираются один раз, подписки читаются одним
+    проходом по пользователям. Письма рендерятся в пуле процессов
+    (workers=0 — в текущем) и уходят в EMAIL_BACKEND пачками.
+    Возвращает число писем.
+    """
+    pool = ProcessPoolExecutor(workers) if workers else None
+    render = pool.map if pool else map
+    connection = get_connection()
+    sent = 0
+    try:
+        digests = collect_digests(since, read_size)
+        for batch in _batches(digests, mail_batch):
+            messages = [
+                EmailMessage(subject, body, to=[email])
+                for email, subject, body in render(render_digest, batch)
+            ]
+            sent += connection.send_messages(messages) or 0
+    finally:
+        if pool:
+            pool.shutdown()
+    return sent
@@ -0,0 +1,72 @@
+from django.conf import settings
+from django.core.mail import send_mail
+from django.template.loader import render_to_string
+
+from core.events import emit, handler
+
+from .bulk import invalidate_feed_caches
+from .models import User
+from .projection import refresh_comment_counts
+
+
+def post_created(post):
+    emit('post.created',
+         {'post_id': post.pk, 'author_id': post.author_id,
+          'group_id': post.group_id},
+         key=f'post.created:{post.pk}')
+
+
+def post_updated(post):
+    emit('post.updated',
+         {'post_id': post.pk, 'author_id': post.author_id,
+          'group_id': post.group_id},
+         key=f'post.updated:{post.pk}:{post.updated_at.isoformat()}')
+
+
+def comment_created(comment):
+    emit('comment.created',
+         {'comment_id': comment.pk, 'post_id': comment.post_id,
+          'author_id': comment.author_id},
+         key=f'comment.created:{comment.pk}')
+
+
+def follow_created(follow):
+    emit('follow.created',
+         {'user_id': follow.user_id, 'author_id': follow.author_id},
+         key=f'follow.created:{follow.pk}')
+
+
+@handler('feed-cache', topics=('post.created', 'post.updated',
+                               'comment.created'))
+def refresh_feed_caches(event):
+    invalidate_feed_caches()
+
+
+@handler('comment-counts', topics=('comment.created',))
+def recount_comments(event):
+    # единственный путь нового комментария в счётчик карточки; массовые
+    # удаления пересчитывают его сами
+    refresh_comment_counts([event.data['post_id']])
+
+
+@handler('follow-mail', topics=('follow.created',))
+def notify_followed_author(event):
+    """Письмо автору о новом подписчике через очередь писем.
+
+    Письмо ложится в OutboxEmail в одной транзакции со сдвигом позиции
+    обработчика, поэтому повтор события второго письма не даст.
+    """
+    users = User.objects.in_bulk([event.data['user_id'],
+                                  event.data['author_id']])
+    follower = users.get(event.data['user_id'])
+    author = users.get(event.data['author_id'])
+    if (follower is None or author is None or not author.is_active
+            or not author.email):
+        return
+    body = render_to_string('posts/email/new_follower.txt', {
+        'author': author,
+        'follower': follower,
+        'site_url': settings.SITE_URL,
+    })
+    send_mail(f'Новый подписчик: {follower.username}', body, None,
+              [author.email])
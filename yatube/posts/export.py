@@ -0,0 +1,137 @@
+import csv
+import json
+import os
+import zipfile
+
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import ArchivedComment, ArchivedPost, Comment, Post
+from .sharding import shards
+
+EXPORT_CHUNK_SIZE = 500
+CSV_COLUMNS = ('type', 'id', 'post', 'text', 'pub_date', 'group', 'image')
+FILE_CHUNK_SIZE = 64 * 1024
+
+
+def _keyset_rows(queryset, fields, chunk_size):
+    last_id = 0
+    while True:
+        chunk = (queryset.filter(id__gt=last_id).order_by('id')
+                 .values(*fields)[:chunk_size])
+        count = 0
+        for row in chunk.iterator(chunk_size=chunk_size):
+            count += 1
+            last_id = row['id']
+            yield row
+        if count < chunk_size:
+            return
+
+
+def _author_querysets(models, author):
+    # записи автора лежат на всех шардах (до и после переноса) и в архиве
+    for alias in shards():
+        for model in models:
+            yield model.objects.using(alias).filter(author_id=author.pk)
+
+
+def iter_author_rows(author, chunk_size=EXPORT_CHUNK_SIZE):
+    """Отдаёт посты и комментарии автора по одной записи.
+
+    Строки читаются порциями по id с каждого шарда, из горячих таблиц и
+    из архива, поэтому память не зависит от числа записей автора.
+    """
+    for queryset in _author_querysets((Post, ArchivedPost), author):
+        for row in _keyset_rows(
+                queryset, ('id', 'text', 'pub_date', 'group__slug', 'image'),
+                chunk_size):
+            yield {'type': 'post', 'id': row['id'], 'post': None,
+                   'text': row['text'], 'pub_date': row['pub_date'],
+                   'group': row['group__slug'], 'image': row['image'] or None}
+    for queryset in _author_querysets((Comment, ArchivedComment), author):
+        for row in _keyset_rows(
+                queryset, ('id', 'post_id', 'text', 'created'), chunk_size):
+            yield {'type': 'comment', 'id': row['id'],
+                   'post': row['post_id'], 'text': row['text'],
+                   'pub_date': row['created'], 'group': None, 'image': None}
+
+
+class _Echo:
+    """Файлоподобный объект, который просто возвращает записанное."""
+
+    def write(self, value):
+        return value
+
+
+def iter_jsonl(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder,
+                         ensure_ascii=False) + '\n'
+
+
+def iter_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_COLUMNS)
+    for row in rows:
+        yield writer.writerow([
+            '' if row[column] is None else row[column]
+            for column in CSV_COLUMNS
+        ])
+
+
+class _ZipStream:
+    """Приёмник для zipfile без seek: копит байты до следующего yield."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def iter_zip(author, fmt, chunk_size=EXPORT_CHUNK_SIZE):
+    """Упаковывает выгрузку и картинки постов в zip на лету."""
+    stream = _ZipStream()
+    serialize = iter_csv if fmt == 'csv' else iter_jsonl
+    with zipfile.ZipFile(stream, 'w', zipfile.ZIP_DEFLATED) as archive:
+        with archive.open(f'data.{fmt}', 'w') as data:
+            for line in serialize(iter_author_rows(author, chunk_size)):
+                data.write(line.encode())
+                yield stream.pop()
+        # картинки — вторым проходом, чтобы не копить их имена в памяти
+        for queryset in _author_querysets((Post, ArchivedPost), author):
+            for row in _keyset_rows(queryset.exclude(image=''),
+                                    ('id', 'image'), chunk_size):
+                name = row['image']
+                if not default_storage.exists(name):
+                    continue
+                with default_storage.open(name, 'rb') as source, \
+                        archive.open(os.path.join('images', name),
+                                     'w') as target:
+                    for chunk in iter(
+                            lambda: source.read(FILE_CHUNK_SIZE), b''):
+                        target.write(chunk)
+                        yield stream.pop()
+    yield stream.pop()
+
+
+def export_author(author, fmt='jsonl', with_images=False,
+                  chunk_size=EXPORT_CHUNK_SIZE):
+    if with_images:
+        return iter_zip(author, fmt, chunk_size)
+    rows = iter_author_rows(author, chunk_size)
+    return iter_csv(rows) if fmt == 'csv' else iter_jsonl(rows)
@@ -0,0 +1,323 @@
+import csv
+import json
+import os
+import time
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlparse
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Comment, Follow, Group, Post, PostTag
+from .projection import refresh_cards, refresh_comment_counts
+from .sharding import is_sharded, next_ids, shard_for_author
+from .tags import extract_tags
+
+User = get_user_model()
+
+IMAGE_TIMEOUT = 10
+# столько последних исходных id постов помнит импорт для комментариев
+POST_WINDOW = 100000
+
+
+def read_records(stream, fmt):
+    """Построчно читает JSONL или CSV, не загружая файл целиком."""
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def reserve_autoincrement(model, count):
+    """Резервирует count id в счётчике AUTOINCREMENT таблицы SQLite.
+
+    Обычные INSERT берут следующий id после sqlite_sequence, поэтому
+    параллельная запись не получит id из зарезервированного диапазона,
+    даже если вставка импорта ещё не прошла.
+    """
+    table = connection.ops.quote_name(model._meta.db_table)
+    name = model._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'INSERT INTO sqlite_sequence (name, seq) '
+            'SELECT %s, 0 WHERE NOT EXISTS '
+            '(SELECT 1 FROM sqlite_sequence WHERE name = %s)', [name, name])
+        cursor.execute(
+            f'UPDATE sqlite_sequence SET seq = max(seq, '
+            f'(SELECT COALESCE(MAX(id), 0) FROM {table})) + %s '
+            'WHERE name = %s', [count, name])
+        cursor.execute('SELECT seq FROM sqlite_sequence WHERE name = %s',
+                       [name])
+        last = cursor.fetchone()[0]
+    return list(range(last - count + 1, last + 1))
+
+
+def parse_pub_date(value):
+    """Дата поста из записи; нечитаемая дата — ValueError, а не NULL."""
+    if not value:
+        return None
+    try:
+        date = parse_datetime(value)
+    except TypeError:
+        date = None
+    if date is None:
+        raise ValueError(f'Неверная дата: {value!r}')
+    return date
+
+
+def fetch_image(url):
+    with urllib.request.urlopen(url, timeout=IMAGE_TIMEOUT) as response:
+        content = response.read()
+    name = os.path.basename(urlparse(url).path) or 'image'
+    return default_storage.save(f'posts/{name}', ContentFile(content))
+
+
+class ContentImporter:
+    """Потоковый импорт постов, комментариев и подписок.
+
+    Записи копятся в буферы по типам и сбрасываются пачками через
+    bulk_create, каждая пачка — в своей транзакции. Посты пишутся в шард
+    автора, комментарии — в шард поста. Авторы и группы сопоставляются
+    через словари в памяти. Из исходных id постов (с их шардом) помнятся
+    только последние post_window: комментарий должен идти в файле
+    не дальше этого окна от своего поста, иначе он пропускается.
+    """
+
+    def __init__(self, batch_size=1000, create_users=False,
+                 image_workers=0, report=None, post_window=POST_WINDOW):
+        self.batch_size = batch_size
+        self.post_window = post_window
+        self.create_users = create_users
+        self.report = report or (lambda message: None)
+        self.users = {}
+        self.groups = {}
+        self.posts = OrderedDict()
+        self.buffers = {'post': [], 'comment': [], 'follow': []}
+        self.counts = {'post': 0, 'comment': 0, 'follow': 0, 'skipped': 0,
+                       'images': 0, 'image_errors': 0}
+        self.image_pool = (ThreadPoolExecutor(image_workers)
+                           if image_workers else None)
+        self.image_futures = {}
+        self.image_limit = max(image_workers * 4, 1)
+        self.started = None
+
+    def run(self, records):
+        self.started = time.monotonic()
+        try:
+            for record in records:
+                kind = record.get('type')
+                if kind not in self.buffers:
+                    self.counts['skipped'] += 1
+                    continue
+                self.buffers[kind].append(record)
+                if len(self.buffers[kind]) >= self.batch_size:
+                    self.flush()
+            self.flush()
+            self.drain_images(wait_all=True)
+        finally:
+            if self.image_pool:
+                self.image_pool.shutdown()
+        return self.counts
+
+    @property
+    def rows(self):
+        return self.counts['post'] + self.counts['comment'] + self.counts[
+            'follow']
+
+    def rate(self):
+        elapsed = time.monotonic() - self.started
+        return self.rows / elapsed if elapsed else 0.0
+
+    def flush(self):
+        # посты сбрасываются первыми: на них ссылаются комментарии
+        with transaction.atomic():
+            self.flush_posts(self.buffers['post'])
+        with transaction.atomic():
+            self.flush_comments(self.buffers['comment'])
+        with transaction.atomic():
+            self.flush_follows(self.buffers['follow'])
+        for buffer in self.buffers.values():
+            buffer.clear()
+        self.drain_images()
+        self.report(f'{self.rows} строк, {self.rate():.0f} строк/с')
+
+    def resolve_users(self, usernames):
+        missing = {name for name in usernames if name} - self.users.keys()
+        if not missing:
+            return
+        self.users.update(User.objects.filter(username__in=missing)
+                          .values_list('username', 'id'))
+        missing -= self.users.keys()
+        if missing and self.create_users:
+            User.objects.bulk_create(
+                [User(username=name, password='!') for name in missing],
+                ignore_conflicts=True)
+            self.users.update(User.objects.filter(username__in=missing)
+                              .values_list('username', 'id'))
+
+    def resolve_groups(self, slugs):
+        missing = {slug for slug in slugs if slug} - self.groups.keys()
+        if missing:
+            self.groups.update(Group.objects.filter(slug__in=missing)
+                               .values_list('slug', 'id'))
+
+    def allocate_ids(self, model, count):
+        """Выдаёт id заранее там, где bulk_create их не возвращает.
+
+        С шардами id берутся из общей ShardSequence, как у обычной
+        записи; без них — резервируются в счётчике таблицы SQLite.
+        """
+        if is_sharded():
+            return list(next_ids(model, count))
+        if connection.features.can_return_ids_from_bulk_insert:
+            return [None] * count
+        return reserve_autoincrement(model, count)
+
+    def flush_posts(self, records):
+        self.resolve_users(record.get('author') for record in records)
+        self.resolve_groups(record.get('group') for record in records)
+        pending = []
+        for record in records:
+            if record.get('author') not in self.users:
+                continue
+            try:
+                pending.append((record, parse_pub_date(record.get(
+                    'pub_date'))))
+            except ValueError:
+                continue
+        self.counts['skipped'] += len(records) - len(pending)
+        if not pending:
+            return
+        ids = self.allocate_ids(Post, len(pending))
+        posts = [
+            Post(id=pk, text=record.get('text', ''),
+                 author_id=self.users[record['author']],
+                 group_id=self.groups.get(record.get('group')))
+            for pk, (record, _) in zip(ids, pending)
+        ]
+        by_shard = {}
+        for post, (record, pub_date) in zip(posts, pending):
+            post.set_excerpt()
+            by_shard.setdefault(shard_for_author(post.author_id), []).append(
+                (post, record, pub_date))
+        for alias, rows in by_shard.items():
+            with transaction.atomic(using=alias):
+                self.write_posts(alias, rows)
+        refresh_cards([post.pk for post in posts])
+        self.counts['post'] += len(posts)
+
+    def write_posts(self, alias, rows):
+        posts = [post for post, _, _ in rows]
+        Post.objects.using(alias).bulk_create(posts,
+                                              batch_size=self.batch_size)
+        dated = []
+        for post, record, pub_date in rows:
+            if record.get('id'):
+                self.remember_post(str(record['id']), post.pk, alias)
+            if pub_date:
+                post.pub_date = pub_date
+                dated.append(post)
+            if record.get('image_url') and self.image_pool:
+                self.submit_image(post.pk, alias, record['image_url'])
+        if dated:
+            # auto_now_add перезаписывает дату при вставке
+            Post.objects.using(alias).bulk_update(
+                dated, ['pub_date'], batch_size=self.batch_size)
+        PostTag.objects.using(alias).bulk_create(
+            [PostTag(tag=tag, pub_date=post.pub_date, post_id=post.pk)
+             for post in posts for tag in extract_tags(post.text)],
+            batch_size=self.batch_size)
+
+    def remember_post(self, source_id, pk, alias):
+        self.posts[source_id] = (pk, alias)
+        self.posts.move_to_end(source_id)
+        if len(self.posts) > self.post_window:
+            self.posts.popitem(last=False)
+
+    def flush_comments(self, records):
+        self.resolve_users(record.get('author') for record in records)
+        pending = [
+            r for r in records
+            if r.get('author') in self.users and str(r.get('post'))
+            in self.posts
+        ]
+        self.counts['skipped'] += len(records) - len(pending)
+        if not pending:
+            return
+        ids = self.allocate_ids(Comment, len(pending))
+        by_shard = {}
+        for pk, record in zip(ids, pending):
+            post_id, alias = self.posts[str(record['post'])]
+            by_shard.setdefault(alias, []).append(Comment(
+                id=pk, text=record.get('text', ''),
+                author_id=self.users[record['author']], post_id=post_id))
+        for alias, comments in by_shard.items():
+            with transaction.atomic(using=alias):
+                Comment.objects.using(alias).bulk_create(
+                    comments, batch_size=self.batch_size)
+                PostTag.objects.using(alias).bulk_create(
+                    [PostTag(tag=tag, pub_date=comment.created,
+                             post_id=comment.post_id, comment_id=comment.pk)
+                     for comment in comments
+                     for tag in extract_tags(comment.text)],
+                    batch_size=self.batch_size)
+        refresh_comment_counts(comment.post_id
+                               for comments in by_shard.values()
+                               for comment in comments)
+        self.counts['comment'] += len(pending)
+
+    def flush_follows(self, records):
+        self.resolve_users(
+            name for record in records
+            for name in (record.get('user'), record.get('author')))
+        follows = [
+            Follow(user_id=self.users[record['user']],
+                   author_id=self.users[record['author']])
+            for record in records
+            if record.get('user') in self.users
+            and record.get('author') in self.users
+            and record['user'] != record['author']
+        ]
+        self.counts['skipped'] += len(records) - len(follows)
+        Follow.objects.bulk_create(follows, batch_size=self.batch_size,
+                                   ignore_conflicts=True)
+        self.counts['follow'] += len(follows)
+
+    def submit_image(self, post_id, alias, url):
+        if len(self.image_futures) >= self.image_limit:
+            self.drain_images(block=True)
+        future = self.image_pool.submit(fetch_image, url)
+        self.image_futures[future] = (post_id, alias)
+
+    def drain_images(self, block=False, wait_all=False):
+        if not self.image_futures:
+            return
+        if wait_all:
+            done, _ = wait(self.image_futures)
+        elif block:
+            done, _ = wait(self.image_futures, return_when=FIRST_COMPLETED)
+        else:
+            done = [f for f in self.image_futures if f.done()]
+        fetched = {}
+        now = timezone.now()
+        for future in done:
+            post_id, alias = self.image_futures.pop(future)
+            if future.exception() is None:
+                fetched.setdefault(alias, []).append(
+                    Post(id=post_id, image=future.result(), updated_at=now))
+            else:
+                self.counts['image_errors'] += 1
+        for alias, posts in fetched.items():
+            Post.objects.using(alias).bulk_update(posts,
+                                                  ['image', 'updated_at'])
+            refresh_cards([post.pk for post in posts])
+            self.counts['images'] += len(posts)
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from core.jobs import enqueue
+from posts.archive import ARCHIVE_BATCH_SIZE, archive_cutoff, archive_posts
+from posts.sharding import shards
+
+
+class Command(BaseCommand):
+    help = 'Переносит старые посты и комментарии к ним в архив.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='архивировать посты старше N дней')
+        parser.add_argument('--max-hot', type=int, default=None,
+                            help='оставить в горячей таблице не больше N')
+        parser.add_argument('--batch-size', type=int,
+                            default=ARCHIVE_BATCH_SIZE)
+        parser.add_argument('--schedule', type=int, default=None,
+                            metavar='HOURS',
+                            help='не архивировать сейчас, а поставить '
+                                 'задачу в очередь с повтором раз в N часов')
+
+    def handle(self, *args, **options):
+        if options['schedule']:
+            job = enqueue('posts.archive_old_posts',
+                          repeat_hours=options['schedule'],
+                          key='posts.archive_old_posts')
+            self.stdout.write(f'Задача #{job.pk} в очереди')
+            return
+        moved = 0
+        for alias in shards():
+            cutoff = archive_cutoff(options['days'], options['max_hot'],
+                                    using=alias)
+            self.stdout.write(f'{alias}: архивируются посты до {cutoff}')
+            moved += archive_posts(
+                cutoff, options['batch_size'], using=alias,
+                progress=lambda done, total: self.stdout.write(
+                    f'… {done}/{total}'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено в архив постов: {moved}'))
@@ -0,0 +1,33 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from posts.changes import (CHANGE_FEED_LIMIT, decode_change_cursor,
+                           encode_change_cursor, fetch_changes)
+
+
+class Command(BaseCommand):
+    help = ('Выводит изменения постов, комментариев и подписок после '
+            'курсора в JSONL; последней строкой печатается новый курсор.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cursor', default='')
+        parser.add_argument('--batch-size', type=int,
+                            default=CHANGE_FEED_LIMIT)
+        parser.add_argument('--all', action='store_true',
+                            help='читать пачками до конца ленты')
+
+    def handle(self, *args, **options):
+        after = decode_change_cursor(options['cursor'])
+        if after is False:
+            raise CommandError('Неверный курсор')
+        while True:
+            changes, after, has_more = fetch_changes(
+                after, options['batch_size'])
+            for change in changes:
+                self.stdout.write(json.dumps(change, cls=DjangoJSONEncoder,
+                                             ensure_ascii=False))
+            if not (options['all'] and has_more):
+                break
+        self.stdout.write(json.dumps({'cursor': encode_change_cursor(after)}))
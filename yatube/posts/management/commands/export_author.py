@@ -0,0 +1,45 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.export import EXPORT_CHUNK_SIZE, export_author
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Потоковая выгрузка постов и комментариев автора.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('--format', choices=('jsonl', 'csv'),
+                            default='jsonl')
+        parser.add_argument('--images', action='store_true',
+                            help='упаковать выгрузку и картинки в zip')
+        parser.add_argument('--output', default='-',
+                            help='файл или "-" для stdout')
+        parser.add_argument('--chunk-size', type=int,
+                            default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            author = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(
+                f'Пользователь {options["username"]} не найден')
+        chunks = export_author(author, options['format'], options['images'],
+                               options['chunk_size'])
+        if options['output'] == '-':
+            output = sys.stdout.buffer
+            close = False
+        else:
+            output = open(options['output'], 'wb')
+            close = True
+        try:
+            for chunk in chunks:
+                output.write(chunk if isinstance(chunk, bytes)
+                             else chunk.encode())
+        finally:
+            if close:
+                output.close()
@@ -0,0 +1,88 @@
+import statistics
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.cards import CardFeed, card_rows
+from posts.models import Post
+from posts.views import FEED_ORDERING
+
+User = get_user_model()
+
+
+class _Rollback(Exception):
+    pass
+
+
+def orm_page(size):
+    posts = list(Post.objects.select_related('author', 'group')
+                 .order_by(*FEED_ORDERING)[:size])
+    for post in posts:
+        # то, что читает шаблон карточки
+        post.author.get_full_name(), post.group and post.group.slug
+    return posts
+
+
+def card_page(size):
+    cards = CardFeed(card_rows(Post.objects.all()).order_by(
+        *FEED_ORDERING))[:size]
+    for card in cards:
+        card.author.get_full_name(), card.group and card.group.slug
+    return cards
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает время и память страницы ленты: модели ORM '
+            'против карточек из values_list.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+',
+                            default=[10, 50, 200],
+                            help='размеры страниц')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0,
+                            help='создать N постов на время замера '
+                                 '(откатываются)')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                if options['seed']:
+                    self.seed(options['seed'])
+                self.measure(options['sizes'], options['repeat'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def seed(self, count):
+        author = User.objects.create_user(
+            username='feed_benchmark', first_name='Имя', last_name='Автор')
+        posts = [Post(author=author, text=f'Пост {i} ' + 'текст ' * 400)
+                 for i in range(count)]
+        for post in posts:
+            post.set_excerpt()
+        Post.objects.bulk_create(posts)
+
+    def measure(self, sizes, repeat):
+        self.stdout.write(f'{"страница":>8} {"способ":<6} {"мс":>8} '
+                          f'{"пик КиБ":>9} {"держит КиБ":>10}')
+        for size in sizes:
+            for name, build in (('orm', orm_page), ('cards', card_page)):
+                build(size)
+                timings = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    build(size)
+                    timings.append(time.perf_counter() - started)
+                tracemalloc.start()
+                page = build(size)
+                held, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                del page
+                self.stdout.write(
+                    f'{size:>8} {name:<6} '
+                    f'{statistics.median(timings) * 1000:>8.2f} '
+                    f'{peak / 1024:>9.1f} {held / 1024:>10.1f}')
@@ -0,0 +1,51 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.importer import POST_WINDOW, ContentImporter, read_records
+
+
+class Command(BaseCommand):
+    help = ('Потоковый импорт постов, комментариев и подписок из JSONL '
+            'или CSV. Каждая запись содержит поле type: post, comment '
+            'или follow.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='файл или "-" для stdin')
+        parser.add_argument('--format', choices=('jsonl', 'csv'),
+                            default=None)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--create-users', action='store_true',
+                            help='создавать неизвестных авторов')
+        parser.add_argument('--image-workers', type=int, default=0,
+                            help='потоков для загрузки image_url, 0 — '
+                                 'не загружать картинки')
+        parser.add_argument('--post-window', type=int, default=POST_WINDOW,
+                            help='сколько последних постов помнить для '
+                                 'привязки комментариев')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or (
+            'csv' if path.endswith('.csv') else 'jsonl')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть положительным')
+        if options['post_window'] < 1:
+            raise CommandError('--post-window должен быть положительным')
+        importer = ContentImporter(
+            batch_size=options['batch_size'],
+            create_users=options['create_users'],
+            image_workers=options['image_workers'],
+            report=self.stdout.write,
+            post_window=options['post_window'],
+        )
+        if path == '-':
+            counts = importer.run(read_records(sys.stdin, fmt))
+        else:
+            with open(path, encoding='utf-8', newline='') as stream:
+                counts = importer.run(read_records(stream, fmt))
+        self.stdout.write(self.style.SUCCESS(
+            'Импортировано: постов {post}, комментариев {comment}, '
+            'подписок {follow}, картинок {images}; пропущено {skipped}, '
+            'ошибок картинок {image_errors}'.format(**counts)
+            + f'; {importer.rate():.0f} строк/с'))
@@ -0,0 +1,36 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.bulk import BULK_CHUNK_SIZE
+from posts.purge import deactivate_user, purge_user
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Отключает пользователя и удаляет всё, что он написал.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('--now', action='store_true',
+                            help='удалить сразу, а не задачей в очереди')
+        parser.add_argument('--batch-size', type=int,
+                            default=BULK_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(
+                f'Пользователь {options["username"]} не найден')
+        job = deactivate_user(user)
+        if not options['now']:
+            self.stdout.write(f'Задача #{job.pk} в очереди')
+            return
+        job.delete()
+        deleted = purge_user(
+            user.pk, options['batch_size'],
+            progress=lambda done, total: self.stdout.write(
+                f'… {done}/{total}'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Пользователь удалён, строк удалено: {deleted}'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from core.jobs import enqueue
+from posts.bulk import BULK_CHUNK_SIZE
+from posts.projection import REBUILD_CARDS_TASK, rebuild_cards
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает карточки постов, из которых читаются ленты.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int,
+                            default=BULK_CHUNK_SIZE)
+        parser.add_argument('--background', action='store_true',
+                            help='поставить задачей в очередь')
+
+    def handle(self, *args, **options):
+        if options['background']:
+            job = enqueue(REBUILD_CARDS_TASK, key=REBUILD_CARDS_TASK)
+            self.stdout.write(f'Задача #{job.pk} в очереди')
+            return
+        rebuilt = rebuild_cards(
+            options['chunk_size'],
+            progress=lambda done, total: self.stdout.write(
+                f'… {done}/{total}'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Карточек пересобрано: {rebuilt}'))
@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.models import Comment, Post, PostTag
+from posts.sharding import on_shard, shards
+from posts.tags import extract_tags
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает индекс хештегов и упоминаний порциями.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        posts = comments = 0
+        for alias in shards():
+            tags = on_shard(PostTag.objects.all(), alias)
+            posts += self.reindex(
+                on_shard(Post.objects.values_list('id', 'text', 'pub_date'),
+                         alias),
+                chunk_size,
+                lambda ids: tags.filter(post_id__in=ids, comment=None),
+                lambda pk, text, date: (
+                    PostTag(tag=tag, pub_date=date, post_id=pk)
+                    for tag in extract_tags(text)
+                ),
+            )
+            comments += self.reindex(
+                on_shard(Comment.objects.values_list(
+                    'id', 'text', 'created', 'post_id'), alias),
+                chunk_size,
+                lambda ids: tags.filter(comment_id__in=ids),
+                lambda pk, text, date, post_id: (
+                    PostTag(tag=tag, pub_date=date, post_id=post_id,
+                            comment_id=pk)
+                    for tag in extract_tags(text)
+                ),
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Переиндексировано постов: {posts}, комментариев: {comments}'))
+
+    def reindex(self, rows, chunk_size, existing, build):
+        last_id = 0
+        total = 0
+        while True:
+            # порции идут по первичному ключу, без OFFSET
+            chunk = list(rows.filter(id__gt=last_id)
+                         .order_by('id')[:chunk_size])
+            if not chunk:
+                return total
+            ids = [row[0] for row in chunk]
+            stale = existing(ids)
+            with transaction.atomic(using=stale.db):
+                stale.delete()
+                PostTag.objects.using(stale.db).bulk_create(
+                    [tag for row in chunk for tag in build(*row)],
+                    batch_size=chunk_size,
+                )
+            last_id = ids[-1]
+            total += len(chunk)
+            self.stdout.write(f'… {total}')
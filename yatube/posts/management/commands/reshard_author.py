@@ -0,0 +1,33 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.sharding import move_author, shards, sync_reference_tables
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Переносит посты автора в другой шард; запись автора на это '
+            'время отклоняется.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('shard')
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--sync-reference', action='store_true',
+                            help='сначала залить в шард пользователей '
+                                 'и группы')
+
+    def handle(self, *args, **options):
+        if options['shard'] not in shards():
+            raise CommandError(f'Шарда {options["shard"]} нет в POST_SHARDS')
+        try:
+            author = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(
+                f'Пользователь {options["username"]} не найден')
+        if options['sync_reference']:
+            sync_reference_tables(options['shard'])
+        moved = move_author(author.pk, options['shard'],
+                            options['chunk_size'], report=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(f'Перенесено строк: {moved}'))
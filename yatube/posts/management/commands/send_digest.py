@@ -0,0 +1,21 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts.digest import send_digests
+
+
+class Command(BaseCommand):
+    help = 'Рассылает дайджест новых постов из подписок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24,
+                            help='за сколько часов брать новые посты')
+        parser.add_argument('--workers', type=int, default=0,
+                            help='процессов для рендеринга писем')
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(hours=options['hours'])
+        sent = send_digests(since, options['workers'])
+        self.stdout.write(f'Писем поставлено в очередь: {sent}')
@@ -0,0 +1,38 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_auto_20220423_0251'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=[
+                "CREATE VIRTUAL TABLE IF NOT EXISTS posts_post_fts USING "
+                "fts5(text, content='posts_post', content_rowid='id')",
+                "CREATE TRIGGER IF NOT EXISTS posts_post_fts_ai "
+                "AFTER INSERT ON posts_post BEGIN "
+                "INSERT INTO posts_post_fts(rowid, text) "
+                "VALUES (new.id, new.text); END",
+                "CREATE TRIGGER IF NOT EXISTS posts_post_fts_ad "
+                "AFTER DELETE ON posts_post BEGIN "
+                "INSERT INTO posts_post_fts(posts_post_fts, rowid, text) "
+                "VALUES ('delete', old.id, old.text); END",
+                "CREATE TRIGGER IF NOT EXISTS posts_post_fts_au "
+                "AFTER UPDATE OF text ON posts_post BEGIN "
+                "INSERT INTO posts_post_fts(posts_post_fts, rowid, text) "
+                "VALUES ('delete', old.id, old.text); "
+                "INSERT INTO posts_post_fts(rowid, text) "
+                "VALUES (new.id, new.text); END",
+                "INSERT INTO posts_post_fts(posts_post_fts) VALUES ('rebuild')",
+            ],
+            reverse_sql=[
+                "DROP TRIGGER IF EXISTS posts_post_fts_ai",
+                "DROP TRIGGER IF EXISTS posts_post_fts_ad",
+                "DROP TRIGGER IF EXISTS posts_post_fts_au",
+                "DROP TABLE IF EXISTS posts_post_fts",
+            ],
+        ),
+    ]
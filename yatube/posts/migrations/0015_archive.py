@@ -0,0 +1,70 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:25
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0014_shard_map'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedPost',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('text', models.TextField(verbose_name='Текст поста')),
+                ('pub_date', models.DateTimeField(db_index=True, verbose_name='Дата публикации')),
+                ('image', models.ImageField(blank=True, upload_to='posts/', verbose_name='Картинка')),
+                ('updated_at', models.DateTimeField(verbose_name='Дата изменения')),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата архивации')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_posts', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_posts', to='posts.Group', verbose_name='Группа')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedComment',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('text', models.TextField(verbose_name='Текст комментария')),
+                ('created', models.DateTimeField(verbose_name='Дата публикации')),
+                ('updated_at', models.DateTimeField(verbose_name='Дата изменения')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_comments', to=settings.AUTH_USER_MODEL)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='posts.ArchivedPost')),
+            ],
+        ),
+        migrations.RunSQL(
+            sql=[
+                "CREATE VIRTUAL TABLE IF NOT EXISTS posts_archivedpost_fts "
+                "USING fts5(text, content='posts_archivedpost', "
+                "content_rowid='id')",
+                "CREATE TRIGGER IF NOT EXISTS posts_archivedpost_fts_ai "
+                "AFTER INSERT ON posts_archivedpost BEGIN "
+                "INSERT INTO posts_archivedpost_fts(rowid, text) "
+                "VALUES (new.id, new.text); END",
+                "CREATE TRIGGER IF NOT EXISTS posts_archivedpost_fts_ad "
+                "AFTER DELETE ON posts_archivedpost BEGIN "
+                "INSERT INTO posts_archivedpost_fts("
+                "posts_archivedpost_fts, rowid, text) "
+                "VALUES ('delete', old.id, old.text); END",
+                "CREATE TRIGGER IF NOT EXISTS posts_archivedpost_fts_au "
+                "AFTER UPDATE OF text ON posts_archivedpost BEGIN "
+                "INSERT INTO posts_archivedpost_fts("
+                "posts_archivedpost_fts, rowid, text) "
+                "VALUES ('delete', old.id, old.text); "
+                "INSERT INTO posts_archivedpost_fts(rowid, text) "
+                "VALUES (new.id, new.text); END",
+            ],
+            reverse_sql=[
+                "DROP TRIGGER IF EXISTS posts_archivedpost_fts_ai",
+                "DROP TRIGGER IF EXISTS posts_archivedpost_fts_ad",
+                "DROP TRIGGER IF EXISTS posts_archivedpost_fts_au",
+                "DROP TABLE IF EXISTS posts_archivedpost_fts",
+            ],
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_soft_delete'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostCard',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации')),
+                ('author_id', models.IntegerField(verbose_name='Автор')),
+                ('author_username', models.CharField(max_length=150)),
+                ('author_full_name', models.CharField(blank=True, max_length=300)),
+                ('group_id', models.IntegerField(blank=True, null=True, verbose_name='Группа')),
+                ('group_slug', models.CharField(blank=True, max_length=200)),
+                ('group_title', models.CharField(blank=True, max_length=200)),
+                ('excerpt', models.TextField(verbose_name='Начало текста')),
+                ('truncated', models.BooleanField(default=False)),
+                ('image', models.CharField(blank=True, max_length=100)),
+                ('thumbnail_url', models.CharField(blank=True, max_length=255)),
+                ('comments_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'карточка поста',
+                'verbose_name_plural': 'карточки постов',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='postcard',
+            index=models.Index(fields=['-pub_date', '-id'], name='posts_card_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='postcard',
+            index=models.Index(fields=['group_id', '-pub_date', '-id'], name='posts_card_group_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='postcard',
+            index=models.Index(fields=['author_id', '-pub_date', '-id'], name='posts_card_author_idx'),
+        ),
+    ]
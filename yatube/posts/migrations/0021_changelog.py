@@ -0,0 +1,65 @@
+# Generated by Django 2.2.16 on 2026-10-19 10:24
+
+from django.db import migrations, models
+
+
+def log_trigger(table, model, operation, op=None, row='new.id'):
+    name = f'{table}_changelog_{operation[0]}'
+    return (
+        f"CREATE TRIGGER IF NOT EXISTS {name} "
+        f"AFTER {operation.upper()} ON {table} BEGIN "
+        f"INSERT INTO posts_changelog (model, object_id, op) "
+        f"VALUES ({model}, {row}, '{op or operation}'); END"
+    )
+
+
+TRIGGERS = [
+    log_trigger('posts_post', "'post'", 'insert'),
+    log_trigger('posts_post', "'post'", 'update'),
+    log_trigger('posts_comment', "'comment'", 'insert'),
+    log_trigger('posts_comment', "'comment'", 'update'),
+    log_trigger('posts_follow', "'follow'", 'insert'),
+    log_trigger('posts_tombstone', 'new.model', 'insert', 'delete',
+                'new.object_id'),
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_comment_thread_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=20)),
+                ('object_id', models.IntegerField()),
+                ('op', models.CharField(max_length=10)),
+            ],
+        ),
+        # уже существующие строки попадают в журнал вставками, чтобы
+        # новый потребитель прочитал ленту с начала
+        migrations.RunSQL(
+            sql=[
+                "INSERT INTO posts_changelog (model, object_id, op) "
+                "SELECT 'post', id, 'insert' FROM posts_post ORDER BY id",
+                "INSERT INTO posts_changelog (model, object_id, op) "
+                "SELECT 'comment', id, 'insert' FROM posts_comment "
+                "ORDER BY id",
+                "INSERT INTO posts_changelog (model, object_id, op) "
+                "SELECT 'follow', id, 'insert' FROM posts_follow "
+                "ORDER BY id",
+                *TRIGGERS,
+            ],
+            reverse_sql=[
+                f"DROP TRIGGER IF EXISTS {table}_changelog_{operation}"
+                for table, operation in (
+                    ('posts_post', 'i'), ('posts_post', 'u'),
+                    ('posts_comment', 'i'), ('posts_comment', 'u'),
+                    ('posts_follow', 'i'), ('posts_tombstone', 'i'))
+            ],
+        ),
+    ]
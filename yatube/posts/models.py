@@ -1,8 +1,27 @@
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.utils import timezone
+
+from core.loader import BatchedManager, batch_relations
 
 User = get_user_model()
 
+# столько символов текста хранит excerpt и показывают ленты
+EXCERPT_LENGTH = 1000
+
+
+class VisibleManager(BatchedManager):
+    """Скрывает мягко удалённые записи и записи отключённых авторов.
+
+    Сами строки удаляет фоновый purger; до него их видит только
+    all_objects. Связи объектов в запросе грузятся пачкой,
+    см. core/loader.py.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False,
+                                             author__is_active=True)
+
 
 class Group(models.Model):
     title = models.CharField(max_length=200)
@@ -17,7 +36,8 @@ class Post(models.Model):
     text = models.TextField(verbose_name='Текст поста',
                             help_text='Введите текст поста')
     pub_date = models.DateTimeField(verbose_name='Дата публикации',
-                                    auto_now_add=True)
+                                    auto_now_add=True,
+                                    db_index=True)
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -37,10 +57,42 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True,
+        db_index=True,
+    )
+    is_deleted = models.BooleanField('Удалён', default=False)
+    # ленты читают только начало текста, text им не нужен
+    excerpt = models.TextField('Начало текста', blank=True, editable=False)
+    truncated = models.BooleanField('Текст обрезан', default=False,
+                                    editable=False)
+
+    objects = VisibleManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['id'], name='posts_post_deleted_idx',
+                         condition=models.Q(is_deleted=True)),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    def set_excerpt(self):
+        """Заполняет excerpt; bulk_create и update() его не вызывают."""
+        self.excerpt = self.text[:EXCERPT_LENGTH]
+        self.truncated = len(self.text) > EXCERPT_LENGTH
+
+    def save(self, *args, **kwargs):
+        self.set_excerpt()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'text' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'excerpt',
+                                       'truncated'}
+        super().save(*args, **kwargs)
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -61,7 +113,26 @@ class Comment(models.Model):
     created = models.DateTimeField(
         verbose_name='Дата публикации',
         auto_now_add=True,
+        db_index=True,
     )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True,
+        db_index=True,
+    )
+    is_deleted = models.BooleanField('Удалён', default=False)
+
+    objects = VisibleManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['id'], name='posts_comment_deleted_idx',
+                         condition=models.Q(is_deleted=True)),
+            # ветка комментариев поста по ключу (created, id)
+            models.Index(fields=['post', 'created', 'id'],
+                         name='posts_comment_thread_idx'),
+        ]
 
     def __str__(self):
         return self.text
@@ -78,6 +149,11 @@ class Follow(models.Model):
         on_delete=models.CASCADE,
         related_name='following'
     )
+    created = models.DateTimeField(
+        verbose_name='Дата подписки',
+        auto_now_add=True,
+        db_index=True,
+    )
 
     class Meta:
         constraints = [
@@ -87,3 +163,186 @@ class Follow(models.Model):
 
     def __str__(self):
         return f'{self.user} подписан на {self.author}'
+
+
+class PostTag(models.Model):
+    """Обратный индекс хештегов и упоминаний: (tag, pub_date, post)."""
+    tag = models.CharField(max_length=150)
+    pub_date = models.DateTimeField()
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='tags'
+    )
+    comment = models.ForeignKey(
+        Comment,
+        blank=True,
+        null=True,
+        on_delete=models.CASCADE,
+        related_name='tags'
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['tag', '-pub_date'],
+                         name='posts_tag_feed_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.tag} → {self.post_id}'
+
+
+class Tombstone(models.Model):
+    """Отметка об удалении записи для ленты изменений."""
+    model = models.CharField(max_length=20)
+    object_id = models.IntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f'{self.model} #{self.object_id} удалён'
+
+
+class ChangeLog(models.Model):
+    """Журнал изменений для ленты; строки пишут триггеры SQLite.
+
+    Запись журнала появляется в той же транзакции, что и изменение,
+    а id AUTOINCREMENT растёт в порядке коммитов: SQLite пишет
+    транзакции по одной.
+    """
+    model = models.CharField(max_length=20)
+    object_id = models.IntegerField()
+    op = models.CharField(max_length=10)
+
+    def __str__(self):
+        return f'{self.op} {self.model} #{self.object_id}'
+
+
+class AuthorShard(models.Model):
+    """Карта шардов: в какой базе лежат посты автора."""
+    author_id = models.IntegerField(primary_key=True)
+    shard = models.CharField(max_length=50)
+    # куда автор переносится прямо сейчас; пока пусто — переноса нет
+    moving_to = models.CharField(max_length=50, blank=True)
+
+    def __str__(self):
+        return f'{self.author_id} → {self.shard}'
+
+
+class ShardSequence(models.Model):
+    """Сквозной счётчик id для таблиц, разложенных по шардам."""
+    name = models.CharField(max_length=50, primary_key=True)
+    last_id = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.name}: {self.last_id}'
+
+
+class ArchivedPost(models.Model):
+    """Старый пост, перенесённый из posts_post; схема та же, id прежний."""
+    id = models.IntegerField(primary_key=True)
+    text = models.TextField(verbose_name='Текст поста')
+    pub_date = models.DateTimeField(verbose_name='Дата публикации',
+                                    db_index=True)
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_posts',
+        verbose_name='Автор'
+    )
+    group = models.ForeignKey(
+        Group,
+        blank=True,
+        null=True,
+        on_delete=models.SET_NULL,
+        related_name='archived_posts',
+        verbose_name='Группа'
+    )
+    image = models.ImageField('Картинка', upload_to='posts/', blank=True)
+    updated_at = models.DateTimeField(verbose_name='Дата изменения')
+    is_deleted = models.BooleanField('Удалён', default=False)
+    excerpt = models.TextField('Начало текста', blank=True, editable=False)
+    truncated = models.BooleanField('Текст обрезан', default=False,
+                                    editable=False)
+    archived_at = models.DateTimeField(verbose_name='Дата архивации',
+                                       default=timezone.now)
+
+    objects = VisibleManager()
+    all_objects = models.Manager()
+
+    def __str__(self):
+        return self.text[:15]
+
+
+class ArchivedComment(models.Model):
+    """Комментарий к посту из архива."""
+    id = models.IntegerField(primary_key=True)
+    post = models.ForeignKey(
+        ArchivedPost,
+        on_delete=models.CASCADE,
+        related_name='comments'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_comments',
+    )
+    text = models.TextField(verbose_name='Текст комментария')
+    created = models.DateTimeField(verbose_name='Дата публикации')
+    updated_at = models.DateTimeField(verbose_name='Дата изменения')
+    is_deleted = models.BooleanField('Удалён', default=False)
+
+    objects = VisibleManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'created', 'id'],
+                         name='posts_archcomment_thread_idx'),
+        ]
+
+    def __str__(self):
+        return self.text
+
+
+class PostCard(models.Model):
+    """Готовая карточка поста для лент; ведёт posts/projection.py.
+
+    id совпадает с id поста. Внешних ключей нет: посты могут лежать
+    в шардах, а карточки — всегда в основной базе, чтобы лента
+    читалась одним запросом по индексу.
+    """
+    id = models.IntegerField(primary_key=True)
+    pub_date = models.DateTimeField('Дата публикации')
+    author_id = models.IntegerField('Автор')
+    author_username = models.CharField(max_length=150)
+    author_full_name = models.CharField(max_length=300, blank=True)
+    group_id = models.IntegerField('Группа', null=True, blank=True)
+    group_slug = models.CharField(max_length=200, blank=True)
+    group_title = models.CharField(max_length=200, blank=True)
+    excerpt = models.TextField('Начало текста')
+    truncated = models.BooleanField(default=False)
+    image = models.CharField(max_length=100, blank=True)
+    thumbnail_url = models.CharField(max_length=255, blank=True)
+    comments_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'карточка поста'
+        verbose_name_plural = 'карточки постов'
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='posts_card_feed_idx'),
+            models.Index(fields=['group_id', '-pub_date', '-id'],
+                         name='posts_card_group_idx'),
+            models.Index(fields=['author_id', '-pub_date', '-id'],
+                         name='posts_card_author_idx'),
+        ]
+
+    def __str__(self):
+        return self.excerpt[:15]
+
+
+# автор, группа и пост в шаблонах грузятся пачкой на всю выборку
+batch_relations(Post, 'author', 'group')
+batch_relations(Comment, 'author', 'post')
+batch_relations(ArchivedPost, 'author', 'group')
+batch_relations(ArchivedComment, 'author', 'post')
@@ -0,0 +1,183 @@
+import logging
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Count
+from sorl.thumbnail import get_thumbnail
+
+from core.jobs import enqueue
+
+from .bulk import BULK_CHUNK_SIZE, iter_pk_chunks
+from .cards import excerpt_fallback
+from .models import Comment, Post, PostCard
+from .sharding import shards
+
+logger = logging.getLogger(__name__)
+
+CARD_THUMBNAIL = '960x339'
+REBUILD_CARDS_TASK = 'posts.rebuild_cards'
+CARD_THUMBNAILS_TASK = 'posts.card_thumbnails'
+
+
+def thumbnail_url(image):
+    """URL миниатюры ленты; пустой, если картинки нет или она битая."""
+    if not image:
+        return ''
+    try:
+        if not default_storage.exists(str(image)):
+            return ''
+        return get_thumbnail(image, CARD_THUMBNAIL, crop='center',
+                             upscale=True).url
+    except Exception:
+        logger.exception('Не удалось построить миниатюру %s', image)
+        return ''
+
+
+def build_card(post, comments_count=0, thumbnail=''):
+    """Карточка поста; миниатюру строит задача fill_thumbnails."""
+    author = post.author
+    group = post.group
+    return PostCard(
+        id=post.pk,
+        pub_date=post.pub_date,
+        author_id=author.pk,
+        author_username=author.username,
+        author_full_name=author.get_full_name(),
+        group_id=group.pk if group else None,
+        group_slug=group.slug if group else '',
+        group_title=group.title if group else '',
+        excerpt=getattr(post, 'feed_excerpt', post.excerpt),
+        truncated=getattr(post, 'feed_truncated', post.truncated),
+        image=str(post.image or ''),
+        thumbnail_url=thumbnail,
+        comments_count=comments_count,
+    )
+
+
+def _chunks(ids, size=BULK_CHUNK_SIZE):
+    ids = list(ids)
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def _comment_counts(alias, ids):
+    return dict(Comment.objects.using(alias).filter(
+        post_id__in=ids).order_by().values_list('post_id').annotate(
+        total=Count('id')))
+
+
+def refresh_cards(post_ids):
+    """Пересобирает карточки постов из их текущего состояния.
+
+    Карточки скрытых, удалённых и перенесённых в архив постов
+    удаляются. Порция пересобирается в одной транзакции. Миниатюра
+    остаётся прежней, если картинка не менялась; новые строит задача
+    CARD_THUMBNAILS_TASK, чтобы sorl не работал в запросе или импорте.
+    """
+    for ids in _chunks(post_ids):
+        thumbnails = {
+            (pk, image): url
+            for pk, image, url in PostCard.objects.filter(
+                pk__in=ids).exclude(thumbnail_url='').values_list(
+                'pk', 'image', 'thumbnail_url')
+        }
+        cards = []
+        for alias in shards():
+            posts = Post.objects.using(alias).filter(
+                pk__in=ids).select_related('author', 'group').defer(
+                'text').annotate(**excerpt_fallback())
+            counts = _comment_counts(alias, ids)
+            cards.extend(
+                build_card(post, counts.get(post.pk, 0), thumbnails.get(
+                    (post.pk, str(post.image or '')), ''))
+                for post in posts)
+        pending = [card.pk for card in cards
+                   if card.image and not card.thumbnail_url]
+        with transaction.atomic(using='default'):
+            PostCard.objects.filter(pk__in=ids).delete()
+            PostCard.objects.bulk_create(cards)
+            if pending:
+                enqueue(CARD_THUMBNAILS_TASK, post_ids=pending)
+
+
+def fill_thumbnails(post_ids):
+    """Строит миниатюры карточек, у которых их ещё нет.
+
+    Картинка могла смениться, пока задача ждала очереди, поэтому
+    миниатюра записывается только к той картинке, для которой строилась.
+    """
+    cards = PostCard.objects.filter(
+        pk__in=post_ids, thumbnail_url='').exclude(image='').values_list(
+        'pk', 'image')
+    for pk, image in cards:
+        url = thumbnail_url(image)
+        if url:
+            PostCard.objects.filter(pk=pk, image=image).update(
+                thumbnail_url=url)
+
+
+def drop_cards(post_ids):
+    for ids in _chunks(post_ids):
+        PostCard.objects.filter(pk__in=ids).delete()
+
+
+def refresh_comment_counts(post_ids):
+    for ids in _chunks(set(post_ids)):
+        counts = {}
+        for alias in shards():
+            counts.update(_comment_counts(alias, ids))
+        for post_id in ids:
+            PostCard.objects.filter(pk=post_id).update(
+                comments_count=counts.get(post_id, 0))
+
+
+def refresh_author(user):
+    """Подписи автора в карточках; отключённый автор их теряет."""
+    cards = PostCard.objects.filter(author_id=user.pk)
+    if not user.is_active:
+        cards.delete()
+        return
+    updated = cards.update(author_username=user.username,
+                           author_full_name=user.get_full_name())
+    if not updated:
+        # автора включили обратно — карточек у него ещё нет
+        for alias in shards():
+            for ids in iter_pk_chunks(Post.objects.using(alias).filter(
+                    author_id=user.pk)):
+                refresh_cards(ids)
+
+
+def refresh_group(group):
+    PostCard.objects.filter(group_id=group.pk).update(
+        group_slug=group.slug, group_title=group.title)
+
+
+def forget_group(group_id):
+    PostCard.objects.filter(group_id=group_id).update(
+        group_id=None, group_slug='', group_title='')
+
+
+def rebuild_cards(chunk_size=BULK_CHUNK_SIZE, progress=None):
+    """Пересобирает все карточки без остановки сайта.
+
+    Посты проходятся порциями по pk, затем удаляются карточки
+    постов, которых больше нет среди видимых. Возвращает число
+    пересобранных постов.
+    """
+    total = sum(Post.objects.using(alias).count() for alias in shards())
+    done = 0
+    if progress:
+        progress(done, total)
+    for alias in shards():
+        for ids in iter_pk_chunks(Post.objects.using(alias), chunk_size):
+            refresh_cards(ids)
+            done += len(ids)
+            if progress:
+                progress(done, total)
+    for ids in iter_pk_chunks(PostCard.objects.all(), chunk_size):
+        alive = set()
+        for alias in shards():
+            alive.update(Post.objects.using(alias).filter(
+                pk__in=ids).values_list('pk', flat=True))
+        drop_cards(pk for pk in ids if pk not in alive)
+    return done
@@ -0,0 +1,137 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+
+from core.jobs import enqueue
+
+from .bulk import (BULK_CHUNK_SIZE, _delete_comments, _delete_follows,
+                   _delete_posts, invalidate_feed_caches, iter_pk_chunks,
+                   raw_delete)
+from .changes import record_tombstones
+from .models import ArchivedComment, ArchivedPost, Comment, Follow, Post
+from .projection import drop_cards, refresh_comment_counts
+from .sharding import each_shard, shards
+
+User = get_user_model()
+
+PURGE_USER_TASK = 'posts.purge_user'
+PURGE_DELETED_TASK = 'posts.purge_deleted'
+
+
+def _delete_archived_posts(ids, using):
+    comments = ArchivedComment.all_objects.using(using).filter(
+        post_id__in=ids)
+    posts = ArchivedPost.all_objects.using(using).filter(pk__in=ids)
+    # архив попал в ленту изменений ещё горячими строками
+    record_tombstones(comments)
+    record_tombstones(posts)
+    raw_delete(comments)
+    raw_delete(posts)
+
+
+def _delete_archived_comments(ids, using):
+    comments = ArchivedComment.all_objects.using(using).filter(pk__in=ids)
+    record_tombstones(comments)
+    raw_delete(comments)
+
+
+def _purge(steps, batch_size, progress):
+    """Удаляет строки шагов порциями по pk, по транзакции на порцию.
+
+    Шаг — пара (выборка, apply(ids, using)); общий прогресс считается
+    по всем шагам сразу. Возвращает число удалённых строк.
+    """
+    total = sum(queryset.count() for queryset, _ in steps)
+    done = 0
+    if progress:
+        progress(done, total)
+    for queryset, apply in steps:
+        for ids in iter_pk_chunks(queryset, batch_size):
+            with transaction.atomic(using=queryset.db):
+                apply(ids, queryset.db)
+            done += len(ids)
+            if progress:
+                progress(done, total)
+    return done
+
+
+def purge_user(user_id, batch_size=BULK_CHUNK_SIZE, progress=None):
+    """Удаляет пользователя со всем, что он написал.
+
+    Сначала порциями стираются посты с комментариями к ним, его
+    комментарии к чужим постам, архив и подписки в обе стороны; сам
+    пользователь удаляется последним, когда каскаду уже нечего грузить.
+    """
+    steps = []
+    for alias in shards():
+        steps += [
+            (Post.all_objects.using(alias).filter(author_id=user_id),
+             _delete_posts),
+            (Comment.all_objects.using(alias).filter(author_id=user_id),
+             _delete_comments),
+            (ArchivedComment.all_objects.using(alias).filter(
+                author_id=user_id), _delete_archived_comments),
+            (ArchivedPost.all_objects.using(alias).filter(
+                author_id=user_id), _delete_archived_posts),
+        ]
+    steps.append((
+        Follow.objects.filter(Q(user_id=user_id) | Q(author_id=user_id)),
+        lambda ids, using: _delete_follows(ids),
+    ))
+    done = _purge(steps, batch_size, progress)
+    User.objects.filter(pk=user_id).delete()
+    invalidate_feed_caches()
+    return done
+
+
+def purge_deleted(batch_size=BULK_CHUNK_SIZE, progress=None):
+    """Физически удаляет посты и комментарии, помеченные удалёнными."""
+    steps = []
+    for alias in shards():
+        steps += [
+            (Post.all_objects.using(alias).filter(is_deleted=True),
+             _delete_posts),
+            (Comment.all_objects.using(alias).filter(is_deleted=True),
+             _delete_comments),
+            (ArchivedPost.all_objects.using(alias).filter(is_deleted=True),
+             _delete_archived_posts),
+            (ArchivedComment.all_objects.using(alias).filter(
+                is_deleted=True), _delete_archived_comments),
+        ]
+    done = _purge(steps, batch_size, progress)
+    if done:
+        invalidate_feed_caches()
+    return done
+
+
+def soft_delete(queryset):
+    """Скрывает записи сразу, а удаление ставит в очередь.
+
+    Выборка применяется в каждом шарде. Возвращает задачу purger'а;
+    она одна на все помеченные записи.
+    """
+    for rows in each_shard(queryset):
+        if queryset.model is Post:
+            ids = list(rows.values_list('pk', flat=True))
+            rows.update(is_deleted=True)
+            drop_cards(ids)
+        else:
+            post_ids = set(rows.values_list('post_id', flat=True))
+            rows.update(is_deleted=True)
+            refresh_comment_counts(post_ids)
+    invalidate_feed_caches()
+    return enqueue(PURGE_DELETED_TASK, key=PURGE_DELETED_TASK)
+
+
+def deactivate_user(user):
+    """Отключает пользователя и ставит удаление его данных в очередь.
+
+    Отключённый автор пропадает из лент сразу: менеджеры постов
+    и комментариев фильтруют по is_active. Сохраняется через save(),
+    чтобы флаг дошёл до копий пользователя в шардах.
+    """
+    user.is_active = False
+    user.save(update_fields=['is_active'])
+    invalidate_feed_caches()
+    return enqueue(PURGE_USER_TASK, user_id=user.pk,
+                   key=f'{PURGE_USER_TASK}:{user.pk}')
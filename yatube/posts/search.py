@@ -0,0 +1,182 @@
+import re
+
+from django.db import connections
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import ArchivedPost, Post
+from .sharding import on_shard, shards
+
+FTS_TABLE = 'posts_post_fts'
+ARCHIVE_FTS_TABLE = 'posts_archivedpost_fts'
+
+
+def fts_schema(content_table):
+    """SQL внешнего индекса FTS5 для таблицы постов и его триггеров.
+
+    Триггеры держат индекс в согласии с таблицей, в том числе при
+    bulk_create, queryset.update() и сырых DELETE.
+    """
+    fts = f'{content_table}_fts'
+    create = (
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"text, content='{content_table}', content_rowid='id')"
+    )
+    triggers = (
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai "
+        f"AFTER INSERT ON {content_table} "
+        f"BEGIN INSERT INTO {fts}(rowid, text) "
+        f"VALUES (new.id, new.text); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad "
+        f"AFTER DELETE ON {content_table} "
+        f"BEGIN INSERT INTO {fts}({fts}, rowid, text) "
+        f"VALUES ('delete', old.id, old.text); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au "
+        f"AFTER UPDATE OF text ON {content_table} "
+        f"BEGIN INSERT INTO {fts}({fts}, rowid, text) "
+        f"VALUES ('delete', old.id, old.text); "
+        f"INSERT INTO {fts}(rowid, text) VALUES (new.id, new.text); END",
+    )
+    return create, triggers
+
+
+CREATE_FTS_TABLE, CREATE_FTS_TRIGGERS = fts_schema('posts_post')
+ARCHIVE_FTS_SCHEMA = fts_schema('posts_archivedpost')
+
+# служебные символы, которыми FTS5 обрамляет совпадения в сниппете;
+# текст экранируется уже после, и только затем они меняются на <mark>
+_MARK_START = '\x02'
+_MARK_END = '\x03'
+SNIPPET_TOKENS = 16
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def ensure_search_triggers(using='default'):
+    """Восстанавливает триггеры после миграций, пересоздающих таблицы
+    постов."""
+    if connections[using].vendor != 'sqlite':
+        return
+    with connections[using].cursor() as cursor:
+        for create, triggers in ((CREATE_FTS_TABLE, CREATE_FTS_TRIGGERS),
+                                 ARCHIVE_FTS_SCHEMA):
+            cursor.execute(create)
+            for statement in triggers:
+                cursor.execute(statement)
+
+
+def build_match_expression(query):
+    """Превращает ввод пользователя в безопасный запрос FTS5.
+
+    Каждое слово берётся в кавычки, поэтому операторы FTS5 в запросе
+    не интерпретируются; последнее слово ищется по префиксу.
+    """
+    tokens = _TOKEN_RE.findall(query or '')
+    if not tokens:
+        return ''
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+class RawSubquery(RawSQL):
+    """RawSQL для правой части __in: lookup сам берёт его в скобки,
+    а двойные скобки SQLite считает скалярным значением."""
+
+    def as_sql(self, compiler, connection):
+        return self.sql, self.params
+
+
+def match_ids_sql(expression):
+    """Подзапрос с id постов, подходящих под выражение FTS5."""
+    return RawSubquery(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        (expression,),
+    )
+
+
+def highlight(snippet):
+    return mark_safe(
+        escape(snippet)
+        .replace(_MARK_START, '<mark>')
+        .replace(_MARK_END, '</mark>')
+    )
+
+
+class SearchResult:
+    __slots__ = ('post', 'snippet', 'score')
+
+    def __init__(self, post, snippet, score):
+        self.post = post
+        self.snippet = snippet
+        self.score = score
+
+
+def _matches(table):
+    return (
+        f"SELECT rowid AS id, bm25({table}) AS score, "
+        f"snippet({table}, 0, %s, %s, '…', %s) AS snip "
+        f"FROM {table} WHERE {table} MATCH %s"
+    )
+
+
+def search_posts(query, after=None, limit=10):
+    """Ищет посты по индексам FTS5 горячей таблицы и архива.
+
+    Результаты упорядочены по релевантности bm25 (чем меньше, тем лучше)
+    и id; постраничный вывод идёт по ключу (score, id) из `after`,
+    а не через OFFSET. Id архивных постов не пересекаются с горячими,
+    а id разных шардов выдаёт общая последовательность, поэтому ключ
+    общий, и страницы шардов просто сливаются. Возвращает список
+    результатов и курсор следующей страницы либо None.
+    """
+    expression = build_match_expression(query)
+    if not expression:
+        return [], None
+    sql = (
+        f"SELECT id, score, snip FROM ("
+        f"{_matches(FTS_TABLE)} UNION ALL {_matches(ARCHIVE_FTS_TABLE)})"
+    )
+    params = [_MARK_START, _MARK_END, SNIPPET_TOKENS, expression] * 2
+    if after is not None:
+        score, last_id = after
+        sql += ' WHERE score > %s OR (score = %s AND id > %s)'
+        params += [score, score, last_id]
+    sql += ' ORDER BY score, id LIMIT %s'
+    params.append(limit + 1)
+    found = []
+    for alias in shards():
+        with connections[alias].cursor() as cursor:
+            cursor.execute(sql, params)
+            found.extend(row + (alias,) for row in cursor.fetchall())
+    # bm25 считается по индексу своего шарда; у переносимого автора
+    # пост есть в двух шардах, берётся лучшая копия
+    found.sort(key=lambda row: (row[1], row[0]))
+    seen = set()
+    rows = []
+    for row in found:
+        if row[0] not in seen:
+            seen.add(row[0])
+            rows.append(row)
+    has_next = len(rows) > limit
+    rows = rows[:limit]
+    posts = {}
+    for alias in shards():
+        ids = [row[0] for row in rows if row[3] == alias]
+        if not ids:
+            continue
+        found_posts = on_shard(Post.objects, alias).select_related(
+            'author', 'group').in_bulk(ids)
+        missing = [pk for pk in ids if pk not in found_posts]
+        if missing:
+            found_posts.update(on_shard(ArchivedPost.objects, alias)
+                               .select_related('author', 'group')
+                               .in_bulk(missing))
+        posts.update(found_posts)
+    results = [
+        SearchResult(posts[post_id], highlight(snip), score)
+        for post_id, score, snip, _ in rows if post_id in posts
+    ]
+    next_cursor = (rows[-1][1], rows[-1][0]) if has_next else None
+    return results, next_cursor
@@ -0,0 +1,495 @@
+import heapq
+from contextlib import contextmanager
+from itertools import islice
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F, Max
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.http import Http404
+
+from .models import (ArchivedComment, ArchivedPost, AuthorShard, Comment,
+                     Group, Post, PostCard, PostTag, ShardSequence, User)
+from .utils import keyset_filter, keyset_page
+
+SHARDED_MODELS = (Post, Comment, PostTag, ArchivedPost, ArchivedComment)
+# модели, которые шардируются по своему автору, а не по автору поста
+AUTHOR_MODELS = (Post, ArchivedPost)
+# таблицы, которые только в основной базе
+PRIMARY_MODELS = (AuthorShard, ShardSequence, PostCard)
+# из них читаются и с реплик основной базы
+REPLICATED_MODELS = (PostCard,)
+# справочники, копия которых нужна в каждом шарде ради внешних ключей
+REFERENCE_MODELS = (User, Group)
+
+
+def shards():
+    return getattr(settings, 'POST_SHARDS', ['default'])
+
+
+def is_sharded():
+    return len(shards()) > 1
+
+
+def shard_for_author(author_id):
+    """Шард автора по карте; новый автор закрепляется по остатку от id."""
+    aliases = shards()
+    if len(aliases) == 1:
+        return aliases[0]
+    assignment, _ = AuthorShard.objects.using('default').get_or_create(
+        author_id=author_id,
+        defaults={'shard': aliases[author_id % len(aliases)]})
+    return assignment.shard
+
+
+def _shard_of(instance):
+    # у нового объекта _state.db могли выставить по связанному объекту
+    if instance._state.db and not instance._state.adding:
+        return instance._state.db
+    if isinstance(instance, AUTHOR_MODELS):
+        return shard_for_author(instance.author_id)
+    field = type(instance)._meta.get_field('post')
+    if field.is_cached(instance):
+        author_id = instance.post.author_id
+    else:
+        post = locate_post(instance.post_id)[0]
+        if post is None:
+            return None
+        author_id = post.author_id
+    # по карте, а не по найденной копии поста: при переносе их две
+    return shard_for_author(author_id)
+
+
+@contextmanager
+def write_atomic(instance):
+    """Транзакция шарда объекта и внутри неё — транзакция основной базы.
+
+    Outbox лежит в основной базе, и для объекта из другого шарда это
+    две транзакции без общего коммита. Основная фиксируется первой:
+    при сбое коммита шарда останется событие без строки, а обработчики
+    и так перечитывают состояние из базы. Обратный порядок терял бы
+    события по уже записанным строкам.
+    """
+    alias = _shard_of(instance) or 'default'
+    with transaction.atomic(using=alias):
+        with transaction.atomic(using='default'):
+            yield
+
+
+class ShardRouter:
+    """Посты, комментарии и теги живут в шарде автора поста.
+
+    Шард определяется по объекту из подсказки: по самому посту или
+    комментарию, по автору для author.posts. Запросы без подсказки
+    маршрутизатор не угадывает — для них есть .using(), locate_post
+    и сквозные ленты ниже. С одним шардом решает следующий роутер.
+    """
+
+    def _route(self, model, hints):
+        if model not in SHARDED_MODELS or not is_sharded():
+            return None
+        instance = hints.get('instance')
+        if isinstance(instance, User) and model in AUTHOR_MODELS:
+            return shard_for_author(instance.pk)
+        if isinstance(instance, SHARDED_MODELS):
+            return _shard_of(instance)
+        return None
+
+    def db_for_read(self, model, **hints):
+        if model in REPLICATED_MODELS:
+            # выбор реплики — за ReplicaRouter
+            return None
+        if model in PRIMARY_MODELS:
+            return 'default'
+        return self._route(model, hints)
+
+    def db_for_write(self, model, **hints):
+        if model in PRIMARY_MODELS:
+            return 'default'
+        return self._route(model, hints)
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        model = hints.get('model')
+        if model in PRIMARY_MODELS:
+            return db == 'default'
+        return None
+
+
+def next_ids(model, count=1):
+    """Выдаёт id, уникальные во всех шардах."""
+    name = model._meta.db_table
+    with transaction.atomic(using='default'):
+        sequence, created = ShardSequence.objects.get_or_create(name=name)
+        if created:
+            sequence.last_id = max(
+                model._base_manager.using(alias).aggregate(
+                    last=Max('pk'))['last'] or 0 for alias in shards())
+            sequence.save()
+        ShardSequence.objects.filter(name=name).update(
+            last_id=F('last_id') + count)
+        last = ShardSequence.objects.values_list(
+            'last_id', flat=True).get(name=name)
+    return range(last - count + 1, last + 1)
+
+
+@receiver(pre_save, sender=Post)
+@receiver(pre_save, sender=Comment)
+def assign_global_id(sender, instance, raw=False, **kwargs):
+    # автоинкремент у каждого шарда свой, и id бы совпадали
+    if instance.pk is None and not raw and is_sharded():
+        instance.pk = next_ids(sender)[0]
+
+
+def _replica_values(instance):
+    return {field.attname: getattr(instance, field.attname)
+            for field in instance._meta.concrete_fields}
+
+
+def replicate(instance, aliases=None):
+    """Копирует строку справочника во все шарды, кроме основной базы."""
+    values = _replica_values(instance)
+    model = type(instance)
+    for alias in aliases or shards():
+        if alias == 'default':
+            continue
+        manager = model._base_manager.using(alias)
+        if not manager.filter(pk=instance.pk).update(**values):
+            manager.bulk_create([model(**values)])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Group)
+def replicate_reference(sender, instance, raw=False, using='default',
+                        **kwargs):
+    if not raw and using == 'default' and is_sharded():
+        replicate(instance)
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Group)
+def delete_reference(sender, instance, using='default', **kwargs):
+    if using != 'default' or not is_sharded():
+        return
+    for alias in shards():
+        if alias != 'default':
+            sender._base_manager.using(alias).filter(pk=instance.pk).delete()
+
+
+def sync_reference_tables(alias, chunk_size=1000):
+    """Заливает в шард все справочники; нужна при добавлении шарда."""
+    for model in REFERENCE_MODELS:
+        last_pk = 0
+        while True:
+            chunk = list(model._base_manager.using('default').filter(
+                pk__gt=last_pk).order_by('pk')[:chunk_size])
+            if not chunk:
+                break
+            for instance in chunk:
+                replicate(instance, [alias])
+            last_pk = chunk[-1].pk
+
+
+def locate_post(post_id, queryset=None):
+    """Ищет пост по id во всех шардах: (пост, шард) или (None, None)."""
+    queryset = Post.objects.all() if queryset is None else queryset
+    if not is_sharded():
+        post = queryset.filter(pk=post_id).first()
+        return post, (shards()[0] if post is not None else None)
+    for alias in shards():
+        post = queryset.using(alias).filter(pk=post_id).first()
+        if post is not None:
+            return post, alias
+    return None, None
+
+
+def get_post_or_404(post_id, queryset=None):
+    post, _ = locate_post(post_id, queryset)
+    if post is None:
+        raise Http404('Пост не найден')
+    return post
+
+
+def on_shard(queryset, alias):
+    """Выборка из шарда; с одним шардом базу выбирают роутеры."""
+    return queryset.using(alias) if is_sharded() else queryset
+
+
+def each_shard(queryset):
+    """Та же выборка в каждом шарде; у нешардированных моделей она одна."""
+    if queryset.model not in SHARDED_MODELS:
+        return [queryset]
+    return [on_shard(queryset, alias) for alias in shards()]
+
+
+def for_author(author_id, queryset):
+    """Выборка из шарда автора."""
+    if not is_sharded():
+        return queryset
+    return queryset.using(shard_for_author(author_id))
+
+
+def _merge_key(ordering):
+    names = [field.lstrip('-') for field in ordering]
+    if len({field.startswith('-') for field in ordering}) > 1:
+        raise ValueError('Сквозная сортировка — только в одну сторону')
+
+    def key(row):
+        if isinstance(row, dict):
+            return tuple(row[name] for name in names)
+        return tuple(getattr(row, name) for name in names)
+    return key, ordering[0].startswith('-')
+
+
+def scatter_keyset(queryset, ordering, after, limit):
+    """keyset_page по всем шардам: страницы шардов сливаются по ключу.
+
+    С каждого шарда берётся не больше limit + 1 строк, поэтому цена
+    страницы не зависит от глубины.
+    """
+    if not is_sharded():
+        return keyset_page(queryset, ordering, after, limit)
+    key, descending = _merge_key(ordering)
+    pages = [
+        list(keyset_filter(queryset.using(alias).order_by(*ordering),
+                           ordering, after)[:limit + 1])
+        for alias in shards()
+    ]
+    rows = list(islice(heapq.merge(*pages, key=key, reverse=descending),
+                       limit + 1))
+    if len(rows) <= limit:
+        return rows, None
+    return rows[:limit], key(rows[limit - 1])
+
+
+class ShardedFeed:
+    """Сквозная лента для Paginator: срез собирается слиянием шардов.
+
+    Для страницы N с каждого шарда читается N страниц, так что
+    глубокие страницы дороже; для них есть scatter_keyset.
+    """
+    ordered = True
+
+    def __init__(self, queryset, ordering):
+        self.queryset = queryset.order_by(*ordering)
+        self.key, self.descending = _merge_key(ordering)
+
+    def count(self):
+        return sum(self.queryset.using(alias).count() for alias in shards())
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if isinstance(index, int):
+            return self[index:index + 1][0]
+        pages = [list(self.queryset.using(alias)[:index.stop])
+                 for alias in shards()]
+        merged = heapq.merge(*pages, key=self.key, reverse=self.descending)
+        return list(islice(merged, index.start, index.stop))
+
+
+def sharded_feed(queryset, ordering):
+    if not is_sharded():
+        return queryset.order_by(*ordering)
+    return ShardedFeed(queryset, ordering)
+
+
+def _tags_for(model, rows):
+    from .tags import extract_tags
+    if model is Post:
+        return [PostTag(tag=tag, pub_date=row.pub_date, post_id=row.pk)
+                for row in rows for tag in extract_tags(row.text)]
+    return [PostTag(tag=tag, pub_date=row.created, post_id=row.post_id,
+                    comment_id=row.pk)
+            for row in rows for tag in extract_tags(row.text)]
+
+
+def _is_tagged(model):
+    # теги строятся только для горячих таблиц, у архива их нет
+    return model in (Post, Comment)
+
+
+def _stale_tags(model, target, ids):
+    tags = PostTag.objects.using(target)
+    if model is Post:
+        return tags.filter(post_id__in=ids, comment=None)
+    return tags.filter(comment_id__in=ids)
+
+
+def _upsert(model, queryset, target, chunk_size):
+    """Переносит строки выборки в target порциями по pk.
+
+    Вставка идёт через bulk_create, а затем все поля перезаписываются
+    через bulk_update: так повторный проход обновляет уже скопированное,
+    а auto_now-даты остаются исходными. Теги порции строятся заново.
+    """
+    fields = [field.name for field in model._meta.concrete_fields
+              if not field.primary_key]
+    copied = 0
+    last_pk = 0
+    while True:
+        rows = list(queryset.filter(pk__gt=last_pk).order_by('pk')
+                    [:chunk_size])
+        if not rows:
+            return copied
+        ids = [row.pk for row in rows]
+        values = [{name: getattr(row, name) for name in fields}
+                  for row in rows]
+        with transaction.atomic(using=target):
+            target_rows = model._base_manager.using(target)
+            existing = set(target_rows.filter(pk__in=ids).values_list(
+                'pk', flat=True))
+            target_rows.bulk_create(
+                [row for row in rows if row.pk not in existing])
+            for row, row_values in zip(rows, values):
+                for name, value in row_values.items():
+                    setattr(row, name, value)
+            target_rows.bulk_update(rows, fields)
+            if _is_tagged(model):
+                _stale_tags(model, target, ids).delete()
+                PostTag.objects.using(target).bulk_create(
+                    _tags_for(model, rows))
+        copied += len(rows)
+        last_pk = ids[-1]
+
+
+def _delete_rows(model, queryset, chunk_size):
+    """Удаляет выборку сырыми DELETE порциями, без сигналов и отметок."""
+    from .bulk import iter_pk_chunks, raw_delete
+    db = queryset.db
+    deleted = 0
+    for ids in iter_pk_chunks(queryset, chunk_size):
+        with transaction.atomic(using=db):
+            if _is_tagged(model):
+                raw_delete(_stale_tags(model, db, ids))
+            raw_delete(model._base_manager.using(db).filter(pk__in=ids))
+        deleted += len(ids)
+    return deleted
+
+
+def _drop_missing(model, target_queryset, source_queryset, chunk_size):
+    """Удаляет из target строки, которых уже нет в источнике."""
+    from .bulk import iter_pk_chunks
+    missing = []
+    for ids in iter_pk_chunks(target_queryset, chunk_size):
+        present = set(source_queryset.filter(pk__in=ids).values_list(
+            'pk', flat=True))
+        missing.extend(pk for pk in ids if pk not in present)
+    if missing:
+        _delete_rows(model, target_queryset.filter(pk__in=missing),
+                     chunk_size)
+
+
+def _fence_statements(author_id):
+    """Триггеры, отклоняющие запись строк автора: (операция, имя, SQL)."""
+    author_id = int(author_id)
+    post_table = Post._meta.db_table
+    archived_table = ArchivedPost._meta.db_table
+    conditions = (
+        (post_table, f'{{row}}.author_id = {author_id}'),
+        (archived_table, f'{{row}}.author_id = {author_id}'),
+        (Comment._meta.db_table,
+         f'{{row}}.post_id IN (SELECT id FROM {post_table} '
+         f'WHERE author_id = {author_id})'),
+        (ArchivedComment._meta.db_table,
+         f'{{row}}.post_id IN (SELECT id FROM {archived_table} '
+         f'WHERE author_id = {author_id})'),
+    )
+    statements = []
+    for table, condition in conditions:
+        for operation, rows in (('insert', ('NEW',)),
+                                ('update', ('OLD', 'NEW')),
+                                ('delete', ('OLD',))):
+            name = f'{table}_fence_{author_id}_{operation}'
+            when = ' OR '.join(condition.format(row=row) for row in rows)
+            statements.append((operation, name, (
+                f"CREATE TRIGGER IF NOT EXISTS {name} "
+                f"BEFORE {operation.upper()} ON {table} WHEN {when} "
+                f"BEGIN SELECT RAISE(ABORT, 'author {author_id} is moving "
+                f"to another shard'); END")))
+    return statements
+
+
+def fence_author(alias, author_id):
+    """Запрещает в шарде любую запись строк автора.
+
+    Запрет ставят триггеры SQLite, поэтому он действует и на транзакции,
+    начатые до него, и на bulk-запросы: запись получит IntegrityError.
+    """
+    connection = connections[alias]
+    if connection.vendor != 'sqlite':
+        raise NotImplementedError('Переносить авторов умеет только SQLite')
+    with connection.cursor() as cursor:
+        for _, _, create in _fence_statements(author_id):
+            cursor.execute(create)
+
+
+def unfence_author(alias, author_id,
+                   operations=('insert', 'update', 'delete')):
+    if connections[alias].vendor != 'sqlite':
+        return
+    with connections[alias].cursor() as cursor:
+        for operation, name, _ in _fence_statements(author_id):
+            if operation in operations:
+                cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+
+
+def _author_querysets(author_id, alias):
+    """Строки автора в шарде: сначала родители, затем ссылки на них."""
+    return [
+        (Post, Post.all_objects.using(alias).filter(author_id=author_id)),
+        (ArchivedPost, ArchivedPost.all_objects.using(alias).filter(
+            author_id=author_id)),
+        (Comment, Comment.all_objects.using(alias).filter(
+            post__author_id=author_id)),
+        (ArchivedComment, ArchivedComment.all_objects.using(alias).filter(
+            post__author_id=author_id)),
+    ]
+
+
+def move_author(author_id, target, chunk_size=500, report=None):
+    """Переносит посты автора, комментарии к ним и его архив в другой шард.
+
+    На время копирования автор заперт: в AuthorShard.moving_to пишется
+    шард назначения, а в старом шарде ставится запрет записи его строк
+    (fence_author). Всё, что закоммичено до запрета, копия уже видит,
+    а позже запись отклоняется, так что изменения не теряются. Затем
+    карта переключается на target, и старый шард очищается; запрет
+    вставки в нём остаётся для писателей, прочитавших карту до
+    переключения. Прерванный перенос продолжается вызовом с тем же
+    target, в другой шард — отказ.
+    """
+    report = report or (lambda message: None)
+    source = shard_for_author(author_id)
+    if source == target:
+        return 0
+    moving_to = AuthorShard.objects.values_list(
+        'moving_to', flat=True).get(author_id=author_id)
+    if moving_to not in ('', target):
+        raise ValueError(f'Автор {author_id} уже переносится в {moving_to}')
+    AuthorShard.objects.filter(author_id=author_id).update(moving_to=target)
+    fence_author(source, author_id)
+    # запрет вставки, оставшийся с прошлого переезда из target
+    unfence_author(target, author_id)
+    report(f'Запись автора {author_id} в {source} остановлена')
+
+    pairs = list(zip(_author_querysets(author_id, source),
+                     _author_querysets(author_id, target)))
+    moved = 0
+    for (model, rows), _ in pairs:
+        moved += _upsert(model, rows, target, chunk_size)
+    # в target могли остаться строки прерванного переноса
+    for (model, rows), (_, target_rows) in reversed(pairs):
+        _drop_missing(model, target_rows, rows, chunk_size)
+    report(f'Скопировано строк: {moved}')
+    with transaction.atomic(using='default'):
+        AuthorShard.objects.filter(author_id=author_id).update(
+            shard=target, moving_to='')
+    report(f'Автор {author_id} переключён на {target}')
+    with transaction.atomic(using=source):
+        unfence_author(source, author_id, ('update', 'delete'))
+        for model, rows in reversed(_author_querysets(author_id, source)):
+            _delete_rows(model, rows, chunk_size)
+    report(f'Шард {source} очищен')
+    return moved
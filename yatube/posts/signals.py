@@ -0,0 +1,49 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import projection
+from .models import Comment, Follow, Group, Post, Tombstone, User
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Comment)
+@receiver(post_delete, sender=Follow)
+def record_tombstone(sender, instance, using='default', **kwargs):
+    # отметка — в базе удалённой строки, рядом с её журналом изменений
+    Tombstone.objects.using(using).create(model=sender._meta.model_name,
+                                          object_id=instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def refresh_post_card(sender, instance, raw=False, **kwargs):
+    if not raw:
+        projection.refresh_cards([instance.pk])
+
+
+@receiver(post_delete, sender=Post)
+def drop_post_card(sender, instance, **kwargs):
+    projection.drop_cards([instance.pk])
+
+
+@receiver(post_save, sender=User)
+def refresh_author_cards(sender, instance, created=False, raw=False,
+                         using='default', update_fields=None, **kwargs):
+    # у нового автора карточек нет; копии в шардах и вход (last_login)
+    # карточек не меняют
+    if (created or raw or using != 'default'
+            or update_fields == {'last_login'}):
+        return
+    projection.refresh_author(instance)
+
+
+@receiver(post_save, sender=Group)
+def refresh_group_cards(sender, instance, raw=False, using='default',
+                        **kwargs):
+    if not raw and using == 'default':
+        projection.refresh_group(instance)
+
+
+@receiver(post_delete, sender=Group)
+def forget_group_cards(sender, instance, using='default', **kwargs):
+    if using == 'default':
+        projection.forget_group(instance.pk)
@@ -0,0 +1,70 @@
+import re
+
+from .cards import excerpt_fallback
+from .models import PostTag
+
+TAG_RE = re.compile(r'(?<![\w#@])([#@])(\w{1,149})', re.UNICODE)
+
+
+def extract_tags(text):
+    """Находит в тексте #хештеги и @упоминания.
+
+    Хештеги приводятся к нижнему регистру, упоминания сохраняют регистр,
+    как имена пользователей.
+    """
+    tags = set()
+    for prefix, name in TAG_RE.findall(text or ''):
+        tags.add(prefix + (name.lower() if prefix == '#' else name))
+    return tags
+
+
+def sync_post_tags(post):
+    """Приводит индекс тегов текста поста к актуальному состоянию.
+
+    Индекс не перестраивается целиком: удаляются только исчезнувшие
+    теги и добавляются новые.
+    """
+    tags = PostTag.objects.using(post._state.db)
+    current = set(
+        tags.filter(post=post, comment=None).values_list('tag', flat=True)
+    )
+    actual = extract_tags(post.text)
+    removed = current - actual
+    if removed:
+        tags.filter(post=post, comment=None, tag__in=removed).delete()
+    tags.bulk_create(
+        PostTag(tag=tag, pub_date=post.pub_date, post=post)
+        for tag in actual - current
+    )
+
+
+def index_comment_tags(comment):
+    PostTag.objects.using(comment._state.db).bulk_create(
+        PostTag(tag=tag, pub_date=comment.created,
+                post_id=comment.post_id, comment=comment)
+        for tag in extract_tags(comment.text)
+    )
+
+
+def tag_feed(tag):
+    return (
+        PostTag.objects.filter(tag='#' + tag.lower(), comment=None)
+        .filter(post__is_deleted=False, post__author__is_active=True)
+        .select_related('post__author', 'post__group')
+        .defer('post__text')
+        .annotate(**excerpt_fallback('post__'))
+        .order_by('-pub_date')
+    )
+
+
+def mentions_feed(username):
+    return (
+        PostTag.objects.filter(tag='@' + username)
+        .filter(post__is_deleted=False, post__author__is_active=True)
+        .exclude(comment__is_deleted=True)
+        .exclude(comment__author__is_active=False)
+        .select_related('post__author', 'post__group', 'comment__author')
+        .defer('post__text')
+        .annotate(**excerpt_fallback('post__'))
+        .order_by('-pub_date')
+    )
@@ -0,0 +1,79 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+from core.jobs import enqueue, task
+
+from . import bulk
+from .archive import archive_cutoff, archive_posts
+from .digest import send_digests
+from .models import Comment, Follow, Post
+from .projection import (CARD_THUMBNAILS_TASK, REBUILD_CARDS_TASK,
+                         fill_thumbnails, rebuild_cards)
+from .purge import (PURGE_DELETED_TASK, PURGE_USER_TASK, purge_deleted,
+                    purge_user)
+from .sharding import each_shard, shards
+
+BULK_ACTIONS = {
+    'move_posts_to_group': (Post.all_objects, bulk.move_posts_to_group),
+    'delete_posts': (Post.all_objects, bulk.delete_posts),
+    'delete_comments': (Comment.all_objects, bulk.delete_comments),
+    'delete_follows': (Follow.objects, bulk.delete_follows),
+}
+
+
+@task('posts.bulk', max_attempts=3, progress=True)
+def run_bulk_action(action, ids, progress, **kwargs):
+    """Массовое действие над строками с id из ids.
+
+    В задаче лежат только id, а выборка строится заново порциями при
+    каждой попытке: повтор после сбоя не найдёт уже удалённых строк,
+    а перенос в группу повторить безопасно.
+    """
+    manager, apply = BULK_ACTIONS[action]
+    total = len(ids)
+    progress(0, total)
+    done = 0
+    for start in range(0, total, bulk.BULK_CHUNK_SIZE):
+        chunk = ids[start:start + bulk.BULK_CHUNK_SIZE]
+        # id глобальные, так что порция ищется во всех шардах сразу
+        for queryset in each_shard(manager.filter(pk__in=chunk)):
+            done += apply(queryset, **kwargs)
+        progress(start + len(chunk), total)
+    return done
+
+
+@task('posts.send_digests')
+def send_daily_digests(hours=24, workers=0):
+    return send_digests(timezone.now() - timedelta(hours=hours), workers)
+
+
+@task('posts.archive_old_posts', progress=True)
+def archive_old_posts(progress, repeat_hours=None):
+    for alias in shards():
+        archive_posts(archive_cutoff(using=alias), using=alias,
+                      progress=progress)
+    if repeat_hours:
+        enqueue('posts.archive_old_posts', repeat_hours=repeat_hours,
+                key='posts.archive_old_posts',
+                run_at=timezone.now() + timedelta(hours=repeat_hours))
+
+
+@task(PURGE_USER_TASK, progress=True)
+def purge_user_data(user_id, progress):
+    return purge_user(user_id, progress=progress)
+
+
+@task(PURGE_DELETED_TASK, progress=True)
+def purge_deleted_rows(progress):
+    return purge_deleted(progress=progress)
+
+
+@task(REBUILD_CARDS_TASK, progress=True)
+def rebuild_post_cards(progress):
+    return rebuild_cards(progress=progress)
+
+
+@task(CARD_THUMBNAILS_TASK)
+def fill_card_thumbnails(post_ids):
+    return fill_thumbnails(post_ids)
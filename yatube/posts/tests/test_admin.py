@@ -0,0 +1,127 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.jobs import work_off
+from core.models import Job
+from core.paginator import EstimatedCountPaginator
+
+from ..models import Comment, Follow, Group, Post, PostCard, PostTag
+
+User = get_user_model()
+
+
+class PostAdminTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        for i in range(30):
+            post = Post.objects.create(author=cls.admin, group=cls.group,
+                                       text=f'Пост для админки {i}')
+            Comment.objects.create(post=post, author=cls.admin,
+                                   text=f'Комментарий {i}')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        """Список постов и комментариев не делает запросов на строку."""
+        for name in ('admin:posts_post_changelist',
+                     'admin:posts_comment_changelist',
+                     'admin:posts_follow_changelist'):
+            with self.subTest(name=name):
+                response = self.client.get(reverse(name))
+                self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(9):
+            self.client.get(reverse('admin:posts_post_changelist'))
+
+    def test_changelist_search_uses_index(self):
+        """Поиск в админке находит посты через FTS."""
+        response = self.client.get(reverse('admin:posts_post_changelist'),
+                                   {'q': 'админки'})
+        self.assertEqual(response.context['cl'].result_count, 30)
+
+    def test_changelist_search_narrows_results(self):
+        """Поиск в админке оставляет только совпавшие посты."""
+        post = Post.objects.create(author=self.admin, text='редкоеслово')
+        response = self.client.get(reverse('admin:posts_post_changelist'),
+                                   {'q': 'редкоеслово'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['cl'].result_list), [post])
+        response = self.client.get(reverse('admin:posts_post_changelist'),
+                                   {'q': 'несуществующее'})
+        self.assertEqual(response.context['cl'].result_count, 0)
+
+    def test_estimated_paginator(self):
+        """Для большой таблицы используется оценка количества."""
+        paginator = EstimatedCountPaginator(Post.objects.order_by('pk'), 10)
+        paginator.exact_count_threshold = 10
+        self.assertEqual(paginator.count, Post.objects.last().pk)
+        filtered = EstimatedCountPaginator(
+            Post.objects.filter(pk__lte=5).order_by('pk'), 10)
+        filtered.exact_count_threshold = 1
+        self.assertEqual(filtered.count, 5)
+
+    def test_bulk_move_to_group(self):
+        """Посты переносятся в другую группу фоновым действием."""
+        other = Group.objects.create(title='Другая', slug='other',
+                                     description='-')
+        ids = list(Post.objects.values_list('pk', flat=True)[:12])
+        response = self.client.post(
+            reverse('admin:posts_post_changelist'),
+            {'action': 'move_to_group', 'group_slug': other.slug,
+             '_selected_action': ids},
+            follow=True)
+        message = list(response.context['messages'])[0]
+        self.assertIn('в очередь', str(message))
+        self.assertEqual(Post.objects.filter(group=other).count(), 0)
+        # в очереди лежат id в JSON, без сериализованного запроса
+        self.assertEqual(Job.objects.get().data,
+                         {'action': 'move_posts_to_group',
+                          'ids': sorted(ids), 'group_id': other.pk})
+        self.assertEqual(work_off(), 1)
+        self.assertEqual(Post.objects.filter(group=other).count(), 12)
+        self.assertEqual(PostCard.objects.filter(
+            group_id=other.pk, group_slug=other.slug,
+            group_title=other.title).count(), 12)
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual((job.progress_done, job.progress_total), (12, 12))
+
+    def test_bulk_delete_posts_and_comments(self):
+        """Фоновое удаление убирает посты вместе со связанными строками."""
+        post = Post.objects.first()
+        PostTag.objects.create(tag='#x', pub_date=post.pub_date, post=post)
+        self.client.post(
+            reverse('admin:posts_post_changelist'),
+            {'action': 'delete_in_background', '_selected_action': [post.pk]})
+        work_off()
+        self.assertFalse(Post.objects.filter(pk=post.pk).exists())
+        self.assertFalse(Comment.objects.filter(post_id=post.pk).exists())
+        self.assertFalse(PostTag.objects.filter(post_id=post.pk).exists())
+        spammer = User.objects.create_user(username='spammer')
+        comment = Comment.objects.create(post=Post.objects.last(),
+                                         author=spammer, text='спам')
+        Comment.objects.create(post=Post.objects.first(), author=spammer,
+                               text='ещё спам')
+        follow = Follow.objects.create(user=spammer, author=self.admin)
+        self.client.post(
+            reverse('admin:posts_comment_changelist'),
+            {'action': 'delete_by_same_authors',
+             '_selected_action': [comment.pk]})
+        work_off()
+        self.assertFalse(Comment.objects.filter(author=spammer).exists())
+        self.client.post(
+            reverse('admin:posts_follow_changelist'),
+            {'action': 'delete_in_background',
+             '_selected_action': [follow.pk]})
+        work_off()
+        self.assertFalse(Follow.objects.filter(pk=follow.pk).exists())
@@ -0,0 +1,80 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..archive import archive_cutoff, archive_posts
+from ..models import ArchivedComment, ArchivedPost, Comment, Post, PostTag
+
+User = get_user_model()
+
+
+class ArchiveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        now = timezone.now()
+        cls.posts = []
+        for i in range(12):
+            post = Post.objects.create(author=cls.author,
+                                       text=f'Пост номер {i} #архив')
+            PostTag.objects.create(tag='#архив', pub_date=post.pub_date,
+                                   post=post)
+            Comment.objects.create(post=post, author=cls.author,
+                                   text=f'Комментарий {i}')
+            # посты 0..5 — старые, 6..11 — свежие
+            age = timedelta(days=400 - i) if i < 6 else timedelta(hours=i)
+            Post.objects.filter(pk=post.pk).update(pub_date=now - age)
+            cls.posts.append(post)
+        cls.old_ids = [post.pk for post in cls.posts[:6]]
+
+    def setUp(self):
+        self.client = Client()
+
+    def test_cutoff_bounds_hot_table(self):
+        """Граница — по возрасту либо по размеру горячей таблицы."""
+        cutoff = archive_cutoff(days=365, max_hot=100)
+        self.assertEqual(Post.objects.filter(pub_date__lt=cutoff).count(), 6)
+        cutoff = archive_cutoff(days=365, max_hot=4)
+        self.assertEqual(Post.objects.filter(pub_date__gte=cutoff).count(), 4)
+
+    def test_archive_moves_posts_and_comments(self):
+        """Старые посты с комментариями уходят в архив с прежними id."""
+        moved = archive_posts(archive_cutoff(days=365, max_hot=100),
+                              batch_size=4)
+        self.assertEqual(moved, 6)
+        self.assertFalse(Post.objects.filter(pk__in=self.old_ids).exists())
+        self.assertEqual(
+            sorted(ArchivedPost.objects.values_list('pk', flat=True)),
+            self.old_ids)
+        self.assertEqual(ArchivedComment.objects.filter(
+            post_id__in=self.old_ids).count(), 6)
+        self.assertFalse(PostTag.objects.filter(
+            post_id__in=self.old_ids).exists())
+        archived = ArchivedPost.objects.get(pk=self.old_ids[0])
+        self.assertEqual(archived.text, self.posts[0].text)
+
+    def test_reads_fall_through_to_archive(self):
+        """Пост, профиль и поиск находят архивные посты."""
+        call_command('archive_posts', '--days', '365', stdout=StringIO())
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.old_ids[0]]))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['is_archived'])
+        self.assertEqual(len(response.context['comments']), 1)
+        response = self.client.get(
+            reverse('posts:profile', args=['author']), {'page': 2})
+        self.assertEqual(response.context['page_obj'].paginator.count, 12)
+        texts = [post.text for post in response.context['page_obj']]
+        self.assertEqual(texts, ['Пост номер 1 #архив', 'Пост номер 0 #архив'])
+        response = self.client.get(reverse('posts:search'),
+                                   {'q': 'Пост номер 0'})
+        found = [result.post.pk for result in response.context['results']]
+        self.assertIn(self.old_ids[0], found)
+        response = self.client.get(reverse('posts:search'), {'q': 'номер'})
+        self.assertEqual(len(response.context['results']), 10)
+        self.assertIsNotNone(response.context['next_cursor'])
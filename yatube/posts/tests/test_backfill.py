@@ -0,0 +1,76 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from core import backfill
+from core.jobs import work_off
+from core.models import BackfillCheckpoint, Job
+
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+@backfill.backfill('tests.post_group', Post,
+                   pending=lambda queryset: queryset.filter(group=None),
+                   chunk_size=4)
+def fill_group(queryset):
+    queryset.update(group=Group.objects.get(slug='default'))
+
+
+class BackfillTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Group.objects.create(title='Группа', slug='default')
+        author = User.objects.create_user(username='author')
+        Post.objects.bulk_create(
+            Post(author=author, text=f'Пост {i}') for i in range(10))
+
+    def test_resumes_from_checkpoint(self):
+        """Прерванное заполнение продолжается с сохранённой точки."""
+        done = backfill.run_backfill('tests.post_group', max_chunks=1,
+                                     pause=0)
+        self.assertEqual(done, 4)
+        checkpoint = BackfillCheckpoint.objects.get(name='tests.post_group')
+        self.assertEqual(checkpoint.done, 4)
+        self.assertIsNone(checkpoint.finished)
+        self.assertEqual(backfill.verify('tests.post_group'), 6)
+        reports = []
+        done = backfill.run_backfill(
+            'tests.post_group', pause=0,
+            progress=lambda *args: reports.append(args))
+        self.assertEqual(done, 6)
+        self.assertEqual(reports[0], (4, 10))
+        self.assertEqual(reports[-1], (10, 10))
+        self.assertEqual(backfill.verify('tests.post_group'), 0)
+        checkpoint.refresh_from_db()
+        self.assertIsNotNone(checkpoint.finished)
+
+    def test_chunk_size_follows_latency(self):
+        """Медленные порции уменьшаются, быстрые растут."""
+        self.assertEqual(backfill._next_chunk_size(100, 1.0, 0.2), 50)
+        self.assertEqual(backfill._next_chunk_size(100, 0.01, 0.2), 200)
+        self.assertEqual(backfill._next_chunk_size(100, 0.25, 0.2), 80)
+
+    def test_dry_run_changes_nothing(self):
+        """Пробный запуск оценивает объём и откатывает порцию."""
+        estimate = backfill.dry_run('tests.post_group')
+        self.assertEqual(estimate['rows'], 10)
+        self.assertEqual(estimate['chunk_size'], 4)
+        self.assertEqual(backfill.verify('tests.post_group'), 10)
+        self.assertFalse(BackfillCheckpoint.objects.exists())
+
+    def test_command_runs_in_background(self):
+        """Команда ставит задачу, которая доводит заполнение до конца."""
+        out = StringIO()
+        call_command('backfill', 'tests.post_group', '--background',
+                     stdout=out)
+        call_command('backfill', 'tests.post_group', '--background',
+                     stdout=out)
+        self.assertEqual(Job.objects.count(), 1)
+        work_off()
+        self.assertEqual(Job.objects.get().status, Job.DONE)
+        call_command('backfill', 'tests.post_group', '--verify', stdout=out)
+        self.assertIn('не заполнено 0', out.getvalue())
@@ -0,0 +1,70 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.cache_versions import get_version
+
+from ..bulk import FEED_CACHE
+from ..cards import CARD_TEXT_LENGTH, Card
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class CardFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', first_name='Имя', last_name='Фамилия')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.long_post = Post.objects.create(
+            author=cls.author, group=cls.group,
+            text='д' * (CARD_TEXT_LENGTH + 50))
+        for i in range(5):
+            Post.objects.create(author=cls.author, group=cls.group,
+                                text=f'Пост {i}')
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+        # поколение кеша лент процесс перечитывает раз в секунду
+        get_version(FEED_CACHE)
+
+    def test_index_builds_cards(self):
+        """Главная отдаёт карточки с общими автором и группой."""
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('posts:index'))
+        cards = list(response.context['page_obj'])
+        self.assertTrue(all(isinstance(card, Card) for card in cards))
+        self.assertIs(cards[0].author, cards[1].author)
+        self.assertIs(cards[0].group, cards[1].group)
+        self.assertEqual(cards[0].author.get_full_name(), 'Имя Фамилия')
+        long_card = next(card for card in cards
+                         if card.pk == self.long_post.pk)
+        self.assertTrue(long_card.truncated)
+        self.assertEqual(len(long_card.text), CARD_TEXT_LENGTH)
+        self.assertContains(response, 'д' * CARD_TEXT_LENGTH + '…')
+
+    def test_group_feed_reuses_group(self):
+        """Лента группы не запрашивает группу для каждой строки."""
+        response = self.client.get(reverse('posts:group_list',
+                                           args=[self.group.slug]))
+        card = response.context['page_obj'][0]
+        self.assertEqual(card.group, response.context['group'])
+        self.assertEqual(card.group.description, 'Описание')
+
+    def test_benchmark_rolls_back_seed(self):
+        """Замер печатает обе реализации и не оставляет данных."""
+        out = StringIO()
+        call_command('feed_benchmark', '--seed', '20', '--sizes', '10',
+                     '--repeat', '1', stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertIn('orm', lines[1])
+        self.assertIn('cards', lines[2])
+        self.assertEqual(Post.objects.count(), 6)
@@ -0,0 +1,86 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..bulk import delete_comments
+from ..changes import fetch_changes
+from ..models import Comment, Follow, Post
+
+User = get_user_model()
+
+
+class ChangeFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='feed_user')
+        cls.staff = User.objects.create_user(username='staff',
+                                             is_staff=True)
+
+    def test_inserts_updates_and_tombstones(self):
+        """Лента отдаёт вставки, затем изменения и удаления."""
+        post = Post.objects.create(author=self.user, text='Первый')
+        comment = Comment.objects.create(post=post, author=self.user,
+                                         text='Комментарий')
+        Follow.objects.create(user=self.staff, author=self.user)
+        changes, cursor, has_more = fetch_changes()
+        self.assertEqual([(c['model'], c['op']) for c in changes],
+                         [('post', 'insert'), ('comment', 'insert'),
+                          ('follow', 'insert')])
+        self.assertFalse(has_more)
+        post.text = 'Изменён'
+        post.save()
+        comment.delete()
+        changes, cursor, _ = fetch_changes(cursor)
+        self.assertEqual({(c['model'], c['op']) for c in changes},
+                         {('post', 'update'), ('comment', 'delete')})
+        self.assertEqual(fetch_changes(cursor)[0], [])
+
+    def test_late_commit_not_skipped(self):
+        """Изменение видно сразу и не теряется, даже если его отметка
+        времени старше уже выданных."""
+        post = Post.objects.create(author=self.user, text='Свежий')
+        changes, cursor, _ = fetch_changes()
+        self.assertEqual([c['id'] for c in changes], [post.pk])
+        Post.objects.filter(pk=post.pk).update(
+            text='Поздний', updated_at=timezone.now() - timedelta(hours=1))
+        changes, _, _ = fetch_changes(cursor)
+        self.assertEqual([(c['op'], c['data']['text']) for c in changes],
+                         [('update', 'Поздний')])
+
+    def test_batches_and_bulk_deletes(self):
+        """Пачки не теряют записей, сырое удаление оставляет отметки."""
+        post = Post.objects.create(author=self.user, text='Пост')
+        comments = [Comment(post=post, author=self.user, text=str(i))
+                    for i in range(5)]
+        Comment.objects.bulk_create(comments)
+        delete_comments(Comment.objects.all())
+        seen = []
+        cursor = None
+        while True:
+            changes, cursor, has_more = fetch_changes(cursor, limit=2)
+            seen += changes
+            if not has_more:
+                break
+        # удалённые комментарии в ленте остаются только отметками
+        self.assertEqual(len(seen), 1 + 5)
+        self.assertEqual(sum(c['op'] == 'delete' for c in seen), 5)
+
+    def test_api_and_command(self):
+        """Ленту отдают API для персонала и команда changes."""
+        Post.objects.create(author=self.user, text='Пост')
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(reverse('api:change_list'))
+        self.assertEqual(response.status_code, 403)
+        client.force_login(self.staff)
+        data = client.get(reverse('api:change_list')).json()
+        self.assertEqual(len(data['changes']), 1)
+        out = StringIO()
+        call_command('changes', cursor=data['cursor'], stdout=out)
+        self.assertEqual(out.getvalue().count('\n'), 1)
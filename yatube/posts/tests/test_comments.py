@@ -0,0 +1,72 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..comments import COMMENTS_PAGE_SIZE
+from ..models import Comment, Post
+from ..utils import encode_cursor
+
+User = get_user_model()
+
+
+class CommentThreadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        cls.comments = [
+            Comment.objects.create(
+                post=cls.post, text=f'Комментарий {i}',
+                author=User.objects.create_user(username=f'reader{i}'))
+            for i in range(COMMENTS_PAGE_SIZE + 5)
+        ]
+
+    def setUp(self):
+        self.client = Client()
+        self.url = reverse('posts:post_detail', args=[self.post.pk])
+
+    def test_first_page(self):
+        """Страница поста отдаёт первые комментарии и курсор дальше."""
+        response = self.client.get(self.url)
+        comments = response.context['comments']
+        self.assertEqual(comments, self.comments[:COMMENTS_PAGE_SIZE])
+        self.assertIsNotNone(response.context['next_cursor'])
+        self.assertContains(response, 'Показать ещё')
+
+    def test_load_more_fragment(self):
+        cursor = self.client.get(self.url).context['next_cursor']
+        response = self.client.get(
+            reverse('posts:post_comments', args=[self.post.pk]),
+            {'after': cursor})
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        self.assertEqual(response.context['comments'],
+                         self.comments[COMMENTS_PAGE_SIZE:])
+        self.assertIsNone(response.context['next_cursor'])
+        self.assertNotContains(response, 'Показать ещё')
+        response = self.client.get(self.url, {'after': cursor})
+        self.assertEqual(response.context['comments'],
+                         self.comments[COMMENTS_PAGE_SIZE:])
+
+    def test_broken_cursor(self):
+        response = self.client.get(
+            reverse('posts:post_comments', args=[self.post.pk]),
+            {'after': 'мусор'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(
+            reverse('posts:post_comments', args=[self.post.pk]),
+            {'after': encode_cursor('2020-13-45T00:00:00', 1)})
+        self.assertEqual(response.status_code, 400)
+
+    def test_queries_do_not_grow(self):
+        """Первая отрисовка поста — постоянное число запросов."""
+        queries = self.count_queries()
+        Comment.objects.filter(pk__in=[c.pk for c in self.comments[:10]]
+                               ).delete()
+        self.assertEqual(self.count_queries(), queries)
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(self.url)
+        return len(context.captured_queries)
@@ -0,0 +1,86 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.models import OutboxEmail
+
+from .. import digest
+from ..digest import collect_digests, send_digests
+from ..models import Follow, Post
+
+User = get_user_model()
+
+
+class DigestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.authors = [User.objects.create_user(username=f'author{i}')
+                       for i in range(3)]
+        for i, author in enumerate(cls.authors):
+            for j in range(i + 1):
+                Post.objects.create(author=author, text=f'Пост {i}-{j}')
+        old = Post.objects.create(author=cls.authors[0], text='Старый пост')
+        Post.objects.filter(pk=old.pk).update(
+            pub_date=timezone.now() - timedelta(days=3))
+        cls.readers = [
+            User.objects.create_user(username=f'reader{i}',
+                                     email=f'reader{i}@example.com')
+            for i in range(4)
+        ]
+        # reader0 — на всех, reader1 — на author2, reader2 — ни на кого,
+        # у reader3 нет почты
+        for author in cls.authors:
+            Follow.objects.create(user=cls.readers[0], author=author)
+        Follow.objects.create(user=cls.readers[1], author=cls.authors[2])
+        cls.readers[3].email = ''
+        cls.readers[3].save()
+        Follow.objects.create(user=cls.readers[3], author=cls.authors[0])
+
+    def since(self):
+        return timezone.now() - timedelta(days=1)
+
+    def test_digests_share_author_blocks(self):
+        """Письма идут по пользователям, блок автора собран один раз."""
+        digests = list(collect_digests(self.since(), read_size=1))
+        self.assertEqual([d['username'] for d in digests],
+                         ['reader0', 'reader1'])
+        self.assertIs(digests[0]['authors'][2], digests[1]['authors'][0])
+
+    def test_digest_contents(self):
+        """Письмо получают подписчики с почтой, в нём только новые посты."""
+        sent = send_digests(self.since(), read_size=1)
+        self.assertEqual(sent, 2)
+        letters = {letter.to[0]: letter for letter in mail.outbox}
+        self.assertEqual(set(letters),
+                         {'reader0@example.com', 'reader1@example.com'})
+        body = letters['reader0@example.com'].body
+        self.assertEqual(letters['reader0@example.com'].subject,
+                         'Новые посты: 6')
+        for text in ('Пост 0-0', 'Пост 1-1', 'Пост 2-2'):
+            self.assertIn(text, body)
+        self.assertNotIn('Старый пост', body)
+        self.assertNotIn('author0', letters['reader1@example.com'].body)
+
+    def test_posts_streamed_once(self):
+        """Посты читаются один раз на всю рассылку."""
+        with mock.patch.object(digest, 'iter_author_posts',
+                               wraps=digest.iter_author_posts) as posts:
+            sent = send_digests(self.since(), read_size=1)
+        self.assertEqual(sent, 2)
+        posts.assert_called_once()
+
+    def test_process_pool_and_outbox(self):
+        """Рендеринг в пуле процессов, письма уходят в outbox."""
+        with override_settings(EMAIL_BACKEND='core.mail.OutboxEmailBackend'):
+            out = StringIO()
+            call_command('send_digest', '--workers', '2', stdout=out)
+        self.assertIn('2', out.getvalue())
+        self.assertEqual(
+            set(OutboxEmail.objects.values_list('recipient', flat=True)),
+            {'reader0@example.com', 'reader1@example.com'})
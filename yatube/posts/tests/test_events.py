@@ -0,0 +1,135 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import events
+from core.models import CacheVersion, DeadLetter, HandlerOffset, OutboxEvent
+
+from ..bulk import FEED_CACHE
+from ..models import Post, PostCard
+
+User = get_user_model()
+
+
+class OutboxTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='outbox_user')
+        cls.author = User.objects.create_user(
+            username='outbox_author', email='author@example.com')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_writes_emit_events(self):
+        """Создание, правка, комментарий и подписка пишут события."""
+        self.authorized_client.post(reverse('posts:post_create'),
+                                    {'text': 'Новый пост'})
+        post = Post.objects.get()
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            {'text': 'Исправленный пост'})
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+            {'text': 'Комментарий'})
+        for _ in range(2):
+            self.authorized_client.get(reverse(
+                'posts:profile_follow',
+                kwargs={'username': self.author.username}))
+        self.assertEqual(
+            list(OutboxEvent.objects.values_list('topic', flat=True)),
+            ['post.created', 'post.updated', 'comment.created',
+             'follow.created'])
+        self.assertEqual(OutboxEvent.objects.first().data['post_id'],
+                         post.pk)
+
+    def test_emit_is_idempotent(self):
+        """Повтор события с тем же ключом не дублирует его."""
+        events.emit('test.topic', {'a': 1}, key='same')
+        events.emit('test.topic', {'a': 2}, key='same')
+        self.assertEqual(OutboxEvent.objects.get().data, {'a': 1})
+
+    def test_dispatch_retries_failed_events(self):
+        """Упавшее событие доставляется повторно, позиция не теряется."""
+        calls = []
+        fail = {'once': True}
+
+        def flaky(event):
+            if fail.pop('once', False):
+                raise RuntimeError('сбой')
+            calls.append(event.data['n'])
+
+        item = events.Handler('flaky', ('test.topic',), flaky)
+        for n in range(3):
+            events.emit('test.topic', {'n': n}, key=f'flaky:{n}')
+        with mock.patch.dict(events._handlers, {'flaky': item}, clear=True):
+            with self.assertLogs('core.events', 'ERROR'):
+                self.assertEqual(events.dispatch(), 0)
+            offset = HandlerOffset.objects.get(handler='flaky')
+            self.assertEqual((offset.failures, offset.last_event_id), (1, 0))
+            lag = events.handler_lag()[0]
+            self.assertEqual(lag['pending'], 3)
+            self.assertEqual(events.dispatch(), 3)
+            self.assertEqual(events.handler_lag()[0]['pending'], 0)
+            call_command('dispatch_events', prune_days=0,
+                         stdout=mock.MagicMock())
+        self.assertEqual(calls, [0, 1, 2])
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_failing_event_goes_to_dead_letters(self):
+        """После max_attempts неудач событие откладывается, очередь идёт."""
+        calls = []
+
+        def broken_first(event):
+            if event.data['n'] == 0:
+                raise RuntimeError('битое событие')
+            calls.append(event.data['n'])
+
+        item = events.Handler('broken', ('test.topic',), broken_first, 2)
+        for n in range(3):
+            events.emit('test.topic', {'n': n}, key=f'broken:{n}')
+        with mock.patch.dict(events._handlers, {'broken': item}, clear=True):
+            with self.assertLogs('core.events', 'ERROR'):
+                self.assertEqual(events.dispatch(), 0)
+                self.assertEqual(events.dispatch(), 3)
+            self.assertEqual(events.handler_lag()[0]['dead'], 1)
+        self.assertEqual(calls, [1, 2])
+        dead = DeadLetter.objects.get()
+        self.assertEqual((dead.handler, dead.attempts, dead.payload),
+                         ('broken', 2, '{"n": 0}'))
+        offset = HandlerOffset.objects.get(handler='broken')
+        self.assertEqual((offset.failures, offset.retries), (2, 0))
+
+    def test_handlers_update_shared_state(self):
+        """Обработчики сбрасывают кеш лент, счётчики и пишут автору."""
+        cache.clear()
+        self.authorized_client.get(reverse('posts:index'))
+        self.authorized_client.post(reverse('posts:post_create'),
+                                    {'text': 'Пост из обработчика'})
+        post = Post.objects.get()
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+            {'text': 'Комментарий'})
+        self.authorized_client.get(reverse(
+            'posts:profile_follow',
+            kwargs={'username': self.author.username}))
+        PostCard.objects.update(comments_count=0)
+        events.dispatch()
+        events.dispatch()
+        self.assertEqual(PostCard.objects.get().comments_count, 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['author@example.com'])
+        self.assertIn('outbox_user', mail.outbox[0].subject)
+        # поколение в базе — то, что перечитывают веб-процессы
+        self.assertGreater(
+            CacheVersion.objects.get(name=FEED_CACHE).version, 0)
+        with override_settings(CACHE_VERSION_TTL=0):
+            response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Пост из обработчика')
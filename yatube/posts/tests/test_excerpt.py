@@ -0,0 +1,79 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core import backfill
+
+from ..cards import card_rows
+from ..models import EXCERPT_LENGTH, Post, PostCard
+from ..projection import refresh_cards
+
+User = get_user_model()
+
+LONG_TEXT = 'д' * EXCERPT_LENGTH + 'хвост'
+
+
+class ExcerptTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_excerpt_on_save(self):
+        post = Post.objects.create(author=self.author, text='Короткий')
+        self.assertEqual(post.excerpt, 'Короткий')
+        self.assertFalse(post.truncated)
+        post.text = LONG_TEXT
+        post.save(update_fields=['text'])
+        post.refresh_from_db()
+        self.assertEqual(post.excerpt, 'д' * EXCERPT_LENGTH)
+        self.assertTrue(post.truncated)
+
+    def test_backfill_existing_rows(self):
+        """Строки без excerpt заполняются заполнением posts.post_excerpt."""
+        Post.objects.bulk_create([
+            Post(author=self.author, text=LONG_TEXT),
+            Post(author=self.author, text='Короткий'),
+        ])
+        self.assertEqual(backfill.verify('posts.post_excerpt'), 2)
+        backfill.run_backfill('posts.post_excerpt', pause=0)
+        self.assertEqual(backfill.verify('posts.post_excerpt'), 0)
+        self.assertEqual(
+            list(Post.objects.order_by('pk').values_list('excerpt',
+                                                         'truncated')),
+            [('д' * EXCERPT_LENGTH, True), ('Короткий', False)])
+
+    def test_feeds_before_backfill(self):
+        """Пока excerpt не заполнен, ленты режут текст в запросе."""
+        Post.objects.bulk_create([
+            Post(author=self.author, text=LONG_TEXT),
+            Post(author=self.author, text='Короткий'),
+        ])
+        rows = card_rows(Post.objects.order_by('pk'), author=self.author)
+        self.assertEqual([(row.feed_excerpt, row.feed_truncated)
+                          for row in rows],
+                         [('д' * EXCERPT_LENGTH, True), ('Короткий', False)])
+        ids = list(Post.objects.order_by('pk').values_list('pk', flat=True))
+        refresh_cards(ids)
+        self.assertEqual(
+            list(PostCard.objects.order_by('pk').values_list('excerpt',
+                                                             'truncated')),
+            [('д' * EXCERPT_LENGTH, True), ('Короткий', False)])
+
+    def test_full_text_fragment(self):
+        """Лента отдаёт начало текста, полный — фрагмент и страница поста."""
+        post = Post.objects.create(author=self.author, text=LONG_TEXT)
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'хвост')
+        self.assertContains(response, reverse('posts:post_text',
+                                              args=[post.pk]))
+        response = self.client.get(reverse('posts:post_text',
+                                           args=[post.pk]))
+        self.assertContains(response, LONG_TEXT)
+        self.assertTemplateUsed(response, 'posts/includes/post_text.html')
+        response = self.client.get(reverse('posts:post_text', args=[0]))
+        self.assertEqual(response.status_code, 404)
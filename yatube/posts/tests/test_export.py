@@ -0,0 +1,107 @@
+import io
+import json
+import shutil
+import tempfile
+import zipfile
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from yatube import settings
+
+from ..models import ArchivedComment, ArchivedPost, Comment, Post
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class AuthorExportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='exporter')
+        cls.other = User.objects.create_user(username='stranger')
+        small_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00'
+            b'\x01\x00\x80\x00\x00\x00\x00\x00'
+            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+            b'\x0A\x00\x3B'
+        )
+        cls.posts = [
+            Post.objects.create(author=cls.user, text=f'Пост {i}')
+            for i in range(3)
+        ]
+        cls.posts[0].image = SimpleUploadedFile(
+            name='small.gif', content=small_gif, content_type='image/gif')
+        cls.posts[0].save()
+        Comment.objects.create(post=cls.posts[1], author=cls.user,
+                               text='Свой комментарий')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.url = reverse('posts:profile_export',
+                           kwargs={'username': self.user.username})
+
+    def test_jsonl_export_streams_all_rows(self):
+        """Выгрузка JSONL отдаёт посты и комментарии потоком."""
+        response = self.authorized_client.get(self.url)
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in
+                b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['type'] for row in rows],
+                         ['post'] * 3 + ['comment'])
+        self.assertEqual(rows[-1]['post'], self.posts[1].pk)
+
+    def test_archived_rows_exported(self):
+        """Посты и комментарии из архива тоже попадают в выгрузку."""
+        now = timezone.now()
+        archived = ArchivedPost.objects.create(
+            id=10_000, author=self.user, text='Старый пост', pub_date=now,
+            updated_at=now)
+        ArchivedComment.objects.create(
+            id=10_000, post=archived, author=self.user, text='Старый',
+            created=now, updated_at=now)
+        response = self.authorized_client.get(self.url)
+        rows = [json.loads(line) for line in
+                b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([(row['type'], row['id']) for row in rows
+                          if row['id'] == archived.pk],
+                         [('post', archived.pk), ('comment', archived.pk)])
+        self.assertEqual(len(rows), 6)
+
+    def test_csv_export(self):
+        """CSV выгрузка начинается с заголовка."""
+        response = self.authorized_client.get(self.url, {'format': 'csv'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'type,id,post,text,pub_date,group,image')
+        self.assertEqual(len(lines), 5)
+
+    def test_zip_export_with_images(self):
+        """В zip попадают данные и картинки постов."""
+        response = self.authorized_client.get(self.url, {'images': '1'})
+        archive = zipfile.ZipFile(
+            io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(archive.namelist(),
+                         ['data.jsonl', f'images/{self.posts[0].image.name}'])
+        self.assertIsNone(archive.testzip())
+
+    def test_export_only_for_owner(self):
+        """Чужую выгрузку получить нельзя."""
+        client = Client()
+        client.force_login(self.other)
+        response = client.get(self.url)
+        self.assertRedirects(response, reverse(
+            'posts:profile', kwargs={'username': self.user.username}))
@@ -0,0 +1,148 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from ..importer import ContentImporter
+from ..models import Comment, Follow, Group, Post, PostTag
+
+User = get_user_model()
+
+
+class ImportContentTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='importer')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+
+    def run_import(self, lines, suffix='.jsonl', **options):
+        with tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False,
+                                         encoding='utf-8') as stream:
+            stream.write(lines)
+        self.addCleanup(os.remove, stream.name)
+        out = StringIO()
+        call_command('import_content', stream.name, stdout=out, **options)
+        return out.getvalue()
+
+    def test_jsonl_import_in_batches(self):
+        """JSONL импортируется пачками с сопоставлением id."""
+        records = [
+            {'type': 'post', 'id': f'src-{i}', 'author': 'importer',
+             'group': 'test-slug', 'text': f'Импорт {i} #перенос',
+             'pub_date': '2020-01-0%dT10:00:00+00:00' % (i + 1)}
+            for i in range(5)
+        ]
+        records += [
+            {'type': 'comment', 'post': 'src-3', 'author': 'newbie',
+             'text': 'комментарий'},
+            {'type': 'comment', 'post': 'missing', 'author': 'importer',
+             'text': 'потеряшка'},
+            {'type': 'follow', 'user': 'newbie', 'author': 'importer'},
+        ]
+        out = self.run_import(
+            '\n'.join(json.dumps(r, ensure_ascii=False) for r in records),
+            batch_size=2, create_users=True)
+        self.assertIn('строк/с', out)
+        self.assertEqual(Post.objects.filter(group=self.group).count(), 5)
+        self.assertEqual(Post.objects.filter(pub_date__year=2020).count(), 5)
+        comment = Comment.objects.get()
+        self.assertEqual(comment.post.text, 'Импорт 3 #перенос')
+        self.assertTrue(Follow.objects.filter(
+            user__username='newbie', author=self.user).exists())
+        self.assertEqual(PostTag.objects.filter(tag='#перенос').count(), 5)
+
+    def test_csv_import_skips_unknown_authors(self):
+        """Без --create-users записи неизвестных авторов пропускаются."""
+        out = self.run_import(
+            'type,author,text\npost,importer,из csv\npost,nobody,мимо\n',
+            suffix='.csv')
+        self.assertEqual(Post.objects.get().text, 'из csv')
+        self.assertIn('пропущено 1', out)
+
+    def test_bad_dates_skipped(self):
+        """Пост с нечитаемой датой пропускается, импорт идёт дальше."""
+        records = [
+            {'type': 'post', 'author': 'importer', 'text': 'вчера',
+             'pub_date': 'вчера'},
+            {'type': 'post', 'author': 'importer', 'text': 'тринадцатый',
+             'pub_date': '2020-13-01T10:00:00+00:00'},
+            {'type': 'post', 'author': 'importer', 'text': 'число',
+             'pub_date': 20200101},
+            {'type': 'post', 'author': 'importer', 'text': 'годный',
+             'pub_date': '2020-01-01T10:00:00+00:00'},
+        ]
+        out = self.run_import('\n'.join(json.dumps(r) for r in records))
+        self.assertEqual(Post.objects.get().text, 'годный')
+        self.assertIn('пропущено 3', out)
+
+    def test_comments_outside_window_skipped(self):
+        """Комментарий к посту за окном импорта пропускается."""
+        records = [
+            {'type': 'post', 'id': f'src-{i}', 'author': 'importer',
+             'text': f'пост {i}'}
+            for i in range(3)
+        ]
+        records += [
+            {'type': 'comment', 'post': 'src-0', 'author': 'importer',
+             'text': 'давний'},
+            {'type': 'comment', 'post': 'src-2', 'author': 'importer',
+             'text': 'свежий'},
+        ]
+        out = self.run_import(
+            '\n'.join(json.dumps(r) for r in records),
+            batch_size=1, post_window=2)
+        self.assertEqual(Comment.objects.get().text, 'свежий')
+        self.assertIn('пропущено 1', out)
+
+
+class ImportConcurrentWriterTests(TransactionTestCase):
+    databases = {'default', 'shard_1'}
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='importer')
+        Post.objects.create(author=self.user, text='Уже был')
+
+    def import_with_writer(self):
+        """Импорт, между резервированием id и вставкой пишет сайт."""
+        allocate = ContentImporter.allocate_ids
+        written = []
+
+        def allocate_then_write(importer, model, count):
+            ids = allocate(importer, model, count)
+            written.append(Post.objects.create(author=self.user,
+                                               text='С сайта').pk)
+            return ids
+
+        records = [{'type': 'post', 'author': 'importer',
+                    'text': f'Импорт {i}'} for i in range(6)]
+        with mock.patch.object(ContentImporter, 'allocate_ids',
+                               allocate_then_write):
+            ContentImporter(batch_size=3).run(records)
+        return written
+
+    def test_reserved_ids_not_taken(self):
+        """Параллельная запись не занимает id, выданные импорту."""
+        written = self.import_with_writer()
+        self.assertEqual(len(written), 2)
+        self.assertEqual(Post.objects.filter(text__startswith='Импорт')
+                         .count(), 6)
+        self.assertEqual(Post.objects.count(), 9)
+
+    @override_settings(POST_SHARDS=['default', 'shard_1'])
+    def test_sharded_ids_from_sequence(self):
+        """С шардами импорт берёт id из общей последовательности."""
+        self.import_with_writer()
+        ids = list(Post.objects.values_list('pk', flat=True))
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(Post.objects.filter(text__startswith='Импорт')
+                         .count(), 6)
@@ -0,0 +1,107 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from core import jobs
+from core.models import Job
+
+User = get_user_model()
+
+calls = []
+
+
+@jobs.task('tests.record')
+def record(value):
+    calls.append(value)
+
+
+@jobs.task('tests.flaky', max_attempts=2)
+def flaky():
+    raise ValueError('сбой')
+
+
+@jobs.task('tests.progress', progress=True)
+def with_progress(total, progress):
+    for done in range(1, total + 1):
+        progress(done, total)
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_priority_and_schedule(self):
+        """Задачи берутся по приоритету, отложенные ждут своего времени."""
+        jobs.enqueue('tests.record', value='обычная')
+        jobs.enqueue('tests.record', value='срочная', priority=10)
+        later = jobs.enqueue('tests.record', value='потом',
+                             run_at=timezone.now() + timedelta(hours=1))
+        self.assertEqual(jobs.work_off(), 2)
+        self.assertEqual(calls, ['срочная', 'обычная'])
+        later.refresh_from_db()
+        self.assertEqual(later.status, Job.QUEUED)
+
+    def test_claim_takes_job_once(self):
+        """Захваченную задачу второй исполнитель не получит."""
+        jobs.enqueue('tests.record', value=1)
+        self.assertIsNotNone(jobs.claim('first'))
+        self.assertIsNone(jobs.claim('second'))
+
+    def test_key_deduplicates_active_jobs(self):
+        """Ждущая задача с ключом не дублируется, выполняется одна."""
+        first = jobs.enqueue('tests.record', key='k', value=1)
+        self.assertEqual(jobs.enqueue('tests.record', key='k', value=2),
+                         first)
+        self.assertEqual(jobs.claim('first'), first)
+        second = jobs.enqueue('tests.record', key='k', value=3)
+        self.assertNotEqual(second, first)
+        self.assertIsNone(jobs.claim('second'))
+        jobs.run_job(Job.objects.get(pk=first.pk))
+        self.assertEqual(jobs.claim('second'), second)
+
+    def test_retry_with_backoff_then_fail(self):
+        """Упавшая задача откладывается, а после всех попыток — ошибка."""
+        job = jobs.enqueue('tests.flaky')
+        with self.assertLogs('core.jobs', 'ERROR'):
+            jobs.work_off()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertGreater(job.run_at, timezone.now())
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        with self.assertLogs('core.jobs', 'ERROR'):
+            jobs.work_off()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertIn('сбой', job.last_error)
+
+    def test_progress_and_stale_locks(self):
+        """Прогресс пишется в задачу, брошенные задачи возвращаются."""
+        job = jobs.enqueue('tests.progress', total=3)
+        jobs.work_off()
+        job.refresh_from_db()
+        self.assertEqual((job.progress_done, job.progress_total), (3, 3))
+        stale = jobs.enqueue('tests.record', value=1)
+        jobs.claim('dead')
+        Job.objects.filter(pk=stale.pk).update(
+            locked_at=timezone.now() - jobs.LOCK_TIMEOUT * 2)
+        self.assertEqual(jobs.requeue_stale(), 1)
+        self.assertEqual(jobs.work_off(), 1)
+
+    def test_worker_command_and_admin(self):
+        """Команда показывает очередь, админка — её глубину."""
+        jobs.enqueue('tests.record', value=1)
+        out = StringIO()
+        call_command('run_worker', '--stats', stdout=out)
+        self.assertIn('готовы к запуску: 1', out.getvalue())
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        client = Client()
+        client.force_login(admin)
+        response = client.get(reverse('admin:core_job_changelist'))
+        self.assertEqual(response.context['queue']['due'], 1)
+        self.assertContains(response, 'Готовы к запуску')
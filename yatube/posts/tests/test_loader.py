@@ -0,0 +1,68 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import loader
+
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class BatchLoaderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.authors = [User.objects.create_user(username=f'author{i}')
+                       for i in range(4)]
+        cls.post = Post.objects.create(author=cls.authors[0],
+                                       group=cls.group, text='Пост')
+        for author in cls.authors:
+            Post.objects.create(author=author, group=cls.group,
+                                text='Ещё пост')
+
+    def begin_scope(self):
+        self.addCleanup(loader.end_scope, loader.begin_scope())
+
+    def test_one_query_per_model(self):
+        """Связи всей выборки читаются одним запросом на модель."""
+        self.begin_scope()
+        posts = list(Post.objects.order_by('pk'))
+        with self.assertNumQueries(2):
+            names = [post.author.username for post in posts]
+            titles = {post.group.title for post in posts}
+        self.assertEqual(names[1:], [a.username for a in self.authors])
+        self.assertEqual(titles, {'Группа'})
+
+    def test_memoized_per_request(self):
+        self.begin_scope()
+        list(Post.objects.all())[0].author
+        with self.assertNumQueries(0):
+            loaded = loader.load(User, [self.authors[0].pk])
+        self.assertEqual(loaded[self.authors[0].pk], self.authors[0])
+
+    def test_lazy_outside_scope(self):
+        """Вне запроса внешние ключи грузятся как обычно."""
+        posts = list(Post.objects.all())
+        with self.assertNumQueries(len(posts)):
+            for post in posts:
+                post.author
+
+    def test_comment_authors_constant(self):
+        """Число запросов страницы поста не растёт с числом авторов."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        for author in self.authors[1:3]:
+            Comment.objects.create(post=self.post, author=author,
+                                   text='Комментарий')
+        queries = self.count_queries(url)
+        Comment.objects.create(post=self.post, author=self.authors[3],
+                               text='Ещё один')
+        self.assertEqual(self.count_queries(url), queries)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            Client().get(url)
+        return len(context.captured_queries)
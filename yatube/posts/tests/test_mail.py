@@ -0,0 +1,92 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.jobs import work_off
+from core.mail import MAIL_MAX_ATTEMPTS, send_batch
+from core.models import OutboxEmail
+
+User = get_user_model()
+
+
+@override_settings(
+    EMAIL_BACKEND='core.mail.OutboxEmailBackend',
+    MAIL_DELIVERY_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    MAIL_RECIPIENT_LIMIT=(2, 3600),
+)
+class OutboxMailTests(TestCase):
+    def test_password_reset_does_not_send_inline(self):
+        """Сброс пароля только сохраняет письмо, отправляет его задача."""
+        User.objects.create_user(username='user', email='user@example.com',
+                                 password='pass')
+        response = self.client.post(reverse('users:password_reset'),
+                                    {'email': 'user@example.com'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(len(mail.outbox), 0)
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.recipient, 'user@example.com')
+        self.assertEqual(work_off(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn('reset', mail.outbox[0].body)
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboxEmail.SENT)
+
+    def test_recipient_rate_limit(self):
+        """Лишние письма одному получателю откладываются."""
+        for i in range(3):
+            EmailMessage(f'Письмо {i}', 'текст',
+                         to=['Reader@example.com']).send()
+        EmailMessage('Другому', 'текст', to=['other@example.com']).send()
+        send_batch()
+        self.assertEqual(len(mail.outbox), 3)
+        deferred = OutboxEmail.objects.get(status=OutboxEmail.QUEUED)
+        self.assertEqual(deferred.subject, 'Письмо 2')
+        self.assertEqual(send_batch(), 0)
+
+    def test_limit_per_recipient(self):
+        """Лимит считается для каждого адреса письма, а не для первого."""
+        EmailMessage('Рассылка', 'текст', to=['reader@example.com'],
+                     cc=['copy@example.com']).send()
+        for i in range(2):
+            EmailMessage(f'Письмо {i}', 'текст',
+                         to=['copy@example.com']).send()
+        send_batch()
+        self.assertEqual(
+            sorted(address for message in mail.outbox
+                   for address in message.recipients()),
+            ['copy@example.com', 'copy@example.com', 'reader@example.com'])
+        deferred = OutboxEmail.objects.get(status=OutboxEmail.QUEUED)
+        self.assertEqual((deferred.recipient, deferred.subject),
+                         ('copy@example.com', 'Письмо 1'))
+
+    def test_stored_as_mime(self):
+        """В базе лежит MIME письма, отправляется он же без изменений."""
+        EmailMessage('Тема', 'Текст письма', 'site@example.com',
+                     to=['user@example.com'],
+                     headers={'X-Test': 'да'}).send()
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.from_email, 'site@example.com')
+        self.assertIn(b'X-Test:', bytes(email.mime))
+        send_batch()
+        sent = mail.outbox[0]
+        self.assertEqual(sent.body, 'Текст письма')
+        self.assertEqual(sent.message().as_bytes(), bytes(email.mime))
+
+    def test_retry_then_fail(self):
+        """Ошибка доставки повторяется с паузой, потом письмо — ошибка."""
+        EmailMessage('Тема', 'текст', to=['user@example.com']).send()
+        with mock.patch(
+                'django.core.mail.backends.locmem.EmailBackend.send_messages',
+                side_effect=OSError('SMTP недоступен')), \
+                self.assertLogs('core.mail', 'ERROR'):
+            for _ in range(MAIL_MAX_ATTEMPTS):
+                OutboxEmail.objects.update(send_after='2000-01-01T00:00Z')
+                send_batch()
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.status, OutboxEmail.FAILED)
+        self.assertEqual(email.attempts, MAIL_MAX_ATTEMPTS)
+        self.assertIn('SMTP', email.last_error)
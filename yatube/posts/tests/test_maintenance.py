@@ -0,0 +1,69 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TransactionTestCase
+
+from core.models import Job
+from core.sqlite import maintenance
+
+from ..models import Post
+
+User = get_user_model()
+
+
+class MaintenanceTests(TransactionTestCase):
+    def setUp(self):
+        author = User.objects.create_user(username='author')
+        Post.objects.bulk_create(
+            Post(author=author, text=f'Пост {i} ' + 'x' * 2000)
+            for i in range(300))
+
+    def free_pages(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA freelist_count')
+            return cursor.fetchone()[0]
+
+    def test_incremental_vacuum_in_steps(self):
+        """Свободные страницы возвращаются шагами до нуля."""
+        Post.all_objects.all().delete()
+        free = self.free_pages()
+        self.assertGreater(free, 20)
+        result = maintenance.incremental_vacuum(step_pages=20, pause=0)
+        self.assertEqual(result['auto_vacuum'],
+                         maintenance.AUTO_VACUUM_INCREMENTAL)
+        self.assertEqual(result['freed_pages'], free)
+        self.assertGreater(result['steps'], 1)
+        self.assertEqual(self.free_pages(), 0)
+
+    def test_vacuum_respects_time_limit(self):
+        """С исчерпанным временем vacuum не делает ни шага."""
+        Post.all_objects.all().delete()
+        result = maintenance.incremental_vacuum(time_limit=0)
+        self.assertEqual(result['steps'], 0)
+        self.assertGreater(result['free_pages'], 0)
+
+    def test_index_report(self):
+        """Отчёт перечисляет индексы с размером и заполнением."""
+        report = {row['index']: row for row in maintenance.index_report()}
+        row = report['posts_post_deleted_idx']
+        self.assertEqual(row['table'], 'posts_post')
+        self.assertGreater(row['size'], 0)
+        self.assertTrue(0 < row['fill'] <= 1)
+
+    def test_command_runs_and_schedules(self):
+        """Команда обслуживает базу сразу или ставит задачу с повтором."""
+        out = StringIO()
+        call_command('db_maintenance', '--database', 'default',
+                     '--full-analyze', '--report', stdout=out)
+        self.assertIn('default: ANALYZE', out.getvalue())
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM sqlite_master '
+                           "WHERE name = 'sqlite_stat1'")
+            self.assertEqual(cursor.fetchone()[0], 1)
+        call_command('db_maintenance', '--schedule', '24', stdout=out)
+        call_command('db_maintenance', '--schedule', '24', stdout=out)
+        job = Job.objects.get()
+        self.assertEqual(job.task, maintenance.MAINTENANCE_TASK)
+        self.assertEqual(job.data['repeat_hours'], 24)
@@ -0,0 +1,167 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import events
+from core.jobs import work_off
+from core.models import Job
+
+from ..bulk import delete_comments, move_posts_to_group
+from ..models import Comment, Follow, Group, Post, PostCard
+from ..projection import CARD_THUMBNAILS_TASK
+from ..purge import deactivate_user, soft_delete
+
+User = get_user_model()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+class PostCardProjectionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', first_name='Имя', last_name='Фамилия')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.other_group = Group.objects.create(title='Другая', slug='other',
+                                               description='Описание')
+        cls.post = Post.objects.create(author=cls.author, group=cls.group,
+                                       text='Пост в группе')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def card(self):
+        return PostCard.objects.get(pk=self.post.pk)
+
+    def test_post_changes_update_card(self):
+        """Карточка создаётся и меняется вместе с постом."""
+        card = self.card()
+        self.assertEqual(card.author_username, 'author')
+        self.assertEqual(card.author_full_name, 'Имя Фамилия')
+        self.assertEqual(card.group_slug, 'group')
+        self.post.text = 'Новый текст'
+        self.post.save()
+        self.assertEqual(self.card().excerpt, 'Новый текст')
+        Post.objects.get(pk=self.post.pk).delete()
+        self.assertFalse(PostCard.objects.exists())
+
+    def test_author_and_group_changes(self):
+        """Переименование автора и группы доходит до карточек."""
+        self.author.first_name = 'Другое'
+        self.author.save()
+        self.group.title = 'Новое название'
+        self.group.save()
+        card = self.card()
+        self.assertEqual(card.author_full_name, 'Другое Фамилия')
+        self.assertEqual(card.group_title, 'Новое название')
+        Group.objects.filter(pk=self.group.pk).delete()
+        card = self.card()
+        self.assertIsNone(card.group_id)
+        self.assertEqual(card.group_slug, '')
+
+    def test_comment_counts(self):
+        """Счётчик растёт обработчиком outbox, массовое удаление
+        пересчитывает его сразу."""
+        self.client.post(reverse('posts:add_comment', args=[self.post.pk]),
+                         {'text': 'Комментарий'})
+        self.assertEqual(self.card().comments_count, 0)
+        events.dispatch()
+        self.assertEqual(self.card().comments_count, 1)
+        comment = Comment.objects.get()
+        delete_comments(Comment.objects.filter(pk=comment.pk))
+        self.assertEqual(self.card().comments_count, 0)
+
+    def test_bulk_changes(self):
+        """Массовые операции без сигналов тоже обновляют карточки."""
+        move_posts_to_group(Post.objects.all(), self.other_group.pk)
+        self.assertEqual(self.card().group_slug, 'other')
+        soft_delete(Post.all_objects.filter(pk=self.post.pk))
+        self.assertFalse(PostCard.objects.exists())
+
+    def test_deactivated_author_loses_cards(self):
+        deactivate_user(self.author)
+        self.assertFalse(PostCard.objects.exists())
+        self.author.is_active = True
+        self.author.save()
+        self.assertEqual(self.card().author_username, 'author')
+
+    def test_feeds_read_projection(self):
+        """Ленты читают страницу карточек одним запросом."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        for name, args in (('posts:index', []),
+                           ('posts:group_list', [self.group.slug]),
+                           ('posts:follow_index', [])):
+            with self.subTest(name=name):
+                response = self.client.get(reverse(name, args=args))
+                card = response.context['page_obj'][0]
+                self.assertEqual(card.pk, self.post.pk)
+                self.assertEqual(card.author.get_full_name(), 'Имя Фамилия')
+                self.assertEqual(card.comments_count, 0)
+        response = self.client.get(reverse('posts:profile',
+                                           args=['author']))
+        self.assertEqual(response.context['page_obj'][0].pk, self.post.pk)
+
+    def test_rebuild_command(self):
+        """Команда восстанавливает потерянные и убирает лишние карточки."""
+        PostCard.objects.all().delete()
+        PostCard.objects.create(
+            id=self.post.pk + 100, pub_date=self.post.pub_date,
+            author_id=self.author.pk, author_username='author',
+            excerpt='Лишняя')
+        out = StringIO()
+        call_command('rebuild_post_cards', stdout=out)
+        self.assertEqual(list(PostCard.objects.values_list('pk', flat=True)),
+                         [self.post.pk])
+        self.assertIn('Карточек пересобрано: 1', out.getvalue())
+
+
+class CardThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        cls.settings_override = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.settings_override.enable()
+        cls.author = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        super().tearDownClass()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+
+    def test_thumbnail_built_by_job(self):
+        """Миниатюра строится задачей, а не при сохранении поста."""
+        post = Post.objects.create(
+            author=self.author, text='С картинкой',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF,
+                                     content_type='image/gif'))
+        self.assertEqual(PostCard.objects.get(pk=post.pk).thumbnail_url, '')
+        self.assertEqual(Job.objects.get().task, CARD_THUMBNAILS_TASK)
+        self.assertEqual(work_off(), 1)
+        url = PostCard.objects.get(pk=post.pk).thumbnail_url
+        self.assertTrue(url.startswith(settings.MEDIA_URL))
+        post.text = 'Новый текст'
+        post.save()
+        # картинка та же: миниатюра сохраняется, новой задачи нет
+        self.assertEqual(PostCard.objects.get(pk=post.pk).thumbnail_url, url)
+        self.assertEqual(work_off(), 0)
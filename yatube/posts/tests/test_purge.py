@@ -0,0 +1,121 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.jobs import work_off
+from core.models import Job
+
+from ..archive import archive_posts
+from ..changes import fetch_changes
+from ..models import (ArchivedComment, ArchivedPost, Comment, Follow, Post,
+                      PostTag, Tombstone)
+from ..purge import deactivate_user, purge_deleted, purge_user, soft_delete
+
+User = get_user_model()
+
+
+class PurgeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.spammer = User.objects.create_user(username='spammer')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.posts = [
+            Post.objects.create(author=cls.spammer, text=f'Спам {i} #спам')
+            for i in range(7)
+        ]
+        for post in cls.posts:
+            PostTag.objects.create(tag='#спам', pub_date=post.pub_date,
+                                   post=post)
+            Comment.objects.create(post=post, author=cls.reader,
+                                   text='Ответ читателя')
+        cls.own_post = Post.objects.create(author=cls.reader,
+                                           text='Пост читателя')
+        cls.spam_comment = Comment.objects.create(
+            post=cls.own_post, author=cls.spammer, text='Спам в ответах')
+        Follow.objects.create(user=cls.reader, author=cls.spammer)
+        Follow.objects.create(user=cls.spammer, author=cls.reader)
+
+    def setUp(self):
+        self.client = Client()
+
+    def test_deactivated_user_hidden_at_once(self):
+        """Контент отключённого пользователя пропадает до удаления."""
+        deactivate_user(self.spammer)
+        self.assertEqual(list(Post.objects.all()), [self.own_post])
+        self.assertFalse(Comment.objects.filter(author=self.spammer).exists())
+        self.assertEqual(Post.all_objects.filter(
+            author=self.spammer).count(), 7)
+        response = self.client.get(reverse('posts:tag_list',
+                                           args=['спам']))
+        self.assertEqual(len(response.context['page_obj']), 0)
+        response = self.client.get(reverse('posts:profile',
+                                           args=['spammer']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_purge_user_in_batches(self):
+        """Purger удаляет всё порциями и отчитывается о прогрессе."""
+        self.assertEqual(archive_posts(self.posts[2].pub_date), 2)
+        reports = []
+        deleted = purge_user(self.spammer.pk, batch_size=3,
+                             progress=lambda *args: reports.append(args))
+        self.assertEqual(reports[0], (0, deleted))
+        self.assertEqual(reports[-1], (deleted, deleted))
+        self.assertGreater(len(reports), 3)
+        self.assertFalse(User.objects.filter(pk=self.spammer.pk).exists())
+        self.assertEqual(list(Post.all_objects.all()), [self.own_post])
+        self.assertFalse(Comment.all_objects.exists())
+        self.assertFalse(ArchivedPost.all_objects.exists())
+        self.assertFalse(ArchivedComment.all_objects.exists())
+        self.assertFalse(PostTag.objects.exists())
+        self.assertFalse(Follow.objects.exists())
+        self.assertTrue(Tombstone.objects.filter(
+            model='post', object_id=self.posts[-1].pk).exists())
+
+    def test_purge_archive_reaches_change_feed(self):
+        """Удаление архива пользователя приходит в ленту изменений."""
+        _, cursor, _ = fetch_changes()
+        archive_posts(self.posts[2].pub_date)
+        archived_comments = set(ArchivedComment.all_objects.values_list(
+            'pk', flat=True))
+        purge_user(self.spammer.pk)
+        deletes = set()
+        while True:
+            changes, cursor, has_more = fetch_changes(cursor)
+            deletes.update((c['model'], c['id']) for c in changes
+                           if c['op'] == 'delete')
+            if not has_more:
+                break
+        for post in self.posts[:2]:
+            self.assertIn(('post', post.pk), deletes)
+        for comment_id in archived_comments:
+            self.assertIn(('comment', comment_id), deletes)
+
+    def test_soft_delete_then_purge(self):
+        """Помеченные записи скрыты сразу и стираются задачей."""
+        job = soft_delete(Post.objects.filter(pk=self.posts[0].pk))
+        self.assertEqual(soft_delete(Comment.objects.filter(
+            pk=self.spam_comment.pk)), job)
+        self.assertFalse(Post.objects.filter(pk=self.posts[0].pk).exists())
+        response = self.client.get(reverse('posts:post_detail',
+                                           args=[self.posts[0].pk]))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(work_off(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual((job.progress_done, job.progress_total), (2, 2))
+        self.assertFalse(Post.all_objects.filter(
+            pk=self.posts[0].pk).exists())
+        self.assertFalse(Comment.all_objects.filter(
+            pk=self.spam_comment.pk).exists())
+        self.assertEqual(purge_deleted(), 0)
+
+    def test_command_purges_now(self):
+        """Команда с --now удаляет пользователя без очереди."""
+        out = StringIO()
+        call_command('purge_user', 'spammer', '--now', stdout=out)
+        self.assertIn('удалён', out.getvalue())
+        self.assertFalse(User.objects.filter(username='spammer').exists())
+        self.assertFalse(Job.objects.exists())
@@ -0,0 +1,53 @@
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from core.middleware import PIN_COOKIE
+from core.routers import ReplicaRouter, begin_scope, end_scope
+
+from ..models import Post
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author',
+                                               password='pass')
+        Post.objects.create(author=self.author, text='Старый пост')
+        call_command('sync_replica', 'replica', verbosity=0)
+        self.client = Client()
+        self.client.force_login(self.author)
+        self.profile = reverse('posts:profile', args=['author'])
+
+    def test_router_scope(self):
+        """Вне запроса всё читается с default, в запросе — с реплики."""
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(Post), 'default')
+        token = begin_scope()
+        self.assertEqual(router.db_for_read(Post), 'replica')
+        self.assertEqual(router.db_for_write(Post), 'default')
+        self.assertEqual(router.db_for_read(Post), 'default')
+        self.assertTrue(end_scope(token))
+
+    def test_read_your_writes(self):
+        """Автор сразу видит свой пост, остальные — после синхронизации."""
+        response = self.client.post(reverse('posts:post_create'),
+                                    {'text': 'Новый пост'})
+        self.assertIn(PIN_COOKIE, response.cookies)
+        response = self.client.get(self.profile)
+        self.assertContains(response, 'Новый пост')
+
+        # кука истекла — чтение снова с отстающей реплики
+        self.client.cookies.pop(PIN_COOKIE)
+        response = self.client.get(self.profile)
+        self.assertContains(response, 'Старый пост')
+        self.assertNotContains(response, 'Новый пост')
+
+        call_command('sync_replica', 'replica', verbosity=0)
+        response = self.client.get(self.profile)
+        self.assertContains(response, 'Новый пост')
@@ -0,0 +1,76 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Post
+from ..search import build_match_expression, search_posts
+from ..utils import encode_cursor
+
+User = get_user_model()
+
+
+class PostSearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='search_user')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.user,
+                text=f'Пост номер {i} про котиков и <b>разметку</b>',
+            )
+            for i in range(5)
+        ]
+        cls.other = Post.objects.create(
+            author=cls.user,
+            text='Совсем другой пост про собак',
+        )
+
+    def setUp(self):
+        self.client = Client()
+
+    def test_match_expression_escapes_operators(self):
+        """Операторы FTS5 из запроса не интерпретируются."""
+        self.assertEqual(build_match_expression('кот OR "соб'),
+                         '"кот" "OR" "соб"*')
+        self.assertEqual(build_match_expression('  ?! '), '')
+
+    def test_search_keyset_pages(self):
+        """Страницы поиска идут по курсору и не пересекаются."""
+        first, cursor = search_posts('котиков', limit=3)
+        self.assertEqual(len(first), 3)
+        self.assertIsNotNone(cursor)
+        second, cursor = search_posts('котиков', after=cursor, limit=3)
+        self.assertEqual(len(second), 2)
+        self.assertIsNone(cursor)
+        found = {result.post.pk for result in first + second}
+        self.assertEqual(found, {post.pk for post in self.posts})
+
+    def test_index_follows_edits_and_deletes(self):
+        """Индекс обновляется при изменении и удалении поста."""
+        post = Post.objects.create(author=self.user, text='уникальноеслово')
+        self.assertEqual(len(search_posts('уникальноеслово')[0]), 1)
+        post.text = 'заменённый текст'
+        post.save()
+        self.assertEqual(len(search_posts('уникальноеслово')[0]), 0)
+        self.assertEqual(len(search_posts('заменённый')[0]), 1)
+        Post.objects.filter(pk=post.pk).delete()
+        self.assertEqual(len(search_posts('заменённый')[0]), 0)
+
+    def test_search_view_highlights_and_escapes(self):
+        """Сниппет подсвечивает совпадения и экранирует текст поста."""
+        response = self.client.get(reverse('posts:search'), {'q': 'собак'})
+        self.assertContains(response, '<mark>собак</mark>')
+        response = self.client.get(reverse('posts:search'), {'q': 'котиков'})
+        self.assertContains(response, '&lt;b&gt;')
+        self.assertNotContains(response, '<b>разметку</b>')
+
+    def test_search_view_ignores_foreign_cursor(self):
+        """Курсор с чужими типами значений не роняет поиск."""
+        for after in (encode_cursor({}, 1), encode_cursor(True, 1),
+                      encode_cursor(0.5, 'id')):
+            with self.subTest(after=after):
+                response = self.client.get(reverse('posts:search'),
+                                           {'q': 'котиков', 'after': after})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.context['results']), 5)
@@ -0,0 +1,257 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.jobs import work_off
+from core.models import OutboxEvent
+
+from .. import sharding
+from ..changes import fetch_changes
+from ..digest import send_digests
+from ..importer import ContentImporter
+from ..models import (ArchivedComment, ArchivedPost, AuthorShard, Comment,
+                      Follow, Group, Post, PostTag)
+from ..search import search_posts
+from ..sharding import move_author, scatter_keyset, shard_for_author
+
+User = get_user_model()
+
+
+@override_settings(POST_SHARDS=['default', 'shard_1'])
+class ShardingTests(TransactionTestCase):
+    databases = {'default', 'shard_1'}
+
+    def setUp(self):
+        cache.clear()
+        self.group = Group.objects.create(title='Группа', slug='group',
+                                          description='-')
+        self.authors = [
+            User.objects.create_user(username=f'author{i}', password='pass')
+            for i in range(2)
+        ]
+        self.clients = []
+        for author in self.authors:
+            client = Client()
+            client.force_login(author)
+            self.clients.append(client)
+            for i in range(3):
+                client.post(reverse('posts:post_create'),
+                            {'text': f'#шард пост {author.username} {i}',
+                             'group': self.group.pk})
+
+    def shard_of(self, author):
+        return AuthorShard.objects.get(author_id=author.pk).shard
+
+    def author_on(self, alias):
+        return next(a for a in self.authors if self.shard_of(a) == alias)
+
+    def test_posts_live_in_author_shard(self):
+        """Посты пишутся в шард автора, id уникальны во всех шардах."""
+        self.assertEqual({self.shard_of(a) for a in self.authors},
+                         {'default', 'shard_1'})
+        ids = []
+        for author in self.authors:
+            shard = self.shard_of(author)
+            posts = Post.objects.using(shard).filter(author=author)
+            self.assertEqual(posts.count(), 3)
+            self.assertEqual(PostTag.objects.using(shard).filter(
+                tag='#шард', post__author=author).count(), 3)
+            ids.extend(posts.values_list('pk', flat=True))
+        self.assertEqual(len(set(ids)), 6)
+
+    def test_feeds_gather_all_shards(self):
+        """Главная, группа и API собирают посты со всех шардов."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.context['page_obj'].paginator.count, 6)
+        dates = [post.pub_date for post in response.context['page_obj']]
+        self.assertEqual(dates, sorted(dates, reverse=True))
+        response = self.client.get(
+            reverse('posts:group_list', args=[self.group.slug]))
+        self.assertEqual(len(response.context['page_obj']), 6)
+        pages, after = [], None
+        while True:
+            rows, after = scatter_keyset(Post.objects.all(),
+                                         ('-pub_date', '-id'), after, 4)
+            pages.append([row.pk for row in rows])
+            if after is None:
+                break
+        self.assertEqual([len(page) for page in pages], [4, 2])
+        response = self.client.get(reverse('api:post_list'), {'limit': 4})
+        self.assertEqual(len(response.json()['results']), 4)
+        self.assertIsNotNone(response.json()['next'])
+
+    def test_detail_comment_and_reshard(self):
+        """Пост из шарда открывается и комментируется, автор переносится."""
+        author = next(a for a in self.authors
+                      if self.shard_of(a) == 'shard_1')
+        post = Post.objects.using('shard_1').filter(author=author).first()
+        self.clients[0].post(
+            reverse('posts:add_comment', args=[post.pk]),
+            {'text': 'Комментарий @author0'})
+        comment = Comment.objects.using('shard_1').get(post_id=post.pk)
+        response = self.client.get(
+            reverse('posts:post_detail', args=[post.pk]))
+        self.assertEqual(response.context['post'], post)
+        self.assertIn(comment, response.context['comments'])
+
+        out = StringIO()
+        call_command('reshard_author', author.username, 'default',
+                     '--chunk-size', '2', stdout=out)
+        self.assertEqual(shard_for_author(author.pk), 'default')
+        self.assertFalse(Post.objects.using('shard_1').filter(
+            author=author).exists())
+        self.assertFalse(Comment.objects.using('shard_1').exists())
+        moved = Post.objects.get(pk=post.pk)
+        self.assertEqual(moved.pub_date, post.pub_date)
+        self.assertTrue(Comment.objects.filter(pk=comment.pk).exists())
+        self.assertEqual(PostTag.objects.filter(
+            tag='@author0', comment_id=comment.pk).count(), 1)
+        response = self.client.get(
+            reverse('posts:profile', args=[author.username]))
+        self.assertEqual(len(response.context['page_obj']), 3)
+
+    def test_author_fenced_during_move(self):
+        """Пока автор переносится, запись его строк в старый шард
+        отклоняется; архив переезжает вместе с постами."""
+        author = self.author_on('shard_1')
+        self.addCleanup(sharding.unfence_author, 'shard_1', author.pk)
+        post = Post.objects.using('shard_1').filter(author=author).first()
+        now = timezone.now()
+        archived = ArchivedPost.objects.using('shard_1').create(
+            id=10_000, author=author, text='Архив', pub_date=now,
+            updated_at=now)
+        ArchivedComment.objects.using('shard_1').create(
+            id=10_000, post=archived, author=self.authors[0], text='Старый',
+            created=now, updated_at=now)
+        rejected = []
+        upsert = sharding._upsert
+
+        def write_then_copy(*args):
+            if not rejected:
+                with self.assertRaises(IntegrityError):
+                    Post(author=author, text='Во время').save()
+                with self.assertRaises(IntegrityError):
+                    Post.objects.using('shard_1').filter(
+                        pk=post.pk).update(text='Правка')
+                rejected.append(True)
+            return upsert(*args)
+
+        with mock.patch.object(sharding, '_upsert',
+                               side_effect=write_then_copy):
+            move_author(author.pk, 'default')
+        self.assertTrue(rejected)
+        self.assertEqual(Post.objects.get(pk=post.pk).text, post.text)
+        self.assertEqual(ArchivedPost.objects.get(pk=archived.pk).text,
+                         'Архив')
+        self.assertTrue(ArchivedComment.objects.filter(pk=10_000).exists())
+        self.assertFalse(ArchivedPost.objects.using('shard_1').exists())
+        self.assertFalse(ArchivedComment.objects.using('shard_1').exists())
+        with self.assertRaises(IntegrityError):
+            Post.objects.using('shard_1').create(author=author,
+                                                 text='Старая карта')
+        Post(author=author, text='После переноса').save()
+        self.assertEqual(Post.objects.filter(author=author).count(), 4)
+        self.assertEqual(AuthorShard.objects.get(
+            author_id=author.pk).moving_to, '')
+
+    def test_move_to_other_target_refused(self):
+        """Незаконченный перенос нельзя увести в другой шард."""
+        author = self.author_on('shard_1')
+        AuthorShard.objects.filter(author_id=author.pk).update(
+            moving_to='shard_2')
+        with self.assertRaises(ValueError):
+            move_author(author.pk, 'default')
+        self.assertEqual(self.shard_of(author), 'shard_1')
+
+    def test_search_digest_and_import_span_shards(self):
+        """Поиск и дайджест читают все шарды, импорт пишет в шард
+        автора."""
+        results, _ = search_posts('шард')
+        self.assertEqual(len(results), 6)
+        reader = User.objects.create_user(username='reader',
+                                          email='reader@example.com')
+        for author in self.authors:
+            Follow.objects.create(user=reader, author=author)
+        send_digests(timezone.now() - timedelta(days=1))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, 'Новые посты: 6')
+
+        author = self.author_on('shard_1')
+        ContentImporter().run([
+            {'type': 'post', 'id': '1', 'author': author.username,
+             'text': 'Импорт #импорт'},
+            {'type': 'comment', 'post': '1', 'author': 'author0',
+             'text': 'Ответ'},
+        ])
+        post = Post.objects.using('shard_1').get(text='Импорт #импорт')
+        self.assertTrue(Comment.objects.using('shard_1').filter(
+            post_id=post.pk, text='Ответ').exists())
+        self.assertTrue(PostTag.objects.using('shard_1').filter(
+            tag='#импорт', post_id=post.pk).exists())
+
+    def test_change_feed_spans_shards(self):
+        """Лента изменений читает журнал каждого шарда по своему курсору."""
+        seen, cursor = [], None
+        while True:
+            changes, cursor, has_more = fetch_changes(cursor, limit=2)
+            seen += changes
+            if not has_more:
+                break
+        self.assertEqual(len(cursor), 2)
+        inserted = {c['id'] for c in seen
+                    if c['model'] == 'post' and c['op'] == 'insert'}
+        self.assertEqual(len(inserted), 6)
+        post = Post.objects.using('shard_1').first()
+        post_id = post.pk
+        post.delete()
+        changes, _, _ = fetch_changes(cursor)
+        self.assertIn({'model': 'post', 'op': 'delete', 'id': post_id},
+                      changes)
+
+    def test_admin_tasks_and_reindex_reach_shards(self):
+        """Админка, фоновые действия и переиндексация видят все шарды."""
+        author = self.author_on('shard_1')
+        posts = list(Post.objects.using('shard_1').filter(author=author))
+        self.assertEqual(OutboxEvent.objects.filter(
+            topic='post.created').count(), 6)
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        client = Client()
+        client.force_login(admin)
+        url = reverse('admin:posts_post_changelist')
+        response = client.get(url, {'shard': 'shard_1'})
+        self.assertEqual({post.pk for post in response.context['cl']
+                          .result_list}, {post.pk for post in posts})
+        response = client.get(
+            reverse('admin:posts_post_change', args=[posts[0].pk]))
+        self.assertEqual(response.context['original'], posts[0])
+
+        client.post(url + '?shard=shard_1',
+                    {'action': 'delete_in_background',
+                     '_selected_action': [posts[0].pk]})
+        self.assertTrue(Post.all_objects.using('shard_1').get(
+            pk=posts[0].pk).is_deleted)
+        other = Group.objects.create(title='Другая', slug='other',
+                                     description='-')
+        client.post(url + '?shard=shard_1',
+                    {'action': 'move_to_group', 'group_slug': other.slug,
+                     '_selected_action': [posts[1].pk]})
+        work_off()
+        self.assertFalse(Post.all_objects.using('shard_1').filter(
+            pk=posts[0].pk).exists())
+        self.assertEqual(Post.objects.using('shard_1').get(
+            pk=posts[1].pk).group_id, other.pk)
+
+        PostTag.objects.using('shard_1').all().delete()
+        call_command('reindex_tags', stdout=StringIO())
+        self.assertEqual(PostTag.objects.using('shard_1').filter(
+            tag='#шард').count(), 2)
@@ -0,0 +1,68 @@
+import gzip
+import json
+import os
+import sqlite3
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TransactionTestCase
+
+from core.sqlite.snapshot import check_integrity, snapshot
+
+from ..models import Post
+
+User = get_user_model()
+
+
+class SnapshotTests(TransactionTestCase):
+    def setUp(self):
+        author = User.objects.create_user(username='author')
+        Post.objects.bulk_create(
+            Post(author=author, text=f'Пост {i} ' + 'x' * 500)
+            for i in range(200))
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def count_posts(self, path):
+        connection = sqlite3.connect(path)
+        try:
+            return connection.execute(
+                'SELECT COUNT(*) FROM posts_post').fetchone()[0]
+        finally:
+            connection.close()
+
+    def test_snapshot_copies_in_steps(self):
+        """Снимок копируется порциями и проходит проверку целостности."""
+        path = os.path.join(self.directory.name, 'db.sqlite3')
+        stats = snapshot('default', path, pages=5, sleep=0)
+        self.assertGreater(stats['steps'], 1)
+        self.assertEqual(stats['size'], os.path.getsize(path))
+        self.assertEqual(check_integrity(path), [])
+        self.assertEqual(self.count_posts(path), 200)
+        self.assertFalse(os.path.exists(path + '.partial'))
+
+    def test_pause_between_steps(self):
+        """Между порциями снимок делает паузу sleep."""
+        path = os.path.join(self.directory.name, 'db.sqlite3')
+        stats = snapshot('default', path, pages=20, sleep=0.01)
+        self.assertGreater(stats['steps'], 2)
+        # после последней порции пауза не нужна
+        self.assertGreaterEqual(stats['backup_seconds'],
+                                (stats['steps'] - 1) * 0.01)
+
+    def test_command_compresses_and_records_stats(self):
+        """Команда сжимает снимок и дописывает статистику в журнал."""
+        path = os.path.join(self.directory.name, 'db.sqlite3.gz')
+        call_command('snapshot_db', path, '--gzip', '--sleep', '0',
+                     stdout=StringIO())
+        plain = os.path.join(self.directory.name, 'plain.sqlite3')
+        with gzip.open(path) as packed, open(plain, 'wb') as raw:
+            raw.write(packed.read())
+        self.assertEqual(self.count_posts(plain), 200)
+        with open(os.path.join(self.directory.name,
+                               'snapshots.jsonl')) as log:
+            stats = json.loads(log.readline())
+        self.assertEqual(stats['compressed_size'], os.path.getsize(path))
+        self.assertLess(stats['compressed_size'], stats['size'])
@@ -0,0 +1,81 @@
+import os
+import sqlite3
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from core.sqlite.base import (PRODUCTION_PRAGMAS, DatabaseWrapper,
+                              apply_pragmas)
+
+
+class SqlitePragmaTests(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied_on_connect(self):
+        """Соединение открывается с прагмами продакшен-профиля."""
+        self.assertEqual(self.pragma('busy_timeout'),
+                         PRODUCTION_PRAGMAS['busy_timeout'])
+        self.assertEqual(self.pragma('cache_size'),
+                         PRODUCTION_PRAGMAS['cache_size'])
+        # NORMAL = 1, MEMORY = 2
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('temp_store'), 2)
+
+    def test_connection_params_leave_options(self):
+        """Прагмы и режим транзакций не меняют общий OPTIONS."""
+        options = {'pragmas': {'cache_size': -2000},
+                   'transaction_mode': 'DEFERRED', 'timeout': 3}
+        wrapper = DatabaseWrapper({**connection.settings_dict,
+                                   'OPTIONS': options})
+        params = wrapper.get_connection_params()
+        self.assertEqual(params['timeout'], 3)
+        self.assertNotIn('pragmas', params)
+        self.assertNotIn('transaction_mode', params)
+        self.assertEqual(wrapper.pragmas['cache_size'], -2000)
+        self.assertEqual(wrapper.transaction_mode, 'DEFERRED')
+        self.assertEqual(options['pragmas'], {'cache_size': -2000})
+        self.assertEqual(options['transaction_mode'], 'DEFERRED')
+
+    def test_new_database_gets_incremental_vacuum(self):
+        """Новая база создаётся сразу с auto_vacuum=INCREMENTAL и WAL."""
+        with tempfile.TemporaryDirectory() as directory:
+            db = sqlite3.connect(os.path.join(directory, 'new.sqlite3'))
+            try:
+                apply_pragmas(db, PRODUCTION_PRAGMAS)
+                db.execute('CREATE TABLE t (id INTEGER PRIMARY KEY)')
+                # INCREMENTAL = 2
+                self.assertEqual(
+                    db.execute('PRAGMA auto_vacuum').fetchone()[0], 2)
+                self.assertEqual(
+                    db.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+            finally:
+                db.close()
+
+
+class SqliteTransactionTests(TransactionTestCase):
+    def test_atomic_begins_immediate(self):
+        """atomic() сразу берёт блокировку записи."""
+        with CaptureQueriesContext(connection) as queries:
+            with transaction.atomic():
+                pass
+        self.assertEqual(queries[0]['sql'], 'BEGIN IMMEDIATE')
+
+
+class SqliteBenchmarkTests(TestCase):
+    def test_benchmark_reports_each_config(self):
+        """Замер выводит строку на конфигурацию."""
+        out = StringIO()
+        call_command('sqlite_benchmark', '--config', 'production',
+                     '--config', 'django', '--readers', '1', '--writers',
+                     '1', '--duration', '0.2', '--rows', '50', stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[1].startswith('production'))
+        self.assertTrue(lines[2].startswith('django'))
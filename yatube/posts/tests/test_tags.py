@@ -0,0 +1,69 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Post, PostTag
+from ..tags import extract_tags
+
+User = get_user_model()
+
+
+class PostTagsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TagUser')
+        cls.friend = User.objects.create_user(username='friend')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_extract_tags(self):
+        """Хештеги и упоминания извлекаются из текста."""
+        self.assertEqual(
+            extract_tags('#Django и #django, @friend, почта a@b.ru'),
+            {'#django', '@friend'},
+        )
+
+    def test_edit_diffs_index(self):
+        """При редактировании индекс обновляется точечно."""
+        self.authorized_client.post(reverse('posts:post_create'),
+                                    {'text': 'первый #раз #два'})
+        post = Post.objects.get()
+        kept = PostTag.objects.get(post=post, tag='#два')
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            {'text': 'второй #два #три @friend'})
+        tags = set(PostTag.objects.filter(post=post)
+                   .values_list('tag', flat=True))
+        self.assertEqual(tags, {'#два', '#три', '@friend'})
+        self.assertTrue(PostTag.objects.filter(pk=kept.pk).exists())
+
+    def test_tag_and_mention_feeds(self):
+        """Ленты тегов и упоминаний показывают нужные записи."""
+        self.authorized_client.post(reverse('posts:post_create'),
+                                    {'text': 'пост с #тегом'})
+        post = Post.objects.get()
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+            {'text': 'смотри, @friend'})
+        response = self.authorized_client.get(
+            reverse('posts:tag_list', kwargs={'tag': 'тегом'}))
+        self.assertEqual(len(response.context['page_obj']), 1)
+        response = self.authorized_client.get(
+            reverse('posts:mentions', kwargs={'username': 'friend'}))
+        entry = response.context['page_obj'][0]
+        self.assertEqual(entry.post, post)
+        self.assertIsNotNone(entry.comment)
+
+    def test_reindex_command(self):
+        """Команда переиндексации восстанавливает индекс."""
+        Post.objects.create(author=self.user, text='#один @friend')
+        Post.objects.create(author=self.user, text='#один')
+        call_command('reindex_tags', chunk_size=1, stdout=StringIO())
+        self.assertEqual(PostTag.objects.filter(tag='#один').count(), 2)
+        self.assertEqual(PostTag.objects.filter(tag='@friend').count(), 1)
@@ -9,9 +9,11 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
+from core.models import CacheVersion
 from yatube import settings
 from yatube.settings import PAGINATOR_PAGE_LIST
 
+from ..bulk import FEED_CACHE
 from ..models import Follow, Group, Post
 
 User = get_user_model()
@@ -223,6 +225,20 @@ class PostPagesTests(TestCase):
             reverse('posts:index')).content
         self.assertNotEqual(response, response_clear)
 
+    @override_settings(CACHE_VERSION_TTL=0)
+    def test_cache_reset_from_other_process(self):
+        """Сброс поколения в базе другим процессом обходит старый кеш."""
+        response = self.authorized_client.get(reverse('posts:index'))
+        Post.objects.create(author=self.user, text='Пост из воркера')
+        response_cache = self.authorized_client.get(reverse('posts:index'))
+        self.assertEqual(response.content, response_cache.content)
+        # так поколение меняет invalidate_feed_caches в исполнителе задач:
+        # LocMemCache этого процесса он не видит
+        CacheVersion.objects.update_or_create(name=FEED_CACHE,
+                                              defaults={'version': 100})
+        response_fresh = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response_fresh, 'Пост из воркера')
+
     def test_follow_add_and_delete(self):
         """Авторизованный пользователь может подписываться
          на других пользователей и удалять их из подписок."""
@@ -1,4 +1,10 @@
+import base64
+import binascii
+import json
+
 from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
 
 from yatube.settings import PAGINATOR_PAGE_LIST
 
@@ -8,3 +14,112 @@ def paginator_page_obj(request, post_list):
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return page_obj
+
+
+def encode_cursor(*values):
+    """Упаковывает ключ последней записи страницы в строку для URL."""
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, *types):
+    """Разбирает курсор; для битого курсора возвращает None.
+
+    types — ожидаемый тип каждого значения (или кортеж типов); курсор
+    приходит из URL, поэтому значения другого вида, включая bool вместо
+    числа, считаются битым курсором.
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError):
+        return None
+    if not isinstance(values, list) or len(values) != len(types):
+        return None
+    for value, expected in zip(values, types):
+        if isinstance(value, bool) or not isinstance(value, expected):
+            return None
+    return tuple(values)
+
+
+def parse_moment(value):
+    """Дата из курсора; None, если строка не дата или дата невозможна.
+
+    parse_datetime возвращает None только для строк не того вида, а на
+    '2020-13-45T00:00:00' бросает ValueError.
+    """
+    try:
+        return parse_datetime(value)
+    except ValueError:
+        return None
+
+
+def keyset_filter(queryset, ordering, after):
+    """Оставляет записи строго после ключа `after` в порядке `ordering`.
+
+    ordering — поля сортировки вида ('-pub_date', '-id'), after — значения
+    этих полей у последней записи предыдущей страницы.
+    """
+    if after is None:
+        return queryset
+    condition = Q()
+    for index, field in enumerate(ordering):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        step = Q(**{f'{name}__{lookup}': after[index]})
+        for prev_field, value in zip(ordering[:index], after):
+            step &= Q(**{prev_field.lstrip('-'): value})
+        condition |= step
+    return queryset.filter(condition)
+
+
+def keyset_page(queryset, ordering, after, limit):
+    """Страница по ключу: записи и ключ следующей страницы либо None."""
+    rows = list(keyset_filter(queryset.order_by(*ordering), ordering,
+                              after)[:limit + 1])
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    names = [field.lstrip('-') for field in ordering]
+    if isinstance(last, dict):
+        return rows, tuple(last[name] for name in names)
+    return rows, tuple(getattr(last, name) for name in names)
+
+
+class ChainedFeed:
+    """Несколько упорядоченных выборок подряд, как одна лента для Paginator.
+
+    Каждая следующая выборка должна целиком идти после предыдущей, как
+    архив после горячей таблицы; срез читает из каждой только нужное.
+    """
+    ordered = True
+
+    def __init__(self, *querysets):
+        self.querysets = querysets
+        self._counts = None
+
+    def counts(self):
+        if self._counts is None:
+            self._counts = [queryset.count() for queryset in self.querysets]
+        return self._counts
+
+    def count(self):
+        return sum(self.counts())
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if isinstance(index, int):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop
+        rows = []
+        for queryset, size in zip(self.querysets, self.counts()):
+            if start < size and stop > 0:
+                rows.extend(queryset[max(start, 0):min(stop, size)])
+            start -= size
+            stop -= size
+        return rows
@@ -1,16 +1,33 @@
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
 
+from core.cache_versions import versioned_cache_page
+from yatube.settings import PAGINATOR_PAGE_LIST
+
+from . import events
+from .bulk import FEED_CACHE
+from .cards import CardFeed, ProjectionFeed, card_rows
+from .comments import comment_page, decode_comment_cursor
+from .export import export_author
 from .forms import CommentForm, PostForm
-from .models import Comment, Follow, Group, Post, User
-from .utils import paginator_page_obj
+from .models import (ArchivedPost, Comment, Follow, Group, Post, PostCard,
+                     User)
+from .search import search_posts
+from .sharding import (get_post_or_404, locate_post, sharded_feed,
+                       write_atomic)
+from .tags import (index_comment_tags, mentions_feed, sync_post_tags,
+                   tag_feed)
+from .utils import (ChainedFeed, decode_cursor, encode_cursor,
+                    paginator_page_obj)
+
+FEED_ORDERING = ('-pub_date', '-id')
 
 
-@cache_page(20)
+@versioned_cache_page(20, FEED_CACHE)
 def index(request):
-    post_list = Post.objects.select_related('group').all().order_by(
-        '-pub_date')
+    post_list = ProjectionFeed(PostCard.objects.order_by(*FEED_ORDERING))
     page_obj = paginator_page_obj(request, post_list)
     template = 'posts/index.html'
     title = "Последние обновления на сайте"
@@ -24,7 +41,9 @@ def index(request):
 def group_posts(request, slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    post_list = Post.objects.filter(group=group).order_by('-pub_date')
+    post_list = ProjectionFeed(
+        PostCard.objects.filter(group_id=group.pk).order_by(*FEED_ORDERING),
+        group=group)
     page_obj = paginator_page_obj(request, post_list)
     context = {
         'group': group,
@@ -33,9 +52,26 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+def tag_posts(request, tag):
+    page_obj = paginator_page_obj(request,
+                                  sharded_feed(tag_feed(tag), FEED_ORDERING))
+    context = {
+        'tag': tag,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/tag_list.html', context)
+
+
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.order_by('-pub_date')
+    author = get_object_or_404(User, username=username, is_active=True)
+    # архив целиком старше горячих постов, поэтому идёт следом за ними
+    posts = ChainedFeed(
+        ProjectionFeed(PostCard.objects.filter(
+            author_id=author.pk).order_by(*FEED_ORDERING), author=author),
+        CardFeed(card_rows(author.archived_posts.all(),
+                           author=author).order_by(*FEED_ORDERING),
+                 author=author),
+    )
     page_obj = paginator_page_obj(request, posts)
     following = False
     if request.user.is_authenticated:
@@ -49,19 +85,110 @@ def profile(request, username):
     return render(request, 'posts/profile.html', context)
 
 
+EXPORT_CONTENT_TYPES = {
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+    'zip': 'application/zip',
+}
+
+
+@login_required
+def profile_export(request, username):
+    author = get_object_or_404(User, username=username)
+    if request.user != author and not request.user.is_staff:
+        return redirect('posts:profile', username=username)
+    fmt = 'csv' if request.GET.get('format') == 'csv' else 'jsonl'
+    with_images = request.GET.get('images') == '1'
+    extension = 'zip' if with_images else fmt
+    response = StreamingHttpResponse(
+        export_author(author, fmt, with_images),
+        content_type=EXPORT_CONTENT_TYPES[extension],
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{author.username}.{extension}"')
+    return response
+
+
+def mentions(request, username):
+    author = get_object_or_404(User, username=username, is_active=True)
+    page_obj = paginator_page_obj(
+        request, sharded_feed(mentions_feed(author.username), FEED_ORDERING))
+    context = {
+        'author': author,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/mentions.html', context)
+
+
+def _locate_thread(post_id, *fields):
+    """Пост, признак архива и выборка его комментариев.
+
+    fields сужает колонки поста, если нужен только он сам.
+    """
+    posts, archived = Post.objects.all(), ArchivedPost.objects.all()
+    if fields:
+        posts, archived = posts.only(*fields), archived.only(*fields)
+    post, _ = locate_post(post_id, posts)
+    if post is None:
+        post = get_post_or_404(post_id, archived)
+        return post, True, post.comments.all()
+    comments = Comment.objects.using(post._state.db).filter(post=post)
+    return post, False, comments
+
+
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, id=post_id)
+    after = decode_comment_cursor(request.GET.get('after'))
+    post, is_archived, comments = _locate_thread(post_id)
+    comments, next_cursor = comment_page(comments, after or None)
     form = CommentForm(request.POST or None)
-    comments = Comment.objects.filter(post=post)
     context = {
         'post': post,
         'form': form,
         'comments': comments,
+        'next_cursor': next_cursor,
+        'is_archived': is_archived,
     }
     return render(request, template, context)
 
 
+def post_comments(request, post_id):
+    """Следующая страница комментариев фрагментом для «Показать ещё»."""
+    after = decode_comment_cursor(request.GET.get('after'))
+    if after is False:
+        return HttpResponseBadRequest('Неверный курсор')
+    post, _, comments = _locate_thread(post_id, 'id')
+    comments, next_cursor = comment_page(comments, after)
+    context = {
+        'post': post,
+        'comments': comments,
+        'next_cursor': next_cursor,
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
+def post_text(request, post_id):
+    """Полный текст поста фрагментом: ленты показывают только начало."""
+    post, _ = locate_post(post_id, Post.objects.only('text'))
+    if post is None:
+        post = get_post_or_404(post_id, ArchivedPost.objects.only('text'))
+    return render(request, 'posts/includes/post_text.html', {'post': post})
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    after = decode_cursor(request.GET.get('after'),
+                          (int, float), int)
+    results, next_key = search_posts(query, after=after,
+                                     limit=PAGINATOR_PAGE_LIST)
+    context = {
+        'query': query,
+        'results': results,
+        'next_cursor': encode_cursor(*next_key) if next_key else None,
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def post_create(request):
     template = 'posts/create_post.html'
@@ -69,7 +196,10 @@ def post_create(request):
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
-        post.save()
+        with write_atomic(post):
+            post.save()
+            sync_post_tags(post)
+            events.post_created(post)
         return redirect('posts:profile', username=post.author)
     context = {
         'form': form,
@@ -79,7 +209,7 @@ def post_create(request):
 
 @login_required
 def post_edit(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_post_or_404(post_id)
     template = 'posts/create_post.html'
     if request.user != post.author:
         return redirect('posts:post_detail', post_id=post_id)
@@ -89,7 +219,10 @@ def post_edit(request, post_id):
     is_edit = True
     if request.method == "POST":
         if form.is_valid():
-            form.save()
+            with write_atomic(post):
+                post = form.save()
+                sync_post_tags(post)
+                events.post_updated(post)
             return redirect('posts:post_detail', post_id=post_id)
     context = {
         'form': form,
@@ -101,20 +234,24 @@ def post_edit(request, post_id):
 
 @login_required
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_post_or_404(post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with write_atomic(comment):
+            comment.save()
+            index_comment_tags(comment)
+            events.comment_created(comment)
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(
-        author__following__user=request.user).order_by('-pub_date')
+    post_list = ProjectionFeed(PostCard.objects.filter(
+        author_id__in=Follow.objects.filter(
+            user=request.user).values('author_id')).order_by(*FEED_ORDERING))
     template = 'posts/follow.html'
     title = 'Ваши избранные авторы'
     page_obj = paginator_page_obj(request, post_list)
@@ -129,7 +266,11 @@ def follow_index(request):
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if request.user != author:
-        Follow.objects.get_or_create(user=request.user, author=author)
+        with transaction.atomic():
+            follow, created = Follow.objects.get_or_create(
+                user=request.user, author=author)
+            if created:
+                events.follow_created(follow)
         return redirect('posts:follow_index')
     return redirect('posts:index')
 
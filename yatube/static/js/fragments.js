@@ -0,0 +1,26 @@
+// Ссылка с data-fragment подгружает HTML-фрагмент и заменяет им
+// элемент data-target. Без скрипта ссылка ведёт на обычную страницу.
+document.addEventListener('click', function (event) {
+  var link = event.target.closest('a[data-fragment]');
+  if (!link) {
+    return;
+  }
+  var target = document.getElementById(link.dataset.target);
+  if (!target) {
+    return;
+  }
+  event.preventDefault();
+  fetch(link.dataset.fragment, {credentials: 'same-origin'})
+    .then(function (response) {
+      if (!response.ok) {
+        throw new Error(response.status);
+      }
+      return response.text();
+    })
+    .then(function (html) {
+      target.outerHTML = html;
+    })
+    .catch(function () {
+      window.location = link.href;
+    });
+});
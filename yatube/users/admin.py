@@ -0,0 +1,33 @@
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.contrib.auth.admin import UserAdmin
+from django.urls import reverse
+from django.utils.html import format_html
+
+from posts.purge import deactivate_user
+
+User = get_user_model()
+
+
+class PurgingUserAdmin(UserAdmin):
+    actions = ('deactivate_and_purge',)
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        # каскад по всем постам пользователя в одном запросе не уложится
+        actions.pop('delete_selected', None)
+        return actions
+
+    def deactivate_and_purge(self, request, queryset):
+        for user in queryset:
+            job = deactivate_user(user)
+            url = reverse('admin:core_job_change', args=[job.pk])
+            self.message_user(request, format_html(
+                'Пользователь {} отключён, удаление данных в очереди: '
+                '<a href="{}">прогресс</a>', user.username, url))
+    deactivate_and_purge.short_description = (
+        'Отключить и удалить все их данные (в фоне)')
+
+
+admin.site.unregister(User)
+admin.site.register(User, PurgingUserAdmin)
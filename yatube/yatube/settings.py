@@ -46,11 +46,14 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.ReplicaStickinessMiddleware',
+    'core.middleware.BatchLoaderMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -84,13 +87,41 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# sqlite3 с прагмами для параллельной записи и BEGIN IMMEDIATE;
+# настраивается через OPTIONS, см. core/sqlite/base.py
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.sqlite',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+    },
+    # стенд реплики: копия основной базы, обновляется sync_replica
+    'replica': {
+        'ENGINE': 'core.sqlite',
+        'NAME': os.path.join(BASE_DIR, 'replica.sqlite3'),
+        'TEST': {'NAME': os.path.join(BASE_DIR, 'test_replica.sqlite3')},
+    },
+    # второй шард постов для локальной проверки шардирования
+    'shard_1': {
+        'ENGINE': 'core.sqlite',
+        'NAME': os.path.join(BASE_DIR, 'shard_1.sqlite3'),
+        'TEST': {'NAME': os.path.join(BASE_DIR, 'test_shard_1.sqlite3')},
+    },
 }
 
+DATABASE_ROUTERS = [
+    'posts.sharding.ShardRouter',
+    'core.routers.ReplicaRouter',
+]
+
+# базы, по которым раскладываются посты авторов; см. posts/sharding.py
+POST_SHARDS = ['default']
+
+# псевдонимы реплик для чтения; пустой список — всё читается с default
+DATABASE_REPLICAS = []
+
+# сколько секунд после записи пользователь читает с основной базы
+REPLICA_PIN_SECONDS = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -138,12 +169,30 @@ STATIC_URL = '/static/'
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 
-# движок filebased.EmailBackend
-EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+# письма сохраняются в базу, а отправляет их задача в очереди
+EMAIL_BACKEND = 'core.mail.OutboxEmailBackend'
+
+# движок, которым задача доставляет письма
+MAIL_DELIVERY_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+
+# не больше 5 писем одному получателю за час
+MAIL_RECIPIENT_LIMIT = (5, 3600)
 
 # указываем директорию, в которую будут складываться файлы писем
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
+# адрес сайта для ссылок в письмах
+SITE_URL = 'http://127.0.0.1:8000'
+
+# посты старше стольких дней переносятся в архив
+ARCHIVE_AFTER_DAYS = 365
+
+# сколько самых свежих постов держать в горячей таблице
+HOT_POSTS_LIMIT = 100000
+
+# куда snapshot_db складывает снимки базы
+SNAPSHOT_DIR = os.path.join(BASE_DIR, 'backups')
+
 # количество постов на страницу
 PAGINATOR_PAGE_LIST = 10
 
@@ -156,3 +205,7 @@ CACHES = {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
+
+# кеш у каждого процесса свой; сброс из другого процесса доходит через
+# поколение в базе, которое процесс перечитывает раз в столько секунд
+CACHE_VERSION_TTL = 1